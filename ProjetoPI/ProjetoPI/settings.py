@@ -56,6 +56,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Sistema.middleware.MonitorViewMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -132,6 +133,73 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
+# MongoDB (registros de refeições). Chaves ausentes usam os padrões de
+# Sistema/utils/mongo/mongo_connection.py. O pool é por processo: com N
+# workers o servidor recebe até N * MAX_POOL_SIZE conexões.
+MONGO = {
+    'URI': os.environ.get('MONGO_URI', 'mongodb://localhost:27017/'),
+    'BANCO': os.environ.get('MONGO_BANCO', 'refeicoes'),
+    'MAX_POOL_SIZE': int(os.environ.get('MONGO_MAX_POOL_SIZE', 50)),
+    'MIN_POOL_SIZE': int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+    'CONNECT_TIMEOUT_MS': 5000,
+    'SERVER_SELECTION_TIMEOUT_MS': 5000,
+    'SOCKET_TIMEOUT_MS': 20000,
+    'WAIT_QUEUE_TIMEOUT_MS': 2000,
+    'READ_PREFERENCE': os.environ.get('MONGO_READ_PREFERENCE', 'primary'),
+    'LIMITE_LENTO_MS': int(os.environ.get('MONGO_LIMITE_LENTO_MS', 200)),
+}
+
+# Tempo (segundos) que as listas de obras/colaboradores do dashboard ficam em cache
+REFEICOES_CACHE_FILTROS_TTL = 600
+
+# Tempo (segundos) que os resultados do dashboard ficam em cache, por filtro.
+# Registros, edições e exclusões invalidam o cache; 0 desliga.
+REFEICOES_CACHE_RESULTADOS_TTL = 300
+
+# Cache das listas e resultados acima. Com mais de um processo (gunicorn,
+# uvicorn com workers) defina REDIS_URL: no cache local de cada processo a
+# invalidação feita por um worker não chega aos outros.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Onde os registros de refeições são guardados (classe com a API de
+# Sistema/utils/backend_refeicoes.py). Para rodar sem MongoDB:
+# REFEICOES_BACKEND=Sistema.utils.memoria.memoria_model.ControleRefeicoesMemoria
+# Para usar o banco do Django (rode antes "python manage.py copiar_refeicoes_mongo_sql"):
+# REFEICOES_BACKEND=Sistema.utils.sql.sql_model.ControleRefeicoesSQL
+REFEICOES_BACKEND = os.environ.get('REFEICOES_BACKEND', 'Sistema.utils.mongo.mongo_model.ControleRefeicoes')
+
+# Usa a coleção time-series controle_diario_ts para os registros de refeições.
+# Rode "python manage.py migrar_timeseries_refeicoes" antes de ativar.
+# Exige MongoDB 7.0 ou mais novo (edição e exclusão de registros por _id).
+REFEICOES_TIMESERIES = os.environ.get('REFEICOES_TIMESERIES', '') == '1'
+
+# Usa a coleção controle_diario_compacto (nomes curtos, valor em centavos e
+# nomes de cadastro resolvidos na leitura). Rode "python manage.py
+# compactar_refeicoes" antes de ativar. Não se aplica à time-series.
+REFEICOES_ESQUEMA_COMPACTO = os.environ.get('REFEICOES_ESQUEMA_COMPACTO', '') == '1'
+
+# Meses mantidos na coleção de registros; os anteriores são movidos pelo comando
+# "python manage.py arquivar_refeicoes" para coleções mensais de arquivo.
+# None desliga o arquivo (não desligue depois de arquivar: os arquivos deixam de ser lidos).
+REFEICOES_MESES_ATIVOS = int(os.environ['REFEICOES_MESES_ATIVOS']) if os.environ.get('REFEICOES_MESES_ATIVOS') else None
+
+# Registro de refeições com escrita adiada: as requisições só enfileiram os
+# registros e uma thread por processo os grava no Mongo em lotes maiores.
+# A mensagem de confirmação passa a ser "recebidas" em vez de "registradas".
+REFEICOES_ESCRITA_ADIADA = os.environ.get('REFEICOES_ESCRITA_ADIADA', '') == '1'
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
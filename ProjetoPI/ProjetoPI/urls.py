@@ -35,14 +35,22 @@ urlpatterns = [
     path('listar-hoteis/', views.listar_hoteis, name='listar-hoteis'), 
     path('cadastrar-hotel/', views.cadastro_hotel, name='cadastrar-hotel'), 
     path('deletar/', views.deletar_generico, name='deletar-generico'),
+    path('deletar/<str:job_id>/status/', views.status_exclusao, name='status-exclusao'),
     path('editar-hotel/<int:id>/', views.editar_hotel, name='editar-hotel'),
     path('editar/', views.redirecionar_edicao_hotel, name='redirecionar-edicao-hotel'),
     path('listar-pedidos/', views.listar_pedidos, name='listar_pedidos'),
+    path('listar-pedidos/colaboradores/', views.listar_pedidos_colaboradores, name='listar_pedidos_colaboradores'),
     path('cadastrar-pedido/', views.cadastrar_pedido, name='cadastrar_pedido'),
     path('refeicoes/registros/', views.listar_registros, name='listar_registros'),
+    path('refeicoes/exportar/', views.exportar_registros, name='exportar_registros'),
+    path('refeicoes/editar/lote/', views.editar_registros_em_lote, name='editar_registros_em_lote'),
+    path('refeicoes/excluir/lote/', views.excluir_registros_em_lote, name='excluir_registros_em_lote'),
     path('refeicoes/editar/<str:registro_id>/', views.editar_registro, name='editar_registro'),
     path('refeicoes/excluir/<str:registro_id>/', views.excluir_registro, name='excluir_registro'),
     path('dashboard/', views.relatorio, name='relatorio'),
+    path('dashboard/colaboradores/', views.buscar_colaboradores_refeicoes, name='buscar_colaboradores_refeicoes'),
+    path('dashboard/parceiros/', views.relatorio_parceiros, name='relatorio_parceiros'),
+    path('mongo/estatisticas/', views.estatisticas_mongo, name='estatisticas_mongo'),
 
     #path('editar-pedido/<str:pedido_id>/', views.editar_pedido, name='editar_pedido'),
     #path('excluir-pedido/<str:pedido_id>/', views.excluir_pedido, name='excluir_pedido'),    
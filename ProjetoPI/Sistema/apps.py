@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class SistemaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Sistema'
-    verbose_name = 'Sistema de Gestão'
\ No newline at end of file
+    verbose_name = 'Sistema de Gestão'
+
+    def ready(self):
+        from Sistema import signals  # noqa: F401  (conecta os receivers)
\ No newline at end of file
@@ -8,6 +8,9 @@ from django.core.exceptions import ValidationError
 from .models import Restaurante, Colaborador, Profile, Hotel, Obra
 from django.core.exceptions import ValidationError
 from .api_utils.viacep import buscar_endereco_por_cep
+import logging
+
+logger = logging.getLogger(__name__)
 
  #Cadastro Obra
 
@@ -143,7 +146,7 @@ class CustomUserCreationForm(UserCreationForm):
             # Registro de auditoria
             if self.request:
                 user = self.request.user
-                print(f"Auditoria: Usuário {user.username} tentou criar um admin")  # Substitua por um logger real
+                logger.warning("Auditoria: Usuário %s tentou criar um admin", user.username)
 
         return cleaned_data
 
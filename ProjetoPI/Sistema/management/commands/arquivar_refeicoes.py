@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from Sistema.utils.mongo.mongo_model import ControleRefeicoes, TAMANHO_LOTE_ARQUIVAMENTO, nome_arquivo
+
+
+class Command(BaseCommand):
+    help = 'Move os meses fechados de refeições para as coleções de arquivo mensais'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanho-lote',
+            type=int,
+            default=TAMANHO_LOTE_ARQUIVAMENTO,
+            help='Registros movidos por lote',
+        )
+        parser.add_argument(
+            '--simular',
+            action='store_true',
+            help='Apenas lista os meses que seriam arquivados',
+        )
+
+    def handle(self, *args, **options):
+        controle = ControleRefeicoes()
+        if not controle.meses_ativos:
+            raise CommandError("Defina REFEICOES_MESES_ATIVOS nas configurações para usar o arquivo mensal.")
+
+        meses = controle.meses_para_arquivar()
+        if not meses:
+            self.stdout.write(self.style.SUCCESS("Nenhum mês para arquivar."))
+            return
+
+        for ano, mes in meses:
+            if options['simular']:
+                self.stdout.write(f"Seria arquivado: {mes:02d}/{ano} -> {nome_arquivo(ano, mes)}")
+                continue
+            movidos = 0
+            for movidos in controle.arquivar_mes(ano, mes, options['tamanho_lote']):
+                self.stdout.write(f"  {mes:02d}/{ano}: {movidos} registros movidos...")
+            self.stdout.write(self.style.SUCCESS(f"{mes:02d}/{ano} arquivado em {nome_arquivo(ano, mes)} ({movidos} registros)."))
+
+        if not options['simular']:
+            tamanho = controle.tamanho_colecao()
+            self.stdout.write(
+                f"{controle.collection.name}: {tamanho['documentos']} documentos, "
+                f"{tamanho['indices'] / 1024:.1f} KB de índices"
+            )
@@ -0,0 +1,117 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.utils.module_loading import import_string
+from Sistema.models import Colaborador, Obra
+
+BACKENDS_PADRAO = [
+    "Sistema.utils.memoria.memoria_model.ControleRefeicoesMemoria",
+    "Sistema.utils.sql.sql_model.ControleRefeicoesSQL",
+    "Sistema.utils.mongo.mongo_model.ControleRefeicoes",
+]
+
+
+class Command(BaseCommand):
+    help = 'Compara a vazão de registro de refeições e de consultas do dashboard entre backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backend',
+            action='append',
+            dest='backends',
+            help='Caminho da classe do backend (pode repetir). Padrão: memória, SQL e Mongo',
+        )
+        parser.add_argument('--colaboradores', type=int, default=200)
+        parser.add_argument('--dias', type=int, default=30)
+        parser.add_argument('--consultas', type=int, default=50, help='Consultas do dashboard por backend')
+
+    def handle(self, *args, **options):
+        # Obras e colaboradores de teste são criados numa transação desfeita no fim
+        with transaction.atomic():
+            obras, colaboradores_ids = self._criar_cadastros(options['colaboradores'])
+            usuario = User(id=0, username='benchmark')
+            for caminho in options['backends'] or BACKENDS_PADRAO:
+                try:
+                    with self._isolado(caminho) as controle:
+                        resultado = self._medir(controle, obras, colaboradores_ids, usuario, options)
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"{caminho}: não foi possível medir ({e})"))
+                    continue
+                self.stdout.write(
+                    f"{caminho}\n"
+                    f"  registro:  {resultado['registros']} refeições em {resultado['tempo_registro']:.2f}s "
+                    f"({resultado['registros'] / resultado['tempo_registro']:.0f}/s)\n"
+                    f"  dashboard: {options['consultas']} consultas em {resultado['tempo_dashboard']:.2f}s "
+                    f"({options['consultas'] / resultado['tempo_dashboard']:.1f}/s)"
+                )
+            transaction.set_rollback(True)
+
+    def _criar_cadastros(self, quantidade):
+        Obra.objects.bulk_create([
+            Obra(nome=f'Benchmark {i}', empresa='Benchmark', endereco='-', data_inicio=date.today())
+            for i in range(max(1, quantidade // 50))
+        ])
+        obras = list(Obra.objects.filter(nome__startswith='Benchmark ', empresa='Benchmark'))
+        Colaborador.objects.bulk_create([
+            Colaborador(
+                nome=f'Colaborador {i}',
+                nome_busca=f'colaborador {i}',
+                cpf=f'999.{i // 1000 % 1000:03d}.{i % 1000:03d}-{i // 1000000 % 100:02d}',
+                data_nascimento=date(1990, 1, 1),
+                telefone='0',
+                endereco='-',
+                obra=obras[i % len(obras)],
+            )
+            for i in range(quantidade)
+        ])
+        colaboradores_ids = list(Colaborador.objects.filter(obra__in=obras).values_list('id', flat=True))
+        return obras, colaboradores_ids
+
+    @contextmanager
+    def _isolado(self, caminho):
+        """Instância nova do backend; o Mongo usa um banco temporário, apagado no fim.
+
+        O cache de resultados do dashboard fica desligado: com filtros
+        sorteados entre poucas datas, a maioria das consultas mediria só o cache.
+        """
+        classe = import_string(caminho)
+        if not hasattr(classe, 'db'):
+            yield classe()
+            return
+        banco = f"{settings.MONGO.get('BANCO', 'refeicoes')}_benchmark"
+        with override_settings(MONGO={**settings.MONGO, 'BANCO': banco}, REFEICOES_CACHE_RESULTADOS_TTL=0):
+            controle = classe()
+            try:
+                controle.criar_indices()
+                yield controle
+            finally:
+                controle.db.client.drop_database(banco)
+
+    def _medir(self, controle, obras, colaboradores_ids, usuario, options):
+        inicio_periodo = date.today() - timedelta(days=options['dias'])
+        datas = [inicio_periodo + timedelta(days=i) for i in range(options['dias'])]
+
+        inicio = time.perf_counter()
+        registros = 0
+        for dia in datas:
+            registros += controle.registrar_refeicoes(dia.isoformat(), colaboradores_ids, usuario)["inseridos"]
+        tempo_registro = time.perf_counter() - inicio
+
+        sorteio = random.Random(0)
+        inicio = time.perf_counter()
+        for _ in range(options['consultas']):
+            primeiro, ultimo = sorted(sorteio.sample(datas, 2)) if len(datas) > 1 else (datas[0], datas[0])
+            filtros = {'data_inicio': primeiro.isoformat(), 'data_fim': ultimo.isoformat()}
+            if sorteio.random() < 0.5:
+                filtros['obra_id'] = str(sorteio.choice(obras).id)
+            controle.resumo_dashboard(filtros)
+            controle.listar_registros_paginados(filtros=filtros)
+        tempo_dashboard = time.perf_counter() - inicio
+
+        return {'registros': registros, 'tempo_registro': tempo_registro, 'tempo_dashboard': tempo_dashboard}
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from Sistema.utils.mongo.mongo_model import ControleRefeicoes, COLECAO_COMPACTA, TAMANHO_LOTE_MIGRACAO
+
+
+class Command(BaseCommand):
+    help = f'Copia os registros de refeições para a coleção {COLECAO_COMPACTA}, no esquema compacto'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanho-lote',
+            type=int,
+            default=TAMANHO_LOTE_MIGRACAO,
+            help='Registros copiados por inserção',
+        )
+
+    def handle(self, *args, **options):
+        # Origem: a coleção em uso hoje (comum ou time-series)
+        origem = ControleRefeicoes(compacto=False)
+        destino = ControleRefeicoes(timeseries=False, compacto=True)
+
+        # Índices antes da cópia: o único de colaborador/dia vale desde o primeiro lote
+        for nome in destino.criar_indices():
+            self.stdout.write(f"Índice garantido: {nome}")
+
+        copiados = ignorados = 0
+        for copiados, ignorados in origem.copiar_registros(destino, options['tamanho_lote']):
+            self.stdout.write(f"  {copiados} registros copiados...")
+        if ignorados:
+            self.stdout.write(self.style.WARNING(
+                f"{ignorados} registros ignorados: colaborador já tinha refeição no mesmo dia no destino."
+            ))
+
+        antes = origem.tamanho_colecao()
+        depois = destino.tamanho_colecao()
+        for controle, tamanho in ((origem, antes), (destino, depois)):
+            self.stdout.write(
+                f"{controle.collection.name}: {tamanho['documentos']} documentos, "
+                f"{tamanho['armazenamento'] / 1024:.1f} KB de dados, {tamanho['indices'] / 1024:.1f} KB de índices"
+            )
+        total_antes = antes['armazenamento'] + antes['indices']
+        total_depois = depois['armazenamento'] + depois['indices']
+        if total_antes:
+            self.stdout.write(f"Espaço ocupado: {100 * (total_antes - total_depois) / total_antes:.0f}% menor.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Migração concluída: {copiados} registros copiados nesta execução. "
+            "Defina REFEICOES_ESQUEMA_COMPACTO = True para passar a usar a nova coleção."
+        ))
@@ -0,0 +1,78 @@
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from pymongo import ASCENDING
+from Sistema.models import Colaborador, Obra, RegistroRefeicao
+from Sistema.utils.mongo.mongo_model import ControleRefeicoes, _formato_comum, nome_arquivo
+
+TAMANHO_LOTE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Copia os registros de refeições do MongoDB para a tabela RegistroRefeicao'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE, help='Registros gravados por inserção')
+
+    def handle(self, *args, **options):
+        controle = ControleRefeicoes()
+        colecoes = [controle.collection] + [controle.db[nome_arquivo(ano, mes)] for ano, mes in controle.meses_arquivados()]
+
+        obras = set(Obra.objects.values_list('id', flat=True))
+        colaboradores = set(Colaborador.objects.values_list('id', flat=True))
+        usuarios = set(User.objects.values_list('id', flat=True))
+        antes = RegistroRefeicao.objects.count()
+
+        ignorados = 0
+        for colecao in colecoes:
+            lote = []
+            lidos = 0
+            cursor = colecao.find({}).sort('_id', ASCENDING).batch_size(options['tamanho_lote'])
+            for documento in cursor:
+                documento = _formato_comum(documento)
+                lidos += 1
+                if documento.get('colaborador_id') not in colaboradores or documento.get('obra_id') not in obras:
+                    ignorados += 1
+                    continue
+                lote.append(self._registro(documento, usuarios))
+                if len(lote) >= options['tamanho_lote']:
+                    self._gravar(lote, options['tamanho_lote'])
+                    lote = []
+                    self.stdout.write(f"  {colecao.name}: {lidos} documentos lidos...")
+            self._gravar(lote, options['tamanho_lote'])
+            self.stdout.write(f"{colecao.name}: {lidos} documentos lidos.")
+
+        copiados = RegistroRefeicao.objects.count() - antes
+        if ignorados:
+            self.stdout.write(self.style.WARNING(
+                f"{ignorados} registros ignorados: colaborador ou obra não existe mais no cadastro."
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Cópia concluída: {copiados} registros novos na tabela. Defina "
+            "REFEICOES_BACKEND=Sistema.utils.sql.sql_model.ControleRefeicoesSQL para passar a usá-la."
+        ))
+
+    def _registro(self, documento, usuarios):
+        registrado_por = documento.get('registrado_por_id')
+        registro = RegistroRefeicao(
+            colaborador_id=documento['colaborador_id'],
+            obra_id=documento['obra_id'],
+            data_refeicao=documento['data_refeicao'].date(),
+            valor_refeicao=Decimal(str(documento.get('valor_refeicao', 0))),
+            registrado_por_id=registrado_por if registrado_por in usuarios else None,
+            mongo_id=str(documento['_id']),
+        )
+        # Mantém a data original do registro (o Mongo guarda a hora local sem fuso)
+        registrado_em = documento.get('registrado_em')
+        if registrado_em:
+            if settings.USE_TZ and timezone.is_naive(registrado_em):
+                registrado_em = timezone.make_aware(registrado_em)
+            registro.registrado_em = registrado_em
+        return registro
+
+    def _gravar(self, lote, tamanho_lote):
+        # ignore_conflicts: registros já copiados (mongo_id) ou do mesmo
+        # colaborador/dia são pulados, então o comando pode ser repetido
+        RegistroRefeicao.objects.bulk_create(lote, batch_size=tamanho_lote, ignore_conflicts=True)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import DuplicateKeyError
+from Sistema.utils.mongo.mongo_model import ControleRefeicoes, indices_redundantes
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria os índices das coleções de refeições (e monta o resumo do dashboard se estiver vazio) '
+        'e mostra tamanho e uso de cada um'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--somente-relatorio',
+            action='store_true',
+            help='Não cria índices, apenas mostra as estatísticas',
+        )
+
+    def handle(self, *args, **options):
+        controle = ControleRefeicoes()
+
+        if not options['somente_relatorio']:
+            try:
+                for nome in controle.criar_indices():
+                    self.stdout.write(self.style.SUCCESS(f"Índice garantido: {nome}"))
+            except DuplicateKeyError as e:
+                raise CommandError(
+                    "Existem refeições duplicadas (mesmo colaborador no mesmo dia); "
+                    f"remova as duplicatas antes de criar o índice único. Detalhe: {e}"
+                )
+
+        for colecao in (controle.collection, controle.resumo_collection):
+            self.stdout.write(f"\nÍndices da coleção {colecao.name}:")
+            for indice in controle.estatisticas_indices(colecao):
+                chaves = ", ".join(f"{campo} {direcao}" for campo, direcao in indice['chaves'])
+                self.stdout.write(
+                    f"  {indice['nome']} ({chaves}): {indice['tamanho'] / 1024:.1f} KB, "
+                    f"{indice['operacoes']} operações desde {indice['desde'] or '-'}"
+                )
+
+            redundantes = indices_redundantes(colecao.index_information())
+            for nome, coberto_por in redundantes:
+                self.stdout.write(self.style.WARNING(
+                    f"Índice redundante: {nome} (prefixo de {coberto_por}), pode ser removido"
+                ))
+            if not redundantes:
+                self.stdout.write(self.style.SUCCESS("Nenhum índice redundante."))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from Sistema.utils.mongo.mongo_model import ControleRefeicoes, COLECAO_TIMESERIES, TAMANHO_LOTE_MIGRACAO
+
+
+class Command(BaseCommand):
+    help = f'Copia os registros de refeições para a coleção time-series {COLECAO_TIMESERIES}'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanho-lote',
+            type=int,
+            default=TAMANHO_LOTE_MIGRACAO,
+            help='Registros copiados por inserção',
+        )
+
+    def handle(self, *args, **options):
+        origem = ControleRefeicoes(timeseries=False)
+        destino = ControleRefeicoes(timeseries=True)
+
+        try:
+            criada = destino.criar_colecao_timeseries()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        if criada:
+            self.stdout.write(self.style.SUCCESS(f"Coleção {COLECAO_TIMESERIES} criada."))
+
+        copiados = ignorados = 0
+        for copiados, ignorados in origem.copiar_registros(destino, options['tamanho_lote']):
+            self.stdout.write(f"  {copiados} registros copiados...")
+        if ignorados:
+            self.stdout.write(self.style.WARNING(
+                f"{ignorados} registros ignorados: colaborador já tinha refeição no mesmo dia no destino."
+            ))
+
+        for nome in destino.criar_indices():
+            self.stdout.write(f"Índice garantido: {nome}")
+
+        for controle in (origem, destino):
+            tamanho = controle.tamanho_colecao()
+            self.stdout.write(
+                f"{controle.collection.name}: {tamanho['documentos']} documentos, "
+                f"{tamanho['armazenamento'] / 1024:.1f} KB de dados, {tamanho['indices'] / 1024:.1f} KB de índices"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Migração concluída: {copiados} registros copiados nesta execução. "
+            "Defina REFEICOES_TIMESERIES = True para passar a usar a nova coleção."
+        ))
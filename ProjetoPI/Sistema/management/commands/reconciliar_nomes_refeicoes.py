@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from Sistema.models import Colaborador, Obra
+from Sistema.utils.backend_refeicoes import get_controle_refeicoes
+from Sistema.utils.mongo.mongo_model import TAMANHO_LOTE_NOMES
+
+
+class Command(BaseCommand):
+    help = 'Regrava colaborador_nome e obra_nome dos registros de refeições com os nomes atuais do cadastro'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE_NOMES, help='Cadastros corrigidos por lote')
+
+    def handle(self, *args, **options):
+        controle = get_controle_refeicoes()
+        for campo_nome, modelo in (('obra_nome', Obra), ('colaborador_nome', Colaborador)):
+            modificados = 0
+            nomes = {}
+            for item_id, nome in modelo.objects.order_by('id').values_list('id', 'nome').iterator(chunk_size=options['tamanho_lote']):
+                nomes[item_id] = nome
+                if len(nomes) >= options['tamanho_lote']:
+                    modificados += controle.corrigir_nomes(campo_nome, nomes)
+                    nomes = {}
+            if nomes:
+                modificados += controle.corrigir_nomes(campo_nome, nomes)
+            self.stdout.write(f"{campo_nome}: {modificados} documentos corrigidos.")
+        self.stdout.write(self.style.SUCCESS("Nomes reconciliados."))
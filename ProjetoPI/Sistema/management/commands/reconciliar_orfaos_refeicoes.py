@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from Sistema.models import Colaborador, Obra
+from Sistema.utils.mongo.mongo_model import COLECAO_ORFAOS, TAMANHO_LOTE_ORFAOS, ControleRefeicoes
+
+
+class Command(BaseCommand):
+    help = 'Remove os registros de refeições de colaboradores e obras que não existem mais no cadastro'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE_ORFAOS, help='Ids comparados por consulta')
+        parser.add_argument('--simular', action='store_true', help='Apenas informa o que seria removido')
+        parser.add_argument('--arquivar', action='store_true', help=f'Copia os registros para {COLECAO_ORFAOS} antes de apagar')
+
+    def handle(self, *args, **options):
+        controle = ControleRefeicoes()
+        for campo_id, modelo in (('obra_id', Obra), ('colaborador_id', Colaborador)):
+            # Só os órfãos ficam em memória; o cadastro e o Mongo são lidos em lotes
+            orfaos = set()
+            registros = 0
+            for lote in controle.iterar_ids_referenciados(campo_id, options['tamanho_lote']):
+                candidatos = {item_id for item_id in lote if isinstance(item_id, int)} - orfaos
+                if not candidatos:
+                    continue
+                novos = candidatos - set(modelo.objects.filter(id__in=candidatos).values_list('id', flat=True))
+                if not novos:
+                    continue
+                orfaos |= novos
+                if options['simular']:
+                    registros += controle.contar_registros_dos_ids(campo_id, novos)
+                else:
+                    registros += controle.excluir_registros_dos_ids(campo_id, novos, arquivar=options['arquivar'])
+
+            acao = "seriam removidos" if options['simular'] else ("arquivados" if options['arquivar'] else "removidos")
+            self.stdout.write(f"{campo_id}: {len(orfaos)} ids sem cadastro, {registros} registros {acao}.")
+            if orfaos and options['simular']:
+                self.stdout.write(f"  ids: {', '.join(str(item_id) for item_id in sorted(orfaos))}")
+
+        self.stdout.write(self.style.SUCCESS("Reconciliação concluída."))
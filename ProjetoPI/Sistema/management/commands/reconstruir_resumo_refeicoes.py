@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from Sistema.utils.mongo.mongo_model import ControleRefeicoes, COLECAO_RESUMO
+
+
+class Command(BaseCommand):
+    help = f'Recalcula a coleção {COLECAO_RESUMO} a partir de todos os registros de refeições'
+
+    def handle(self, *args, **kwargs):
+        controle = ControleRefeicoes()
+        total = controle.reconstruir_resumo()
+        controle.criar_indices()
+        self.stdout.write(self.style.SUCCESS(f"Resumo reconstruído: {total} documentos em {COLECAO_RESUMO}."))
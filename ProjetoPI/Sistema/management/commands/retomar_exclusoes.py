@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from Sistema.models import ExclusaoLote
+from Sistema.utils.exclusao_lotes import MINUTOS_EXCLUSAO_PARADA, TAMANHO_LOTE_EXCLUSAO, executar_exclusao, exclusoes_interrompidas
+
+
+class Command(BaseCommand):
+    help = 'Termina as exclusões em lotes interrompidas (processo reciclado ou derrubado no meio)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutos', type=int, default=MINUTOS_EXCLUSAO_PARADA,
+                            help='Considera interrompido o job sem progresso há esse tempo')
+        parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE_EXCLUSAO, help='Linhas apagadas por transação')
+
+    def handle(self, *args, **options):
+        retomados = 0
+        for job in exclusoes_interrompidas(options['minutos']):
+            # Assume o job só se ninguém o atualizou desde a leitura (outro processo retomando)
+            assumido = ExclusaoLote.objects.filter(pk=job.pk, atualizado_em=job.atualizado_em).update(
+                atualizado_em=timezone.now()
+            )
+            if not assumido:
+                continue
+            self.stdout.write(f"Retomando a exclusão {job.pk.hex} ({job.modelo}, {job.excluidos} de {job.total})...")
+            situacao = executar_exclusao(job.pk, options['tamanho_lote'])
+            if situacao['estado'] == 'erro':
+                self.stdout.write(self.style.ERROR(f"  erro: {situacao['erro']}"))
+            else:
+                self.stdout.write(f"  {situacao['excluidos']} registros excluídos.")
+            retomados += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{retomados} exclusões retomadas."))
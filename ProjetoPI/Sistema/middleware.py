@@ -0,0 +1,36 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from Sistema.utils.mongo.mongo_connection import view_atual
+
+
+class MonitorViewMiddleware:
+    """Marca os comandos Mongo da requisição com o nome da view que os executou.
+
+    Funciona nas duas pilhas: sob ASGI a requisição segue assíncrona, sem
+    passar por uma thread só por causa deste middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = view_atual.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            view_atual.reset(token)
+
+    async def __acall__(self, request):
+        token = view_atual.set(None)
+        try:
+            return await self.get_response(request)
+        finally:
+            view_atual.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_atual.set(getattr(view_func, "__name__", repr(view_func)))
@@ -0,0 +1,33 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Sistema', '0007_obra_hotel_vinculado_obra_restaurante_vinculado_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroRefeicao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_refeicao', models.DateField(verbose_name='Data da Refeição')),
+                ('valor_refeicao', models.DecimalField(decimal_places=2, max_digits=8, verbose_name='Valor da Refeição')),
+                ('registrado_em', models.DateTimeField(auto_now_add=True, verbose_name='Registrado em')),
+                ('mongo_id', models.CharField(blank=True, editable=False, max_length=24, null=True, unique=True)),
+                ('colaborador', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='refeicoes', to='Sistema.colaborador', verbose_name='Colaborador')),
+                ('obra', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='refeicoes', to='Sistema.obra', verbose_name='Obra')),
+                ('registrado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='refeicoes_registradas', to=settings.AUTH_USER_MODEL, verbose_name='Registrado por')),
+            ],
+            options={
+                'verbose_name': 'Registro de Refeição',
+                'verbose_name_plural': 'Registros de Refeições',
+                'indexes': [models.Index(fields=['data_refeicao', 'id'], name='refeicao_data_id_idx'), models.Index(fields=['obra', 'data_refeicao'], name='refeicao_obra_data_idx')],
+                'constraints': [models.UniqueConstraint(fields=('colaborador', 'data_refeicao'), name='refeicao_colaborador_dia_unica')],
+            },
+        ),
+    ]
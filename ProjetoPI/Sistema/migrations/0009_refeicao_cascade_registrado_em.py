@@ -0,0 +1,28 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Sistema', '0008_registrorefeicao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registrorefeicao',
+            name='colaborador',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='refeicoes', to='Sistema.colaborador', verbose_name='Colaborador'),
+        ),
+        migrations.AlterField(
+            model_name='registrorefeicao',
+            name='obra',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='refeicoes', to='Sistema.obra', verbose_name='Obra'),
+        ),
+        migrations.AlterField(
+            model_name='registrorefeicao',
+            name='registrado_em',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Registrado em'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalizar_busca(texto):
+    # Cópia de Sistema.models.normalizar_busca de quando a migração foi escrita
+    decomposto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
+def preencher_nome_busca(apps, schema_editor):
+    Colaborador = apps.get_model('Sistema', 'Colaborador')
+    colaboradores = []
+    for colaborador in Colaborador.objects.only('id', 'nome').iterator(chunk_size=1000):
+        colaborador.nome_busca = normalizar_busca(colaborador.nome)
+        colaboradores.append(colaborador)
+        if len(colaboradores) >= 1000:
+            Colaborador.objects.bulk_update(colaboradores, ['nome_busca'])
+            colaboradores = []
+    Colaborador.objects.bulk_update(colaboradores, ['nome_busca'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Sistema', '0009_refeicao_cascade_registrado_em'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='colaborador',
+            name='nome_busca',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(preencher_nome_busca, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Sistema', '0010_colaborador_nome_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExclusaoLote',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('modelo', models.CharField(max_length=50)),
+                ('ids', models.JSONField()),
+                ('estado', models.CharField(choices=[('pendente', 'Pendente'), ('em_andamento', 'Em andamento'), ('concluido', 'Concluído'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('excluidos', models.PositiveIntegerField(default=0)),
+                ('erro', models.TextField(blank=True, null=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Exclusão em Lotes',
+                'verbose_name_plural': 'Exclusões em Lotes',
+                'indexes': [models.Index(fields=['estado', 'atualizado_em'], name='exclusao_estado_idx')],
+            },
+        ),
+    ]
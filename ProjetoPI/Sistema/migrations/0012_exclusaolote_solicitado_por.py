@@ -0,0 +1,19 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Sistema', '0011_exclusaolote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exclusaolote',
+            name='solicitado_por',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exclusoes_lote', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
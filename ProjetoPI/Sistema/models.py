@@ -4,6 +4,9 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator
 from django.utils.translation import gettext_lazy as _
+from django.utils import timezone
+import unicodedata
+import uuid
 from django.contrib.auth.models import User
 from django.contrib.auth.models import Group, Permission
 from django.db.models.signals import post_migrate
@@ -162,6 +165,12 @@ class Obra(models.Model):
             return (self.data_real_termino - self.data_prevista_termino).days
         return 0
 
+def normalizar_busca(texto):
+    """Texto sem acentos e em minúsculas, como gravado em Colaborador.nome_busca."""
+    decomposto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
 class Colaborador(models.Model):
     """Modelo completo para colaboradores da construção"""
 
@@ -170,6 +179,13 @@ class Colaborador(models.Model):
         max_length=100,
         verbose_name="Nome Completo"
     )
+    # Nome normalizado (normalizar_busca) para a busca por prefixo usar índice
+    nome_busca = models.CharField(
+        max_length=100,
+        editable=False,
+        db_index=True,
+        default=""
+    )
         
     cpf = models.CharField(
         max_length=14,
@@ -227,6 +243,13 @@ class Colaborador(models.Model):
     def __str__(self):
         return f"{self.nome}"
 
+    def save(self, *args, **kwargs):
+        self.nome_busca = normalizar_busca(self.nome)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "nome" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "nome_busca"}
+        super().save(*args, **kwargs)
+
 
 class Restaurante(models.Model):
     """Modelo para restaurantes parceiros com avaliação"""
@@ -299,3 +322,104 @@ class Profile(models.Model):
     
 
  
+
+
+class RegistroRefeicao(models.Model):
+    """Refeição registrada (backend SQL dos registros, ver Sistema/utils/sql/sql_model.py)"""
+    colaborador = models.ForeignKey(
+        Colaborador,
+        on_delete=models.CASCADE,
+        verbose_name="Colaborador",
+        related_name='refeicoes'
+    )
+    # Obra do colaborador no dia da refeição (ele pode mudar de obra depois)
+    obra = models.ForeignKey(
+        Obra,
+        on_delete=models.CASCADE,
+        verbose_name="Obra",
+        related_name='refeicoes'
+    )
+    data_refeicao = models.DateField(
+        verbose_name="Data da Refeição"
+    )
+    valor_refeicao = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        verbose_name="Valor da Refeição"
+    )
+    registrado_em = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Registrado em"
+    )
+    registrado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Registrado por",
+        related_name='refeicoes_registradas'
+    )
+    # _id do documento de origem quando copiado do MongoDB (torna a cópia retomável)
+    mongo_id = models.CharField(
+        max_length=24,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False
+    )
+
+    class Meta:
+        verbose_name = "Registro de Refeição"
+        verbose_name_plural = "Registros de Refeições"
+        constraints = [
+            models.UniqueConstraint(fields=['colaborador', 'data_refeicao'], name='refeicao_colaborador_dia_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['data_refeicao', 'id'], name='refeicao_data_id_idx'),
+            models.Index(fields=['obra', 'data_refeicao'], name='refeicao_obra_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.colaborador} - {self.data_refeicao:%d/%m/%Y}"
+
+
+class ExclusaoLote(models.Model):
+    """Exclusão em lotes feita em segundo plano (ver Sistema/utils/exclusao_lotes.py).
+
+    Fica no banco para que qualquer processo responda à consulta de progresso
+    e para que uma exclusão interrompida possa ser retomada.
+    """
+    ESTADOS = [
+        ('pendente', 'Pendente'),
+        ('em_andamento', 'Em andamento'),
+        ('concluido', 'Concluído'),
+        ('erro', 'Erro'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    modelo = models.CharField(max_length=50)
+    ids = models.JSONField()
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendente')
+    total = models.PositiveIntegerField(default=0)
+    excluidos = models.PositiveIntegerField(default=0)
+    erro = models.TextField(null=True, blank=True)
+    solicitado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='exclusoes_lote'
+    )
+    criado_em = models.DateTimeField(auto_now_add=True)
+    # Renovado a cada lote: uma exclusão parada há muito tempo foi interrompida
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Exclusão em Lotes"
+        verbose_name_plural = "Exclusões em Lotes"
+        indexes = [
+            models.Index(fields=['estado', 'atualizado_em'], name='exclusao_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.modelo} ({self.get_estado_display()})"
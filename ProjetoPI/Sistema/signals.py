@@ -0,0 +1,70 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from Sistema.models import Colaborador, Obra
+from Sistema.utils.backend_refeicoes import get_controle_refeicoes
+
+logger = logging.getLogger(__name__)
+
+# Modelo renomeável -> campo com o nome nos registros de refeições
+CAMPOS_NOME_MODELO = {Colaborador: "colaborador_nome", Obra: "obra_nome"}
+
+_executor = None
+_lock_executor = Lock()
+
+
+def _obter_executor():
+    # Uma única thread: renomeações do mesmo cadastro são aplicadas na ordem
+    global _executor
+    if _executor is None:
+        with _lock_executor:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="propagar-nomes")
+    return _executor
+
+
+def _descartar_executor():
+    # O filho de um fork não herda a thread do executor
+    global _executor
+    _executor = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_descartar_executor)
+
+
+def propagar_nome(campo_nome, item_id, nome):
+    """Grava o novo nome nos registros de refeições; roda fora da requisição."""
+    try:
+        modificados = get_controle_refeicoes().corrigir_nomes(campo_nome, {item_id: nome})
+        logger.info("%s %s renomeado: %d registros de refeições atualizados", campo_nome, item_id, modificados)
+    except Exception:
+        logger.exception("Falha ao propagar %s do id %s; rode reconciliar_nomes_refeicoes", campo_nome, item_id)
+
+
+def agendar_propagacao(campo_nome, item_id, nome):
+    return _obter_executor().submit(propagar_nome, campo_nome, item_id, nome)
+
+
+@receiver(pre_save, sender=Colaborador)
+@receiver(pre_save, sender=Obra)
+def guardar_nome_anterior(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None or (update_fields is not None and "nome" not in update_fields):
+        return
+    instance._nome_anterior = sender.objects.filter(pk=instance.pk).values_list("nome", flat=True).first()
+
+
+@receiver(post_save, sender=Colaborador)
+@receiver(post_save, sender=Obra)
+def propagar_renomeacao(sender, instance, created, raw=False, **kwargs):
+    nome_anterior = getattr(instance, "_nome_anterior", None)
+    instance._nome_anterior = instance.nome
+    if raw or created or nome_anterior is None or nome_anterior == instance.nome:
+        return
+    # Só depois do commit: um rollback não deve renomear os registros
+    transaction.on_commit(partial(agendar_propagacao, CAMPOS_NOME_MODELO[sender], instance.pk, instance.nome))
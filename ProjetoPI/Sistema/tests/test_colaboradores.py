@@ -0,0 +1,63 @@
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+
+from Sistema.models import Colaborador, Obra
+from Sistema.utils.colaboradores import colaboradores_visiveis, filtrar_colaboradores, paginar_colaboradores
+
+
+class ColaboradoresTest(TestCase):
+
+    def setUp(self):
+        self.encarregado = User.objects.create_user(username='encarregado', password='pass123')
+        self.encarregado.groups.add(Group.objects.create(name='Encarregados'))
+        self.admin = User.objects.create_user(username='admin', password='pass123', is_superuser=True)
+        self.obra = Obra.objects.create(
+            nome='Obra A', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01',
+            encarregado_responsavel=self.encarregado,
+        )
+        self.outra_obra = Obra.objects.create(nome='Obra B', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01')
+        nomes = ['Ana', 'Bruno', 'Bruno', 'Carla', 'Diego']
+        self.colaboradores = [
+            Colaborador.objects.create(
+                nome=nome, cpf=f'{i}23.456.789-0{i}', data_nascimento='1990-01-01',
+                telefone='11999999999', endereco='Rua Y', obra=self.obra if i < 4 else self.outra_obra,
+            )
+            for i, nome in enumerate(nomes)
+        ]
+
+    def test_encarregado_ve_so_as_proprias_obras(self):
+        self.assertEqual(colaboradores_visiveis(self.encarregado).count(), 4)
+        self.assertEqual(colaboradores_visiveis(self.admin).count(), 5)
+
+    def test_paginacao_por_cursor_em_ordem_de_nome(self):
+        colaboradores = colaboradores_visiveis(self.admin)
+        with self.assertNumQueries(1):
+            primeira = paginar_colaboradores(colaboradores, limite=2)
+            self.assertEqual([c.obra.nome for c in primeira["colaboradores"]], ['Obra A', 'Obra A'])
+        self.assertIsNone(primeira["anterior"])
+        self.assertNotIn('Bruno', primeira["proximo"])
+
+        segunda = paginar_colaboradores(colaboradores, limite=2, apos=primeira["proximo"])
+        self.assertEqual([c.id for c in segunda["colaboradores"]], [self.colaboradores[2].id, self.colaboradores[3].id])
+        terceira = paginar_colaboradores(colaboradores, limite=2, apos=segunda["proximo"])
+        self.assertEqual([c.nome for c in terceira["colaboradores"]], ['Diego'])
+        self.assertIsNone(terceira["proximo"])
+
+        voltando = paginar_colaboradores(colaboradores, limite=2, antes=terceira["anterior"])
+        self.assertEqual(voltando["colaboradores"], segunda["colaboradores"])
+
+        with self.assertRaises(ValueError):
+            paginar_colaboradores(colaboradores, apos="invalido")
+
+    def test_filtros_por_obra_nome_e_cpf(self):
+        colaboradores = colaboradores_visiveis(self.admin)
+        self.assertEqual(filtrar_colaboradores(colaboradores, obra_id=str(self.outra_obra.id)).get().nome, 'Diego')
+        self.assertEqual(filtrar_colaboradores(colaboradores, busca='bru').count(), 2)
+        carla = self.colaboradores[3]
+        carla.nome = 'Cássia'
+        carla.save(update_fields=['nome'])
+        self.assertEqual(filtrar_colaboradores(colaboradores, busca='CASS').get().nome, 'Cássia')
+        self.assertEqual(filtrar_colaboradores(colaboradores, busca='323.4').get().nome, 'Cássia')
+        self.assertEqual(filtrar_colaboradores(colaboradores, busca='32345').get().nome, 'Cássia')
+        with self.assertRaises(ValueError):
+            filtrar_colaboradores(colaboradores, obra_id='x')
@@ -0,0 +1,88 @@
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import MagicMock, patch
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from Sistema.models import Colaborador, ExclusaoLote, Obra, RegistroRefeicao
+from Sistema.utils.exclusao_lotes import (
+    consultar_exclusao, contar_afetados, excluir_em_lotes, executar_exclusao, exclusoes_interrompidas, iniciar_exclusao,
+    referencias_protegidas,
+)
+
+
+class ExclusaoLotesTest(TestCase):
+
+    def setUp(self):
+        self.obra = Obra.objects.create(nome='Obra A', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01')
+        self.outra_obra = Obra.objects.create(nome='Obra B', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01')
+        self.colaboradores = [
+            Colaborador.objects.create(
+                nome=f'Colaborador {i}', cpf=f'{i}00.000.000-00', data_nascimento='1990-01-01',
+                telefone='11999999999', endereco='Rua Y', obra=self.obra if i < 5 else self.outra_obra,
+            )
+            for i in range(6)
+        ]
+
+    def test_exclui_dependentes_antes_em_lotes(self):
+        queryset = Obra.objects.filter(id__in=[self.obra.id])
+        self.assertEqual(contar_afetados(queryset), 6)
+        # Com limite, para de contar assim que ele é passado
+        with self.assertNumQueries(2):
+            self.assertEqual(contar_afetados(queryset, limite=3), 4)
+
+        lotes = []
+        self.assertEqual(excluir_em_lotes(queryset, tamanho_lote=2, progresso=lotes.append), 6)
+
+        self.assertEqual(lotes, [2, 2, 1, 1])
+        self.assertFalse(Obra.objects.filter(id=self.obra.id).exists())
+        self.assertEqual(Colaborador.objects.count(), 1)
+
+    @patch("Sistema.utils.exclusao_lotes._obter_executor")
+    def test_job_informa_progresso_no_banco(self, mock_executor):
+        with self.captureOnCommitCallbacks(execute=True):
+            job_id = iniciar_exclusao(Obra, [self.obra.id])
+
+        mock_executor.return_value.submit.assert_called_once()
+        self.assertEqual(consultar_exclusao(job_id), {
+            "estado": "pendente", "modelo": "Obra", "total": 0, "excluidos": 0, "erro": None,
+        })
+
+        situacao = executar_exclusao(job_id, tamanho_lote=2)
+        self.assertEqual(situacao["estado"], "concluido")
+        self.assertEqual(situacao["total"], 6)
+        self.assertEqual(consultar_exclusao(job_id)["excluidos"], 6)
+        self.assertIsNone(consultar_exclusao("inexistente"))
+        self.assertIsNone(consultar_exclusao(uuid.uuid4().hex))
+
+    @patch("Sistema.utils.exclusao_lotes._obter_executor", MagicMock())
+    def test_retoma_exclusao_interrompida(self):
+        job_id = iniciar_exclusao(Obra, [self.obra.id])
+        # Processo caiu depois de apagar parte dos colaboradores
+        Colaborador.objects.filter(id__in=[c.id for c in self.colaboradores[:3]]).delete()
+        ExclusaoLote.objects.filter(pk=job_id).update(
+            estado="em_andamento", excluidos=3, atualizado_em=timezone.now() - timedelta(hours=1),
+        )
+        self.assertEqual(exclusoes_interrompidas().count(), 1)
+
+        saida = StringIO()
+        call_command("retomar_exclusoes", stdout=saida)
+
+        self.assertIn("1 exclusões retomadas", saida.getvalue())
+        self.assertEqual(consultar_exclusao(job_id)["estado"], "concluido")
+        self.assertEqual(consultar_exclusao(job_id)["excluidos"], 6)
+        self.assertEqual(consultar_exclusao(job_id)["total"], 6)
+        self.assertFalse(Obra.objects.filter(id=self.obra.id).exists())
+        self.assertFalse(exclusoes_interrompidas().exists())
+
+    def test_refeicoes_sao_excluidas_com_a_obra(self):
+        RegistroRefeicao.objects.create(
+            colaborador=self.colaboradores[4], obra=self.obra, data_refeicao='2025-06-24', valor_refeicao=8,
+        )
+        queryset = Obra.objects.filter(id=self.obra.id)
+        self.assertIsNone(referencias_protegidas(queryset))
+
+        self.assertEqual(excluir_em_lotes(queryset, tamanho_lote=2), 7)
+        self.assertFalse(RegistroRefeicao.objects.exists())
@@ -0,0 +1,78 @@
+import threading
+import unittest
+
+from Sistema.utils.fila_escrita import FilaEscrita
+
+
+class TestFilaEscrita(unittest.TestCase):
+
+    def setUp(self):
+        self.lotes = []
+        self.fila = FilaEscrita(self.lotes.append, tamanho_lote=3, intervalo=10)
+
+    def tearDown(self):
+        self.fila.encerrar()
+
+    def test_junta_registros_de_varias_chamadas_em_lotes(self):
+        self.fila.enfileirar([1, 2])
+        self.fila.enfileirar([3, 4])
+        self.fila.enfileirar([5])
+        self.assertTrue(self.fila.esvaziar(timeout=5))
+
+        self.assertEqual([r for lote in self.lotes for r in lote], [1, 2, 3, 4, 5])
+        self.assertTrue(all(len(lote) <= 3 for lote in self.lotes))
+        estatisticas = self.fila.estatisticas()
+        self.assertEqual(estatisticas["profundidade"], 0)
+        self.assertEqual(estatisticas["pico_profundidade"], 5)
+        self.assertEqual(estatisticas["registros_gravados"], 5)
+        self.assertEqual(estatisticas["lotes"], len(self.lotes))
+        self.assertIsNotNone(estatisticas["latencia_media_ms"])
+
+    def test_grava_ao_atingir_tamanho_do_lote_sem_esperar_o_intervalo(self):
+        gravado = threading.Event()
+        fila = FilaEscrita(lambda lote: gravado.set(), tamanho_lote=2, intervalo=10)
+        fila.enfileirar([1, 2])
+        self.assertTrue(gravado.wait(5))
+        fila.encerrar()
+
+    def test_encerrar_grava_o_que_resta(self):
+        self.fila.enfileirar([1])
+        self.fila.encerrar()
+        self.assertEqual(self.lotes, [[1]])
+
+        # Depois de encerrada, grava direto na chamada
+        self.fila.enfileirar([2])
+        self.assertEqual(self.lotes, [[1], [2]])
+
+    def test_lote_com_falha_e_repetido_e_depois_descartado(self):
+        chamadas = []
+
+        def gravar(lote):
+            chamadas.append(lote)
+            raise RuntimeError("sem conexão")
+
+        fila = FilaEscrita(gravar, tamanho_lote=10, intervalo=0)
+        with self.assertLogs("Sistema.utils.fila_escrita", level="ERROR"):
+            fila.enfileirar([1, 2])
+            self.assertTrue(fila.esvaziar(timeout=5))
+        fila.encerrar()
+
+        self.assertEqual(len(chamadas), 3)
+        estatisticas = fila.estatisticas()
+        self.assertEqual(estatisticas["falhas"], 3)
+        self.assertEqual(estatisticas["registros_descartados"], 2)
+        self.assertEqual(estatisticas["registros_gravados"], 0)
+
+    def test_falhas_por_operacao_contam_como_erro(self):
+        fila = FilaEscrita(lambda lote: (len(lote) - 1, 1), tamanho_lote=10, intervalo=0)
+        registros = [{"colaborador_id": 13, "colaborador_nome": "Carlos"}, {"colaborador_id": 14, "colaborador_nome": "Ana"}]
+        with self.assertLogs("Sistema.utils.fila_escrita", level="ERROR") as logs:
+            fila.enfileirar(registros)
+            self.assertTrue(fila.esvaziar(timeout=5))
+        fila.encerrar()
+
+        estatisticas = fila.estatisticas()
+        self.assertEqual(estatisticas["registros_gravados"], 1)
+        self.assertEqual(estatisticas["registros_com_erro"], 1)
+        self.assertIn("[13, 14]", logs.output[0])
+        self.assertNotIn("Carlos", logs.output[0])
@@ -0,0 +1,110 @@
+from datetime import datetime
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from pymongo.errors import DuplicateKeyError
+
+from Sistema.models import Obra, Colaborador
+from Sistema.utils import backend_refeicoes
+from Sistema.utils.backend_refeicoes import get_controle_refeicoes
+from Sistema.utils.memoria.memoria_model import ControleRefeicoesMemoria
+
+
+class ControleRefeicoesMemoriaTest(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='encarregado', password='pass123')
+        self.obra = Obra.objects.create(nome='Obra A', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01')
+        self.outra_obra = Obra.objects.create(nome='Obra B', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01')
+        self.ana = Colaborador.objects.create(
+            nome='Ana', cpf='111.111.111-11', data_nascimento='1990-01-01',
+            telefone='11999999999', endereco='Rua Y', obra=self.obra,
+        )
+        self.bruno = Colaborador.objects.create(
+            nome='Bruno', cpf='222.222.222-22', data_nascimento='1990-01-01',
+            telefone='11999999999', endereco='Rua Y', obra=self.outra_obra,
+        )
+        self.controle = ControleRefeicoesMemoria()
+
+    def test_registrar_nao_duplica_colaborador_no_mesmo_dia(self):
+        resultado = self.controle.registrar_refeicoes("2025-06-24", [self.ana.id, self.bruno.id, "x"], self.usuario)
+        self.assertEqual(resultado, {"inseridos": 2, "existentes": 0, "falhas": 0, "nao_encontrados": ["x"]})
+
+        resultado = self.controle.registrar_refeicoes("2025-06-24", [self.ana.id], self.usuario)
+        self.assertEqual(resultado["inseridos"], 0)
+        self.assertEqual(resultado["existentes"], 1)
+
+    def test_resumo_dashboard_aplica_filtros(self):
+        self.controle.registrar_refeicoes("2025-06-24", [self.ana.id, self.bruno.id], self.usuario)
+        self.controle.registrar_refeicoes("2025-06-25", [self.ana.id], self.usuario)
+        self.controle.registrar_refeicoes("2025-07-01", [self.ana.id], self.usuario)
+
+        resumo = self.controle.resumo_dashboard({"data_inicio": "2025-06-01", "data_fim": "2025-06-30"})
+        self.assertEqual(resumo["total_refeicoes"], 3)
+        self.assertEqual(resumo["total_colaboradores"], 2)
+        self.assertEqual(resumo["soma_valor_refeicoes"], 24.0)
+        self.assertEqual([d["data_formatada"] for d in resumo["refeicoes_por_dia"]], ["24/06/25", "25/06/25"])
+
+        self.assertEqual(self.controle.total_refeicoes({"obra_id": str(self.outra_obra.id)}), 1)
+        self.assertEqual(
+            [o["obra_nome"] for o in self.controle.listar_obras_unicas()], ["Obra A", "Obra B"]
+        )
+        with self.assertRaises(ValueError):
+            self.controle.resumo_dashboard({"data_inicio": "24/06/2025"})
+
+    def test_listas_de_filtros_tem_um_item_por_id(self):
+        self.controle.registrar_refeicoes("2025-06-24", [self.ana.id], self.usuario)
+        self.ana.nome = 'Ana Souza'
+        self.ana.save()
+        self.controle.registrar_refeicoes("2025-06-25", [self.ana.id], self.usuario)
+
+        self.assertEqual(
+            self.controle.listar_colaboradores_unicos(),
+            [{"colaborador_id": self.ana.id, "colaborador_nome": "Ana Souza"}],
+        )
+
+    def test_paginacao_por_cursor(self):
+        for dia in range(1, 6):
+            self.controle.registrar_refeicoes(f"2025-06-0{dia}", [self.ana.id], self.usuario)
+
+        primeira = self.controle.listar_registros_paginados(limite=2)
+        self.assertEqual([r["data_refeicao"].day for r in primeira["registros"]], [5, 4])
+        self.assertIsNone(primeira["anterior"])
+
+        segunda = self.controle.listar_registros_paginados(limite=2, apos=primeira["proximo"])
+        self.assertEqual([r["data_refeicao"].day for r in segunda["registros"]], [3, 2])
+
+        voltando = self.controle.listar_registros_paginados(limite=2, antes=segunda["anterior"])
+        self.assertEqual([r["data_refeicao"].day for r in voltando["registros"]], [5, 4])
+
+    def test_atualizar_e_excluir(self):
+        self.controle.registrar_refeicoes("2025-06-24", [self.ana.id], self.usuario)
+        self.controle.registrar_refeicoes("2025-06-25", [self.ana.id], self.usuario)
+        registro = self.controle.listar_registros_paginados()["registros"][0]
+
+        with self.assertRaises(DuplicateKeyError):
+            self.controle.atualizar_data_refeicao(registro["id"], "2025-06-24")
+        self.assertEqual(self.controle.atualizar_data_refeicao(registro["id"], "2025-06-26").modified_count, 1)
+        self.assertEqual(self.controle.buscar_registro(registro["id"])["data_refeicao"], datetime(2025, 6, 26))
+
+        self.assertEqual(self.controle.excluir_registro(registro["id"]).deleted_count, 1)
+        self.assertIsNone(self.controle.buscar_registro(registro["id"]))
+        # O dia liberado pode ser registrado de novo
+        self.assertEqual(self.controle.registrar_refeicoes("2025-06-26", [self.ana.id], self.usuario)["inseridos"], 1)
+
+    def test_operacoes_em_lote(self):
+        self.controle.registrar_refeicoes("2025-06-24", [self.ana.id, self.bruno.id], self.usuario)
+        self.controle.registrar_refeicoes("2025-06-25", [self.ana.id], self.usuario)
+
+        resultado = self.controle.atualizar_data_refeicoes_em_lote("2025-06-25", filtros={"data_fim": "2025-06-24"})
+        self.assertEqual(resultado, {"atualizados": 1, "conflitos": 1})
+
+        self.assertEqual(self.controle.excluir_registros_em_lote(filtros={"obra_id": str(self.obra.id)}), {"excluidos": 2})
+        with self.assertRaises(ValueError):
+            self.controle.excluir_registros_em_lote(filtros={})
+
+    @override_settings(REFEICOES_BACKEND="Sistema.utils.memoria.memoria_model.ControleRefeicoesMemoria")
+    def test_get_controle_refeicoes_usa_backend_configurado(self):
+        backend_refeicoes._instancias.pop("Sistema.utils.memoria.memoria_model.ControleRefeicoesMemoria", None)
+        controle = get_controle_refeicoes()
+        self.assertIsInstance(controle, ControleRefeicoesMemoria)
+        self.assertIs(get_controle_refeicoes(), controle)
@@ -0,0 +1,134 @@
+import asyncio
+import unittest
+from unittest.mock import patch, MagicMock
+from asgiref.sync import iscoroutinefunction
+from django.test import override_settings
+
+from Sistema.middleware import MonitorViewMiddleware
+from Sistema.utils.mongo import mongo_connection
+
+
+class TestMongoConnection(unittest.TestCase):
+
+    def setUp(self):
+        mongo_connection._registro.update({"pid": None, "cliente": None})
+
+    def tearDown(self):
+        mongo_connection._registro.update({"pid": None, "cliente": None})
+
+    @patch("Sistema.utils.mongo.mongo_connection.MongoClient")
+    def test_cliente_criado_no_primeiro_uso_e_reutilizado(self, mock_mongo_client):
+        self.assertFalse(mock_mongo_client.called)
+        mongo_connection.get_mongo_client()
+        mongo_connection.get_mongo_client()
+        self.assertEqual(mock_mongo_client.call_count, 1)
+
+    @patch("Sistema.utils.mongo.mongo_connection.os.getpid")
+    @patch("Sistema.utils.mongo.mongo_connection.MongoClient")
+    def test_cliente_recriado_apos_fork(self, mock_mongo_client, mock_getpid):
+        mock_mongo_client.side_effect = lambda *args, **kwargs: MagicMock()
+        mock_getpid.return_value = 100
+        cliente_pai = mongo_connection.get_cliente()
+        mock_getpid.return_value = 101
+        cliente_filho = mongo_connection.get_cliente()
+        self.assertIsNot(cliente_pai, cliente_filho)
+        self.assertEqual(mock_mongo_client.call_count, 2)
+
+    @override_settings(MONGO={"URI": "mongodb://mongo:27017/", "BANCO": "teste", "MAX_POOL_SIZE": 7})
+    @patch("Sistema.utils.mongo.mongo_connection.MongoClient")
+    def test_configuracao_lida_do_settings(self, mock_mongo_client):
+        mongo_connection.get_mongo_client()
+        args, kwargs = mock_mongo_client.call_args
+        self.assertEqual(args[0], "mongodb://mongo:27017/")
+        self.assertEqual(kwargs["maxPoolSize"], 7)
+        self.assertEqual(kwargs["serverSelectionTimeoutMS"], 5000)  # padrão
+        mock_mongo_client.return_value.__getitem__.assert_called_with("teste")
+
+    def test_estatisticas_pool(self):
+        estatisticas = mongo_connection.EstatisticasPool()
+        estatisticas.connection_created(None)
+        estatisticas.connection_checked_out(None)
+        estatisticas.connection_checked_out(None)
+        estatisticas.connection_checked_in(None)
+        resumo = estatisticas.resumo()
+        self.assertEqual(resumo["abertas"], 1)
+        self.assertEqual(resumo["em_uso"], 1)
+        self.assertEqual(resumo["pico_em_uso"], 2)
+        self.assertEqual(resumo["checkouts"], 2)
+
+    def _evento(self, comando, duracao_micros=0, resposta=None, request_id=1):
+        evento = MagicMock()
+        evento.command_name = next(iter(comando))
+        evento.command = comando
+        evento.connection_id = ("localhost", 27017)
+        evento.request_id = request_id
+        evento.duration_micros = duracao_micros
+        evento.reply = resposta or {}
+        return evento
+
+    @override_settings(MONGO={"LIMITE_LENTO_MS": 100})
+    def test_monitor_comandos_agrupa_por_view_e_registra_lentas(self):
+        monitor = mongo_connection.MonitorComandos()
+        comando = {"find": "controle_diario", "filter": {"obra_id": 1, "data_refeicao": {"$gte": "2025-06-01"}}}
+
+        token = mongo_connection.view_atual.set("listar_registros")
+        try:
+            monitor.started(self._evento(comando, request_id=1))
+            monitor.succeeded(self._evento(comando, 50000, {"cursor": {"firstBatch": [{}, {}]}}, request_id=1))
+            monitor.started(self._evento(comando, request_id=2))
+            with self.assertLogs("Sistema.utils.mongo.mongo_connection", "WARNING") as logs:
+                monitor.succeeded(self._evento(comando, 150000, {"cursor": {"firstBatch": [{}]}}, request_id=2))
+        finally:
+            mongo_connection.view_atual.reset(token)
+
+        self.assertIn("{'obra_id': '?', 'data_refeicao': {'$gte': '?'}}", logs.output[0])
+        self.assertIn("listar_registros", logs.output[0])
+        operacao, = monitor.resumo()
+        self.assertEqual((operacao["view"], operacao["comando"], operacao["colecao"]), ("listar_registros", "find", "controle_diario"))
+        self.assertEqual(operacao["quantidade"], 2)
+        self.assertEqual(operacao["documentos"], 3)
+        self.assertEqual(operacao["lentas"], 1)
+        self.assertEqual(operacao["tempo_medio_ms"], 100.0)
+        self.assertEqual(operacao["tempo_maximo_ms"], 150.0)
+
+    def test_monitor_comandos_ignora_comandos_internos(self):
+        monitor = mongo_connection.MonitorComandos()
+        monitor.started(self._evento({"ping": 1}))
+        monitor.succeeded(self._evento({"ping": 1}))
+        self.assertEqual(monitor.resumo(), [])
+
+    def test_formato_filtro(self):
+        self.assertEqual(
+            mongo_connection.formato_filtro({"_id": {"$in": [1, 2, 3]}, "$or": [{"a": 1}, {"b": "x"}]}),
+            {"_id": {"$in": ["?"]}, "$or": [{"a": "?"}, {"b": "?"}]},
+        )
+
+
+
+class TestMonitorViewMiddleware(unittest.TestCase):
+
+    def test_pilha_assincrona_marca_e_limpa_a_view(self):
+        vistas = []
+
+        async def get_response(request):
+            middleware.process_view(request, listar_registros, (), {})
+            vistas.append(mongo_connection.view_atual.get())
+            return "resposta"
+
+        def listar_registros(request):
+            pass
+
+        middleware = MonitorViewMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertEqual(asyncio.run(middleware(MagicMock())), "resposta")
+        self.assertEqual(vistas, ["listar_registros"])
+        self.assertIsNone(mongo_connection.view_atual.get())
+
+    def test_pilha_sincrona(self):
+        middleware = MonitorViewMiddleware(lambda request: "resposta")
+        self.assertFalse(iscoroutinefunction(middleware))
+        self.assertEqual(middleware(MagicMock()), "resposta")
+
+
+if __name__ == '__main__':
+    unittest.main()
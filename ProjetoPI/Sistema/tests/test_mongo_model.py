@@ -2,24 +2,35 @@ import unittest
 from datetime import datetime
 from unittest.mock import patch, MagicMock
 from bson import ObjectId
+from django.core.cache import cache
+from django.test import override_settings
+from pymongo.errors import BulkWriteError
 
-from Sistema.utils.mongo.mongo_model import ControleRefeicoes
+from Sistema.utils.mongo.mongo_model import (
+    ControleRefeicoes, CHAVE_CACHE_ARQUIVOS, INDICES_CONTROLE_DIARIO, INDICES_RESUMO, indices_redundantes,
+)
 from Sistema.models import Colaborador
+from Sistema.utils.fila_escrita import FilaEscrita
 
 class TestControleRefeicoes(unittest.TestCase):
 
+    def setUp(self):
+        cache.clear()
+
     @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
-    @patch("Sistema.models.Colaborador.objects.get")
-    def test_registrar_refeicoes(self, mock_get_colaborador, mock_get_client):
+    @patch("Sistema.models.Colaborador.objects.select_related")
+    def test_registrar_refeicoes(self, mock_select_related, mock_get_client):
         mock_colaborador = MagicMock()
         mock_colaborador.id = 13
         mock_colaborador.nome = "Carlos Mendes"
         mock_colaborador.obra.id = 1
         mock_colaborador.obra.nome = "aeroporto"
-        mock_get_colaborador.return_value = mock_colaborador
+        mock_select_related.return_value.filter.return_value = [mock_colaborador]
 
         mock_collection = MagicMock()
-        mock_db = {"controle_diario": mock_collection}
+        mock_collection.bulk_write.return_value.upserted_ids = {0: ObjectId()}
+        mock_resumo = MagicMock()
+        mock_db = {"controle_diario": mock_collection, "controle_diario_resumo": mock_resumo}
         mock_get_client.return_value = mock_db
 
         controle = ControleRefeicoes()
@@ -27,14 +38,24 @@ class TestControleRefeicoes(unittest.TestCase):
         usuario_mock.id = 6
         usuario_mock.username = "joao"
 
-        controle.registrar_refeicoes("2025-06-25", [13], usuario_mock)
+        resultado = controle.registrar_refeicoes("2025-06-25", ["13"], usuario_mock)
 
-        self.assertTrue(mock_collection.insert_many.called)
+        self.assertTrue(mock_collection.bulk_write.called)
+        mock_select_related.assert_called_once_with("obra")
+        mock_select_related.return_value.filter.assert_called_once_with(id__in=[13])
+        self.assertEqual(resultado, {"inseridos": 1, "existentes": 0, "falhas": 0, "nao_encontrados": []})
+        operacoes = mock_collection.bulk_write.call_args[0][0]
+        self.assertEqual(operacoes[0]._filter, {"colaborador_id": 13, "data_refeicao": datetime(2025, 6, 25)})
+        self.assertTrue(operacoes[0]._upsert)
+        self.assertFalse(mock_collection.bulk_write.call_args.kwargs["ordered"])
+        operacao = mock_resumo.bulk_write.call_args[0][0][0]
+        self.assertEqual(operacao._filter, {"data_refeicao": datetime(2025, 6, 25), "obra_id": 1, "colaborador_id": 13})
+        self.assertEqual(operacao._doc["$inc"], {"total": 1, "soma_valor_refeicao": 8.0})
 
     @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
-    @patch("Sistema.models.Colaborador.objects.get")
-    def test_registrar_refeicao_colaborador_nao_encontrado(self, mock_get_colaborador, mock_get_client):
-        mock_get_colaborador.side_effect = Colaborador.DoesNotExist
+    @patch("Sistema.models.Colaborador.objects.select_related")
+    def test_registrar_refeicao_colaborador_nao_encontrado(self, mock_select_related, mock_get_client):
+        mock_select_related.return_value.filter.return_value = []
         mock_collection = MagicMock()
         mock_db = {"controle_diario": mock_collection}
         mock_get_client.return_value = mock_db
@@ -44,8 +65,90 @@ class TestControleRefeicoes(unittest.TestCase):
         usuario_mock.id = 99
         usuario_mock.username = "joao"
 
-        controle.registrar_refeicoes("2025-06-25", [999], usuario_mock)
-        mock_collection.insert_many.assert_not_called()
+        resultado = controle.registrar_refeicoes("2025-06-25", [999, "abc"], usuario_mock)
+        mock_collection.bulk_write.assert_not_called()
+        self.assertEqual(resultado["nao_encontrados"], ["abc", 999])
+
+    @patch("Sistema.utils.mongo.mongo_model.TAMANHO_LOTE_INSERCAO", 2)
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    @patch("Sistema.models.Colaborador.objects.select_related")
+    def test_registrar_refeicoes_em_lotes(self, mock_select_related, mock_get_client):
+        colaboradores = []
+        for i in range(5):
+            mock_colaborador = MagicMock()
+            mock_colaborador.id = i + 1
+            colaboradores.append(mock_colaborador)
+        mock_select_related.return_value.filter.return_value = colaboradores
+        mock_collection = MagicMock()
+        mock_collection.bulk_write.side_effect = lambda operacoes, ordered: MagicMock(
+            upserted_ids={i: ObjectId() for i in range(len(operacoes))}
+        )
+        mock_get_client.return_value = {"controle_diario": mock_collection, "controle_diario_resumo": MagicMock()}
+
+        controle = ControleRefeicoes()
+        resultado = controle.registrar_refeicoes("2025-06-25", [1, 2, 3, 4, 5], MagicMock())
+
+        self.assertEqual(mock_collection.bulk_write.call_count, 3)
+        self.assertEqual(resultado["inseridos"], 5)
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    @patch("Sistema.models.Colaborador.objects.select_related")
+    def test_registrar_refeicoes_reenvio_nao_duplica(self, mock_select_related, mock_get_client):
+        colaboradores = []
+        for i in range(3):
+            mock_colaborador = MagicMock()
+            mock_colaborador.id = i + 1
+            colaboradores.append(mock_colaborador)
+        mock_select_related.return_value.filter.return_value = colaboradores
+        mock_collection = MagicMock()
+        # Posição 0 é nova, 1 já existia, 2 foi gravada por outro envio simultâneo (chave duplicada)
+        mock_collection.bulk_write.side_effect = BulkWriteError({
+            "writeErrors": [{"index": 2, "code": 11000, "errmsg": "E11000 duplicate key"}],
+            "upserted": [{"index": 0, "_id": ObjectId()}],
+        })
+        mock_resumo = MagicMock()
+        mock_get_client.return_value = {"controle_diario": mock_collection, "controle_diario_resumo": mock_resumo}
+
+        resultado = ControleRefeicoes().registrar_refeicoes("2025-06-25", [1, 2, 3], MagicMock())
+
+        self.assertEqual(resultado["inseridos"], 1)
+        self.assertEqual(resultado["existentes"], 2)
+        self.assertEqual(resultado["falhas"], 0)
+        # Só o registro novo entra no resumo
+        self.assertEqual(len(mock_resumo.bulk_write.call_args[0][0]), 1)
+
+    @override_settings(REFEICOES_ESCRITA_ADIADA=True)
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    @patch("Sistema.models.Colaborador.objects.select_related")
+    def test_escrita_adiada_junta_requisicoes_em_um_lote(self, mock_select_related, mock_get_client):
+        colaboradores = []
+        for i in range(3):
+            mock_colaborador = MagicMock()
+            mock_colaborador.id = i + 1
+            mock_colaborador.obra.id = 1
+            colaboradores.append(mock_colaborador)
+        mock_collection = MagicMock()
+        mock_collection.bulk_write.side_effect = lambda operacoes, ordered: MagicMock(
+            upserted_ids={i: ObjectId() for i in range(len(operacoes))}
+        )
+        mock_get_client.return_value = {"controle_diario": mock_collection, "controle_diario_resumo": MagicMock()}
+
+        controle = ControleRefeicoes()
+        controle._fila_escrita = FilaEscrita(controle._gravar_registros, intervalo=10)
+        mock_select_related.return_value.filter.return_value = colaboradores[:2]
+        resultado = controle.registrar_refeicoes("2025-06-25", [1, 2], MagicMock())
+        # Reenvio do colaborador 2 e um terceiro colaborador, antes da gravação
+        mock_select_related.return_value.filter.return_value = colaboradores[1:]
+        controle.registrar_refeicoes("2025-06-25", [2, 3], MagicMock())
+
+        self.assertEqual(resultado, {"inseridos": 0, "existentes": 0, "falhas": 0, "enfileirados": 2, "nao_encontrados": []})
+        self.assertTrue(controle.fila_escrita.esvaziar(timeout=5))
+        controle.fila_escrita.encerrar()
+
+        self.assertEqual(mock_collection.bulk_write.call_count, 1)
+        operacoes = mock_collection.bulk_write.call_args[0][0]
+        self.assertEqual([op._filter["colaborador_id"] for op in operacoes], [1, 2, 3])
+        self.assertEqual(controle.fila_escrita.estatisticas()["registros_gravados"], 4)
 
     @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
     def test_listar_registros(self, mock_get_client):
@@ -57,6 +160,75 @@ class TestControleRefeicoes(unittest.TestCase):
         registros = controle.listar_registros()
         self.assertGreater(len(registros), 0)
 
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_listar_registros_paginados_primeira_pagina(self, mock_get_client):
+        registros = [
+            {"_id": ObjectId(), "data_refeicao": datetime(2025, 6, 25 - i), "colaborador_nome": "Carlos"}
+            for i in range(3)
+        ]
+        mock_collection = MagicMock()
+        mock_collection.find.return_value.sort.return_value.limit.return_value = registros
+        mock_get_client.return_value = {"controle_diario": mock_collection}
+
+        controle = ControleRefeicoes()
+        pagina = controle.listar_registros_paginados(limite=2)
+
+        query, projecao = mock_collection.find.call_args[0]
+        self.assertEqual(query, {})
+        self.assertNotIn("registrado_por_nome", projecao)
+        mock_collection.find.return_value.sort.return_value.limit.assert_called_once_with(3)
+        self.assertEqual(len(pagina["registros"]), 2)
+        self.assertIsNone(pagina["anterior"])
+        self.assertEqual(
+            controle._decodificar_cursor(pagina["proximo"]),
+            (registros[1]["data_refeicao"], registros[1]["_id"]),
+        )
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_listar_registros_paginados_antes_inverte_ordem(self, mock_get_client):
+        registros = [
+            {"_id": ObjectId(), "data_refeicao": datetime(2025, 6, 20 + i)}
+            for i in range(2)
+        ]
+        mock_collection = MagicMock()
+        mock_collection.find.return_value.sort.return_value.limit.return_value = list(registros)
+        mock_get_client.return_value = {"controle_diario": mock_collection}
+
+        controle = ControleRefeicoes()
+        cursor = controle._codificar_cursor({"_id": ObjectId(), "data_refeicao": datetime(2025, 6, 19)})
+        pagina = controle.listar_registros_paginados(limite=5, antes=cursor)
+
+        query = mock_collection.find.call_args[0][0]
+        self.assertIn("$gt", query["$or"][0]["data_refeicao"])
+        self.assertEqual([r["_id"] for r in pagina["registros"]], [r["_id"] for r in reversed(registros)])
+        self.assertIsNone(pagina["anterior"])
+        self.assertIsNotNone(pagina["proximo"])
+
+    def test_decodificar_cursor_invalido(self):
+        controle = ControleRefeicoes()
+        with self.assertRaises(ValueError):
+            controle._decodificar_cursor("lixo")
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_iterar_registros_usa_cursor_em_lotes(self, mock_get_client):
+        mock_collection = MagicMock()
+        cursor = mock_collection.find.return_value.sort.return_value.batch_size.return_value
+        cursor.__iter__.return_value = iter([{"colaborador_id": 13}, {"colaborador_id": 7}])
+        mock_get_client.return_value = {"controle_diario": mock_collection}
+
+        controle = ControleRefeicoes()
+        registros = controle.iterar_registros({"obra_id": "1"}, tamanho_lote=50)
+
+        self.assertEqual(mock_collection.find.call_args[0][0], {"obra_id": 1})
+        mock_collection.find.return_value.sort.return_value.batch_size.assert_called_once_with(50)
+        self.assertEqual([r["colaborador_id"] for r in registros], [13, 7])
+        cursor.close.assert_called_once()
+
+    def test_iterar_registros_filtro_invalido_falha_na_chamada(self):
+        controle = ControleRefeicoes()
+        with self.assertRaises(ValueError):
+            controle.iterar_registros({"data_inicio": "25/06/2025"})
+
     @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
     def test_buscar_registro(self, mock_get_client):
         mock_collection = MagicMock()
@@ -70,22 +242,65 @@ class TestControleRefeicoes(unittest.TestCase):
     @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
     def test_atualizar_data_refeicao(self, mock_get_client):
         mock_collection = MagicMock()
+        mock_collection.find_one.return_value = {
+            "_id": ObjectId(), "data_refeicao": datetime(2025, 6, 24), "obra_id": 1,
+            "colaborador_id": 13, "valor_refeicao": 8.0,
+        }
         mock_collection.update_one.return_value.modified_count = 1
-        mock_get_client.return_value = {"controle_diario": mock_collection}
+        mock_resumo = MagicMock()
+        mock_get_client.return_value = {"controle_diario": mock_collection, "controle_diario_resumo": mock_resumo}
 
         controle = ControleRefeicoes()
         result = controle.atualizar_data_refeicao(ObjectId(), "2025-06-25")
         self.assertEqual(result.modified_count, 1)
 
+        # Sai do dia antigo e entra no novo dia do resumo
+        decremento, incremento = [c[0][0][0] for c in mock_resumo.bulk_write.call_args_list]
+        self.assertEqual(decremento._filter["data_refeicao"], datetime(2025, 6, 24))
+        self.assertEqual(decremento._doc["$inc"]["total"], -1)
+        self.assertEqual(incremento._filter["data_refeicao"], datetime(2025, 6, 25))
+        self.assertEqual(incremento._doc["$inc"]["total"], 1)
+
     @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
     def test_excluir_registro(self, mock_get_client):
         mock_collection = MagicMock()
+        mock_collection.find_one.return_value = {
+            "_id": ObjectId(), "data_refeicao": datetime(2025, 6, 24), "obra_id": 1,
+            "colaborador_id": 13, "valor_refeicao": 8.0,
+        }
         mock_collection.delete_one.return_value.deleted_count = 1
-        mock_get_client.return_value = {"controle_diario": mock_collection}
+        mock_resumo = MagicMock()
+        mock_get_client.return_value = {"controle_diario": mock_collection, "controle_diario_resumo": mock_resumo}
 
         controle = ControleRefeicoes()
         result = controle.excluir_registro(ObjectId())
         self.assertEqual(result.deleted_count, 1)
+        operacoes = mock_resumo.bulk_write.call_args[0][0]
+        self.assertEqual(operacoes[0]._doc["$inc"], {"total": -1, "soma_valor_refeicao": -8.0})
+        self.assertEqual(operacoes[1]._filter["total"], {"$lte": 0})
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_excluir_registro_inexistente_nao_altera_resumo(self, mock_get_client):
+        mock_collection = MagicMock()
+        mock_collection.find_one.return_value = None
+        mock_collection.delete_one.return_value.deleted_count = 0
+        mock_get_client.return_value = {"controle_diario": mock_collection}
+
+        controle = ControleRefeicoes()
+        result = controle.excluir_registro(ObjectId())
+        self.assertEqual(result.deleted_count, 0)
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_reconstruir_resumo(self, mock_get_client):
+        mock_collection = MagicMock()
+        mock_resumo = MagicMock()
+        mock_resumo.estimated_document_count.return_value = 42
+        mock_get_client.return_value = {"controle_diario": mock_collection, "controle_diario_resumo": mock_resumo}
+
+        controle = ControleRefeicoes()
+        self.assertEqual(controle.reconstruir_resumo(), 42)
+        pipeline = mock_collection.aggregate.call_args[0][0]
+        self.assertEqual(pipeline[-1], {"$out": "controle_diario_resumo"})
 
     def test_construir_query_completa(self):
         controle = ControleRefeicoes()
@@ -149,11 +364,119 @@ class TestControleRefeicoes(unittest.TestCase):
         controle = ControleRefeicoes()
         self.assertEqual(controle.somar_valor_refeicoes({}), 0)
 
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_resumo_dashboard(self, mock_get_client):
+        mock_collection = MagicMock()
+        mock_collection.aggregate.return_value = iter([{
+            "totais": [{"_id": None, "total": 3, "soma_valor_refeicao": 24.0}],
+            "colaboradores": [{"total": 2}],
+            "por_dia": [{"_id": datetime(2025, 6, 25), "total": 3, "soma_valor_refeicao": 24.0}],
+        }])
+        mock_get_client.return_value = {"controle_diario": MagicMock(), "controle_diario_resumo": mock_collection}
+
+        controle = ControleRefeicoes()
+        resumo = controle.resumo_dashboard({"obra_id": "1"})
+
+        mock_collection.aggregate.assert_called_once()
+        pipeline = mock_collection.aggregate.call_args[0][0]
+        self.assertEqual(pipeline[0], {"$match": {"obra_id": 1}})
+        self.assertIn("$facet", pipeline[1])
+        self.assertEqual(resumo["total_refeicoes"], 3)
+        self.assertEqual(resumo["total_colaboradores"], 2)
+        self.assertEqual(resumo["soma_valor_refeicoes"], 24.0)
+        self.assertEqual(resumo["refeicoes_por_dia"][0]["data_formatada"], "25/06/25")
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_totais_por_obra_mes_agrupa_o_resumo(self, mock_get_client):
+        mock_resumo = MagicMock()
+        mock_resumo.aggregate.return_value = iter([
+            {"_id": {"obra_id": 1, "ano": 2025, "mes": 6}, "total": 40, "soma_valor_refeicao": 320.0},
+        ])
+        mock_get_client.return_value = {"controle_diario": MagicMock(), "controle_diario_resumo": mock_resumo}
+
+        controle = ControleRefeicoes()
+        totais = controle.totais_por_obra_mes({"data_inicio": "2025-06-01"})
+
+        self.assertEqual(totais, [{"obra_id": 1, "ano": 2025, "mes": 6, "total": 40, "soma_valor_refeicao": 320.0}])
+        pipeline = mock_resumo.aggregate.call_args[0][0]
+        self.assertEqual(pipeline[0], {"$match": {"data_refeicao": {"$gte": datetime(2025, 6, 1)}}})
+        self.assertEqual(pipeline[1]["$group"]["_id"]["mes"], {"$month": "$data_refeicao"})
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_resumo_dashboard_em_cache_ate_a_proxima_escrita(self, mock_get_client):
+        mock_resumo = MagicMock()
+        mock_resumo.aggregate.side_effect = lambda pipeline: iter([{
+            "totais": [{"_id": None, "total": 3, "soma_valor_refeicao": 24.0}],
+            "colaboradores": [{"total": 2}],
+            "por_dia": [],
+        }])
+        mock_collection = MagicMock()
+        mock_collection.find_one.return_value = {
+            "_id": ObjectId(), "data_refeicao": datetime(2025, 6, 24), "obra_id": 1,
+            "colaborador_id": 13, "valor_refeicao": 8.0,
+        }
+        mock_collection.delete_one.return_value.deleted_count = 1
+        mock_get_client.return_value = {"controle_diario": mock_collection, "controle_diario_resumo": mock_resumo}
+
+        controle = ControleRefeicoes()
+        controle.resumo_dashboard({"obra_id": "1", "data_inicio": "2025-06-01"})
+        # Mesmo filtro (normalizado), em outra ordem e com chave vazia
+        resumo = controle.resumo_dashboard({"data_inicio": "2025-06-01", "obra_id": "1", "colaborador_id": ""})
+        self.assertEqual(resumo["total_refeicoes"], 3)
+        self.assertEqual(mock_resumo.aggregate.call_count, 1)
+
+        controle.resumo_dashboard({"obra_id": "2", "data_inicio": "2025-06-01"})
+        self.assertEqual(mock_resumo.aggregate.call_count, 2)
+
+        controle.excluir_registro(ObjectId())
+        controle.resumo_dashboard({"obra_id": "1", "data_inicio": "2025-06-01"})
+        self.assertEqual(mock_resumo.aggregate.call_count, 3)
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_geracao_expulsa_do_cache_nao_traz_resultado_antigo(self, mock_get_client):
+        mock_collection = MagicMock()
+        mock_collection.count_documents.return_value = 5
+        mock_get_client.return_value = {"controle_diario": mock_collection}
+
+        controle = ControleRefeicoes()
+        controle.total_refeicoes({"obra_id": "1"})
+        controle._invalidar_resultados()
+        mock_collection.count_documents.return_value = 6
+        self.assertEqual(controle.total_refeicoes({"obra_id": "1"}), 6)
+
+        cache.delete("refeicoes:geracao")
+        self.assertEqual(controle.total_refeicoes({"obra_id": "1"}), 6)
+        self.assertEqual(mock_collection.count_documents.call_count, 3)
+
+    @override_settings(REFEICOES_CACHE_RESULTADOS_TTL=0)
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_cache_de_resultados_desligado(self, mock_get_client):
+        mock_collection = MagicMock()
+        mock_collection.count_documents.return_value = 5
+        mock_get_client.return_value = {"controle_diario": mock_collection}
+
+        controle = ControleRefeicoes()
+        controle.total_refeicoes({"obra_id": "1"})
+        controle.total_refeicoes({"obra_id": "1"})
+        self.assertEqual(mock_collection.count_documents.call_count, 2)
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_resumo_dashboard_sem_registros(self, mock_get_client):
+        mock_collection = MagicMock()
+        mock_collection.aggregate.return_value = iter([{"totais": [], "colaboradores": [], "por_dia": []}])
+        mock_get_client.return_value = {"controle_diario": MagicMock(), "controle_diario_resumo": mock_collection}
+
+        controle = ControleRefeicoes()
+        resumo = controle.resumo_dashboard({})
+        self.assertEqual(resumo["total_refeicoes"], 0)
+        self.assertEqual(resumo["total_colaboradores"], 0)
+        self.assertEqual(resumo["refeicoes_por_dia"], [])
+
     @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
     def test_listar_obras_unicas(self, mock_get_client):
         mock_collection = MagicMock()
         mock_collection.aggregate.return_value = [{"obra_id": 1, "obra_nome": "aeroporto"}]
-        mock_get_client.return_value = {"controle_diario": mock_collection}
+        mock_get_client.return_value = {"controle_diario": MagicMock(), "controle_diario_resumo": mock_collection}
 
         controle = ControleRefeicoes()
         resultado = list(controle.listar_obras_unicas())
@@ -167,11 +490,536 @@ class TestControleRefeicoes(unittest.TestCase):
             {"colaborador_id": 7, "colaborador_nome": "Carlos Mendes"},
             {"colaborador_id": 8, "colaborador_nome": "Ana Souza"},
         ]
-        mock_get_client.return_value = {"controle_diario": mock_collection}
+        mock_get_client.return_value = {"controle_diario": MagicMock(), "controle_diario_resumo": mock_collection}
 
         controle = ControleRefeicoes()
         resultado = list(controle.listar_colaboradores_unicos())
         self.assertEqual(len(resultado), 3)
 
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_listas_de_filtros_ficam_em_cache(self, mock_get_client):
+        mock_resumo = MagicMock()
+        mock_resumo.aggregate.return_value = [{"obra_id": 1, "obra_nome": "aeroporto"}]
+        mock_get_client.return_value = {"controle_diario_resumo": mock_resumo}
+
+        controle = ControleRefeicoes()
+        controle.listar_obras_unicas()
+        self.assertEqual(controle.listar_obras_unicas(), [{"obra_id": 1, "obra_nome": "aeroporto"}])
+        self.assertEqual(mock_resumo.aggregate.call_count, 1)
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    @patch("Sistema.models.Colaborador.objects.select_related")
+    def test_registrar_colaborador_novo_invalida_cache(self, mock_select_related, mock_get_client):
+        cache.set("refeicoes:obras_unicas", [{"obra_id": 1, "obra_nome": "aeroporto"}])
+        cache.set("refeicoes:colaboradores_unicos", [{"colaborador_id": 13, "colaborador_nome": "Carlos"}])
+        mock_colaborador = MagicMock()
+        mock_colaborador.id = 14
+        mock_colaborador.obra.id = 1
+        mock_select_related.return_value.filter.return_value = [mock_colaborador]
+        mock_get_client.return_value = {"controle_diario": MagicMock(), "controle_diario_resumo": MagicMock()}
+
+        ControleRefeicoes().registrar_refeicoes("2025-06-25", [14], MagicMock())
+
+        self.assertIsNotNone(cache.get("refeicoes:obras_unicas"))
+        self.assertIsNone(cache.get("refeicoes:colaboradores_unicos"))
+
+    def test_buscar_colaboradores_unicos(self):
+        cache.set("refeicoes:colaboradores_unicos", [
+            {"colaborador_id": 8, "colaborador_nome": "Ana Souza"},
+            {"colaborador_id": 13, "colaborador_nome": "Carlos Mendes"},
+            {"colaborador_id": 7, "colaborador_nome": "Mariana Costa"},
+        ])
+        controle = ControleRefeicoes()
+        self.assertEqual([c["colaborador_id"] for c in controle.buscar_colaboradores_unicos("ana")], [8, 7])
+        self.assertEqual(controle.buscar_colaboradores_unicos("ana", limite=1)[0]["colaborador_id"], 8)
+        self.assertEqual(controle.buscar_colaboradores_unicos(""), [])
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_atualizar_data_refeicoes_em_lote(self, mock_get_client):
+        registros = [
+            {"_id": ObjectId(), "colaborador_id": i, "obra_id": 1, "data_refeicao": datetime(2025, 6, 24)}
+            for i in range(3)
+        ]
+        mock_collection = MagicMock()
+        mock_collection.find.return_value = registros
+        # Um dos colaboradores já tinha refeição na nova data
+        mock_collection.bulk_write.side_effect = BulkWriteError({
+            "nModified": 2, "writeErrors": [{"index": 1, "code": 11000}],
+        })
+        mock_resumo = MagicMock()
+        mock_get_client.return_value = {"controle_diario": mock_collection, "controle_diario_resumo": mock_resumo}
+
+        controle = ControleRefeicoes()
+        resultado = controle.atualizar_data_refeicoes_em_lote("2025-06-25", ids=[str(r["_id"]) for r in registros])
+
+        self.assertEqual(resultado, {"atualizados": 2, "conflitos": 1})
+        self.assertEqual(mock_collection.bulk_write.call_count, 1)
+        self.assertEqual(len(mock_collection.bulk_write.call_args[0][0]), 3)
+        # O resumo é recalculado para o dia antigo e o novo
+        pipeline = mock_collection.aggregate.call_args[0][0]
+        match = pipeline[0]["$match"]
+        self.assertCountEqual(match["data_refeicao"]["$in"], [datetime(2025, 6, 24), datetime(2025, 6, 25)])
+        self.assertIn("$merge", pipeline[-1])
+        # Depois do $merge, só as chaves do retângulo que não foram regravadas são apagadas
+        recalculo = pipeline[-2]["$set"]["recalculo"]
+        mock_resumo.delete_many.assert_called_once_with(dict(match, recalculo={"$ne": recalculo}))
+        mock_collection.aggregate.assert_called_once()
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_resumo_vazio_e_montado_na_primeira_leitura(self, mock_get_client):
+        mock_collection = MagicMock()
+        mock_resumo = MagicMock()
+        mock_resumo.find_one.return_value = None
+        mock_resumo.aggregate.return_value = iter([])
+        mock_get_client.return_value = {"controle_diario": mock_collection, "controle_diario_resumo": mock_resumo}
+
+        controle = ControleRefeicoes()
+        controle.resumo_dashboard({})
+        controle.totais_por_obra_mes({})
+
+        nomes = [chamada.kwargs["name"] for chamada in mock_resumo.create_index.call_args_list]
+        self.assertEqual(nomes, [i["nome"] for i in INDICES_RESUMO])
+        self.assertTrue(mock_resumo.create_index.call_args_list[0].kwargs["unique"])
+        # $out a partir dos registros brutos, uma vez só por instância
+        mock_collection.aggregate.assert_called_once()
+        self.assertEqual(mock_collection.aggregate.call_args[0][0][-1], {"$out": "controle_diario_resumo"})
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_excluir_registros_em_lote_por_filtro(self, mock_get_client):
+        registros = [{"_id": ObjectId(), "colaborador_id": 13, "obra_id": 1, "data_refeicao": datetime(2025, 6, 24)}]
+        mock_collection = MagicMock()
+        mock_collection.find.return_value = registros
+        mock_collection.bulk_write.return_value.deleted_count = 1
+        mock_get_client.return_value = {"controle_diario": mock_collection, "controle_diario_resumo": MagicMock()}
+
+        controle = ControleRefeicoes()
+        resultado = controle.excluir_registros_em_lote(filtros={"obra_id": "1", "data_inicio": "2025-06-24"})
+
+        self.assertEqual(resultado, {"excluidos": 1})
+        self.assertEqual(mock_collection.find.call_args[0][0]["obra_id"], 1)
+
+    def test_operacao_em_lote_exige_ids_ou_filtro(self):
+        controle = ControleRefeicoes()
+        with self.assertRaises(ValueError):
+            controle.excluir_registros_em_lote(ids=[], filtros={"obra_id": None})
+        with self.assertRaises(ValueError):
+            controle.excluir_registros_em_lote(ids=["nao-e-um-id"])
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_criar_indices(self, mock_get_client):
+        mock_collection = MagicMock()
+        mock_collection.create_index.side_effect = lambda chaves, name, **kwargs: name
+        mock_resumo = MagicMock()
+        mock_resumo.create_index.side_effect = lambda chaves, name, **kwargs: name
+        mock_get_client.return_value = {"controle_diario": mock_collection, "controle_diario_resumo": mock_resumo}
+
+        controle = ControleRefeicoes()
+        criados = controle.criar_indices()
+
+        self.assertEqual(criados, [i["nome"] for i in INDICES_CONTROLE_DIARIO + INDICES_RESUMO])
+        for chamada in mock_collection.create_index.call_args_list:
+            self.assertNotIn("background", chamada.kwargs)
+        self.assertTrue(mock_resumo.create_index.call_args_list[0].kwargs["unique"])
+
+    def test_indices_redundantes(self):
+        indices = {
+            "_id_": {"key": [("_id", 1)]},
+            "obra": {"key": [("obra_id", 1)]},
+            "obra_data": {"key": [("obra_id", 1), ("data_refeicao", 1)]},
+            "obra_desc": {"key": [("obra_id", -1)]},
+            "unico": {"key": [("colaborador_id", 1)], "unique": True},
+            "colaborador_data": {"key": [("colaborador_id", 1), ("data_refeicao", 1)]},
+            "colaborador_data_unico": {"key": [("colaborador_id", 1), ("data_refeicao", 1)], "unique": True},
+        }
+        self.assertEqual(
+            indices_redundantes(indices),
+            [("obra", "obra_data"), ("colaborador_data", "colaborador_data_unico")],
+        )
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    @patch("Sistema.models.Colaborador.objects.select_related")
+    def test_registrar_refeicoes_timeseries(self, mock_select_related, mock_get_client):
+        colaboradores = []
+        for colaborador_id in (13, 14):
+            colaborador = MagicMock()
+            colaborador.id = colaborador_id
+            colaborador.nome = f"Colaborador {colaborador_id}"
+            colaborador.obra.id = 1
+            colaborador.obra.nome = "aeroporto"
+            colaboradores.append(colaborador)
+        mock_select_related.return_value.filter.return_value = colaboradores
+
+        mock_collection = MagicMock()
+        # O colaborador 13 já tem refeição no dia
+        mock_collection.distinct.return_value = [13]
+        mock_get_client.return_value = {
+            "controle_diario_ts": mock_collection, "controle_diario_ts_chaves": MagicMock(), "controle_diario_resumo": MagicMock(),
+        }
+
+        controle = ControleRefeicoes(timeseries=True)
+        resultado = controle.registrar_refeicoes("2025-06-25", ["13", "14"], MagicMock())
+
+        self.assertEqual(resultado, {"inseridos": 1, "existentes": 1, "falhas": 0, "nao_encontrados": []})
+        self.assertEqual(mock_collection.distinct.call_args[0], (
+            "meta.colaborador_id",
+            {"meta.colaborador_id": {"$in": [13, 14]}, "data_refeicao": datetime(2025, 6, 25)},
+        ))
+        mock_collection.bulk_write.assert_not_called()
+        documentos = mock_collection.insert_many.call_args[0][0]
+        self.assertEqual(len(documentos), 1)
+        self.assertEqual(documentos[0]["meta"], {"obra_id": 1, "colaborador_id": 14})
+        self.assertNotIn("colaborador_id", documentos[0])
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    @patch("Sistema.models.Colaborador.objects.select_related")
+    def test_registrar_timeseries_simultaneo_grava_uma_vez(self, mock_select_related, mock_get_client):
+        colaboradores = []
+        for colaborador_id in (13, 14, 15):
+            colaborador = MagicMock()
+            colaborador.id = colaborador_id
+            colaborador.obra.id = 1
+            colaboradores.append(colaborador)
+        mock_select_related.return_value.filter.return_value = colaboradores
+
+        mock_collection = MagicMock()
+        mock_collection.distinct.return_value = []
+        chaves = MagicMock()
+        # 13 está sendo gravado por outro envio; 14 sobrou de um registro excluído
+        chaves.insert_many.side_effect = BulkWriteError({"writeErrors": [
+            {"index": 0, "code": 11000, "errmsg": "duplicate key"},
+            {"index": 1, "code": 11000, "errmsg": "duplicate key"},
+        ]})
+        chaves.update_one.side_effect = lambda filtro, atualizacao: MagicMock(modified_count=int(filtro["_id"]["c"] == 14))
+        mock_get_client.return_value = {
+            "controle_diario_ts": mock_collection, "controle_diario_ts_chaves": chaves, "controle_diario_resumo": MagicMock(),
+        }
+
+        resultado = ControleRefeicoes(timeseries=True).registrar_refeicoes("2025-06-25", [13, 14, 15], MagicMock())
+
+        self.assertEqual(resultado, {"inseridos": 2, "existentes": 1, "falhas": 0, "nao_encontrados": []})
+        marcadores = chaves.insert_many.call_args[0][0]
+        self.assertEqual(marcadores[0]["_id"], {"c": 13, "d": datetime(2025, 6, 25)})
+        documentos = mock_collection.insert_many.call_args[0][0]
+        self.assertEqual(sorted(d["meta"]["colaborador_id"] for d in documentos), [14, 15])
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_consultas_timeseries_usam_campos_de_meta(self, mock_get_client):
+        mock_collection = MagicMock()
+        mock_collection.distinct.return_value = [13]
+        mock_collection.find_one.return_value = {"_id": ObjectId(), "meta": {"obra_id": 1, "colaborador_id": 13}}
+        mock_get_client.return_value = {
+            "controle_diario_ts": mock_collection, "controle_diario_ts_chaves": MagicMock(), "controle_diario_resumo": MagicMock(),
+        }
+
+        controle = ControleRefeicoes(timeseries=True)
+        self.assertEqual(controle.total_colaboradores_unicos({"obra_id": "1", "data_inicio": "2025-06-01"}), 1)
+        self.assertEqual(mock_collection.distinct.call_args[0], (
+            "meta.colaborador_id",
+            {"data_refeicao": {"$gte": datetime(2025, 6, 1)}, "meta.obra_id": 1},
+        ))
+
+        registro = controle.buscar_registro(ObjectId())
+        self.assertEqual((registro["obra_id"], registro["colaborador_id"]), (1, 13))
+        self.assertNotIn("meta", registro)
+
+        controle.reconstruir_resumo()
+        pipeline = mock_collection.aggregate.call_args[0][0]
+        self.assertEqual(pipeline[1], {"$set": {"obra_id": "$meta.obra_id", "colaborador_id": "$meta.colaborador_id"}})
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_atualizar_data_em_lote_timeseries_conta_conflitos(self, mock_get_client):
+        registros = [
+            {"_id": ObjectId(), "meta": {"colaborador_id": colaborador_id, "obra_id": 1}, "data_refeicao": datetime(2025, 6, 24)}
+            for colaborador_id in (1, 2, 2)
+        ]
+        mock_collection = MagicMock()
+        mock_collection.find.return_value = registros
+        # O colaborador 1 já tem refeição na nova data
+        mock_collection.distinct.return_value = [1]
+        mock_collection.bulk_write.return_value.modified_count = 1
+        mock_get_client.return_value = {
+            "controle_diario_ts": mock_collection, "controle_diario_ts_chaves": MagicMock(), "controle_diario_resumo": MagicMock(),
+        }
+
+        controle = ControleRefeicoes(timeseries=True)
+        resultado = controle.atualizar_data_refeicoes_em_lote("2025-06-25", filtros={"obra_id": "1"})
+
+        self.assertEqual(resultado, {"atualizados": 1, "conflitos": 2})
+        self.assertEqual(mock_collection.find.call_args[0][0], {"meta.obra_id": 1})
+        self.assertEqual(len(mock_collection.bulk_write.call_args[0][0]), 1)
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_timeseries_exige_mongodb_7(self, mock_get_client):
+        db = MagicMock()
+        db.list_collection_names.return_value = []
+        mock_get_client.return_value = db
+        controle = ControleRefeicoes(timeseries=True)
+
+        db.client.server_info.return_value = {"versionArray": [6, 0, 14, 0]}
+        with self.assertRaises(RuntimeError):
+            controle.criar_colecao_timeseries()
+        db.create_collection.assert_not_called()
+
+        db.client.server_info.return_value = {"versionArray": [7, 0, 2, 0]}
+        self.assertTrue(controle.criar_colecao_timeseries())
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_copiar_registros_para_timeseries(self, mock_get_client):
+        origem_collection = MagicMock()
+        cursor = origem_collection.find.return_value.sort.return_value.batch_size.return_value
+        cursor.__iter__.return_value = iter([
+            {"_id": ObjectId(), "obra_id": 1, "colaborador_id": i, "data_refeicao": datetime(2025, 6, 24)}
+            for i in range(5)
+        ])
+        destino_collection = MagicMock()
+        ultimo_id = ObjectId()
+        destino_collection.find.return_value.sort.return_value.limit.return_value = [{"_id": ultimo_id}]
+        mock_get_client.return_value = {"controle_diario": origem_collection, "controle_diario_ts": destino_collection}
+
+        origem = ControleRefeicoes(timeseries=False)
+        destino = ControleRefeicoes(timeseries=True)
+        progresso = list(origem.copiar_registros(destino, tamanho_lote=2))
+
+        self.assertEqual(progresso, [(2, 0), (4, 0), (5, 0)])
+        # Retoma após o último _id já copiado
+        self.assertEqual(origem_collection.find.call_args[0][0], {"_id": {"$gt": ultimo_id}})
+        self.assertEqual(destino_collection.insert_many.call_count, 3)
+        primeiro = destino_collection.insert_many.call_args_list[0][0][0][0]
+        self.assertEqual(primeiro["meta"], {"obra_id": 1, "colaborador_id": 0})
+
+    def _db_com_arquivos(self, *meses):
+        colecoes = {}
+        for nome in ("controle_diario", "controle_diario_resumo") + tuple(f"controle_diario_arquivo_{mes}" for mes in meses):
+            colecoes[nome] = MagicMock()
+            colecoes[nome].name = nome
+        db = MagicMock()
+        db.__getitem__.side_effect = colecoes.__getitem__
+        db.list_collection_names.return_value = [f"controle_diario_arquivo_{mes}" for mes in meses]
+        return db, colecoes
+
+    @override_settings(REFEICOES_MESES_ATIVOS=2)
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_consultas_incluem_arquivos_do_periodo(self, mock_get_client):
+        db, colecoes = self._db_com_arquivos("2025_04", "2025_05")
+        mock_get_client.return_value = db
+        colecoes["controle_diario"].count_documents.return_value = 3
+        colecoes["controle_diario_arquivo_2025_05"].count_documents.return_value = 4
+
+        controle = ControleRefeicoes()
+        self.assertEqual(controle.meses_arquivados(), [(2025, 5), (2025, 4)])
+        self.assertEqual(controle.total_refeicoes({"data_inicio": "2025-05-10"}), 7)
+        colecoes["controle_diario_arquivo_2025_04"].count_documents.assert_not_called()
+
+        controle.somar_valor_refeicoes({"data_fim": "2025-04-30"})
+        pipeline = colecoes["controle_diario"].aggregate.call_args[0][0]
+        self.assertEqual(pipeline[1]["$unionWith"]["coll"], "controle_diario_arquivo_2025_04")
+        self.assertEqual(len([etapa for etapa in pipeline if "$unionWith" in etapa]), 1)
+
+        # A lista vem do cache; arquivar_mes apaga a chave e o novo mês aparece na consulta seguinte
+        db.list_collection_names.return_value.append("controle_diario_arquivo_2025_03")
+        self.assertEqual(ControleRefeicoes().meses_arquivados(), [(2025, 5), (2025, 4)])
+        db.list_collection_names.assert_called_once()
+        cache.delete(CHAVE_CACHE_ARQUIVOS)
+        self.assertEqual(ControleRefeicoes().meses_arquivados(), [(2025, 5), (2025, 4), (2025, 3)])
+
+    @override_settings(REFEICOES_MESES_ATIVOS=2)
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_listar_registros_paginados_com_arquivos(self, mock_get_client):
+        db, colecoes = self._db_com_arquivos("2025_05")
+        mock_get_client.return_value = db
+        colecoes["controle_diario"].aggregate.return_value = [
+            {"_id": ObjectId(), "data_refeicao": datetime(2025, 6, 25 - i)} for i in range(3)
+        ]
+
+        pagina = ControleRefeicoes().listar_registros_paginados(limite=2)
+
+        colecoes["controle_diario"].find.assert_not_called()
+        pipeline = colecoes["controle_diario"].aggregate.call_args[0][0]
+        self.assertEqual(pipeline[2], {"$limit": 3})
+        self.assertEqual(pipeline[4]["$unionWith"]["coll"], "controle_diario_arquivo_2025_05")
+        self.assertEqual(pipeline[-1], {"$limit": 3})
+        self.assertEqual(len(pagina["registros"]), 2)
+        self.assertIsNotNone(pagina["proximo"])
+
+    @override_settings(REFEICOES_MESES_ATIVOS=2)
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_atualizar_data_de_registro_arquivado_volta_para_ativa(self, mock_get_client):
+        db, colecoes = self._db_com_arquivos("2025_04", "2025_05")
+        mock_get_client.return_value = db
+        registro = {"_id": ObjectId(), "data_refeicao": datetime(2025, 5, 20), "obra_id": 1, "colaborador_id": 13, "valor_refeicao": 8.0}
+        colecoes["controle_diario"].find_one.return_value = None
+        colecoes["controle_diario"].distinct.return_value = []
+        arquivo = colecoes["controle_diario_arquivo_2025_05"]
+        arquivo.find_one.return_value = dict(registro)
+        arquivo.find.return_value = [dict(registro)]
+
+        resultado = ControleRefeicoes().atualizar_data_refeicao(f'{registro["_id"]}_202505', "2025-06-02")
+
+        self.assertEqual(resultado.modified_count, 1)
+        # O id traz o mês: só o arquivo de maio é consultado
+        colecoes["controle_diario_arquivo_2025_04"].find_one.assert_not_called()
+        inseridos = colecoes["controle_diario"].insert_many.call_args[0][0]
+        self.assertEqual(inseridos[0]["data_refeicao"], datetime(2025, 6, 2))
+        arquivo.delete_many.assert_called_once_with({"_id": {"$in": [registro["_id"]]}})
+        arquivo.update_one.assert_not_called()
+
+    @override_settings(REFEICOES_MESES_ATIVOS=2)
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_arquivar_mes_em_lotes(self, mock_get_client):
+        db, colecoes = self._db_com_arquivos("2025_04")
+        mock_get_client.return_value = db
+        ativa = colecoes["controle_diario"]
+        ativa.aggregate.return_value = [{"_id": {"ano": 2025, "mes": 4}}]
+        lotes = [
+            [{"_id": ObjectId(), "data_refeicao": datetime(2025, 4, 1)} for _ in range(2)],
+            [{"_id": ObjectId(), "data_refeicao": datetime(2025, 4, 2)}],
+            [],
+        ]
+        ativa.find.return_value.sort.return_value.limit.side_effect = lotes
+
+        controle = ControleRefeicoes()
+        self.assertEqual(controle.meses_para_arquivar(hoje=datetime(2025, 6, 18)), [(2025, 4)])
+        self.assertEqual(ativa.aggregate.call_args[0][0][0], {"$match": {"data_refeicao": {"$lt": datetime(2025, 5, 1)}}})
+
+        cache.set(CHAVE_CACHE_ARQUIVOS, [])
+        progresso = list(controle.arquivar_mes(2025, 4, tamanho_lote=2))
+
+        self.assertEqual(progresso, [2, 3])
+        self.assertIsNone(cache.get(CHAVE_CACHE_ARQUIVOS))
+        self.assertEqual(colecoes["controle_diario_arquivo_2025_04"].insert_many.call_count, 2)
+        self.assertEqual(ativa.delete_many.call_count, 2)
+        self.assertEqual(ativa.find.call_args[0][0], {"data_refeicao": {"$gte": datetime(2025, 4, 1), "$lt": datetime(2025, 5, 1)}})
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    @patch("Sistema.models.Colaborador.objects.select_related")
+    def test_registrar_refeicoes_esquema_compacto(self, mock_select_related, mock_get_client):
+        mock_colaborador = MagicMock()
+        mock_colaborador.id = 13
+        mock_colaborador.nome = "Carlos Mendes"
+        mock_colaborador.obra.id = 1
+        mock_colaborador.obra.nome = "aeroporto"
+        mock_select_related.return_value.filter.return_value = [mock_colaborador]
+        mock_collection = MagicMock()
+        mock_collection.bulk_write.return_value.upserted_ids = {0: ObjectId()}
+        mock_resumo = MagicMock()
+        mock_get_client.return_value = {"controle_diario_compacto": mock_collection, "controle_diario_resumo": mock_resumo}
+        usuario = MagicMock()
+        usuario.id = 6
+
+        controle = ControleRefeicoes(timeseries=False, compacto=True)
+        resultado = controle.registrar_refeicoes("2025-06-25", ["13"], usuario)
+
+        self.assertEqual(resultado["inseridos"], 1)
+        operacao = mock_collection.bulk_write.call_args[0][0][0]
+        self.assertEqual(operacao._filter, {"c": 13, "d": datetime(2025, 6, 25)})
+        self.assertEqual(operacao._doc["$setOnInsert"], {"c": 13, "o": 1, "d": datetime(2025, 6, 25), "v": 800, "u": 6})
+        # O resumo continua com os nomes e o valor em reais
+        self.assertEqual(mock_resumo.bulk_write.call_args[0][0][0]._doc["$set"]["obra_nome"], "aeroporto")
+        self.assertEqual(mock_resumo.bulk_write.call_args[0][0][0]._doc["$inc"]["soma_valor_refeicao"], 8.0)
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_corrigir_nomes_atualiza_registros_e_resumo(self, mock_get_client):
+        cache.set("refeicoes:obras_unicas", [{"obra_id": 1, "obra_nome": "aeroporto"}])
+        cache.set("refeicoes:nome:obra:1", "aeroporto")
+        mock_collection = MagicMock()
+        mock_collection.bulk_write.return_value.modified_count = 40
+        mock_resumo = MagicMock()
+        mock_resumo.bulk_write.return_value.modified_count = 3
+        mock_get_client.return_value = {"controle_diario": mock_collection, "controle_diario_resumo": mock_resumo}
+
+        controle = ControleRefeicoes(timeseries=False, compacto=False)
+        self.assertEqual(controle.corrigir_nomes("obra_nome", {1: "Aeroporto Sul", 2: "Porto"}), 43)
+
+        operacoes = mock_collection.bulk_write.call_args[0][0]
+        self.assertEqual(len(operacoes), 2)
+        self.assertEqual(operacoes[0]._filter, {"obra_id": 1, "obra_nome": {"$ne": "Aeroporto Sul"}})
+        self.assertEqual(operacoes[0]._doc, {"$set": {"obra_nome": "Aeroporto Sul"}})
+        mock_resumo.bulk_write.assert_called_once()
+        self.assertIsNone(cache.get("refeicoes:obras_unicas"))
+        self.assertIsNone(cache.get("refeicoes:nome:obra:1"))
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_corrigir_nomes_esquema_compacto_so_no_resumo(self, mock_get_client):
+        mock_collection = MagicMock()
+        mock_resumo = MagicMock()
+        mock_resumo.bulk_write.return_value.modified_count = 1
+        mock_get_client.return_value = {"controle_diario_compacto": mock_collection, "controle_diario_resumo": mock_resumo}
+
+        controle = ControleRefeicoes(timeseries=False, compacto=True)
+        self.assertEqual(controle.corrigir_nomes("colaborador_nome", {13: "Carlos M."}), 1)
+        mock_collection.bulk_write.assert_not_called()
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_listar_registros_paginados_esquema_compacto_resolve_nomes(self, mock_get_client):
+        cache.set("refeicoes:nome:colaborador:13", "Carlos Mendes")
+        cache.set("refeicoes:nome:obra:1", "aeroporto")
+        registro_id = ObjectId()
+        mock_collection = MagicMock()
+        mock_collection.find.return_value.sort.return_value.limit.return_value = [
+            {"_id": registro_id, "c": 13, "o": 1, "d": datetime(2025, 6, 25), "v": 800},
+        ]
+        mock_get_client.return_value = {"controle_diario_compacto": mock_collection}
+
+        controle = ControleRefeicoes(timeseries=False, compacto=True)
+        pagina = controle.listar_registros_paginados(filtros={"obra_id": "1"})
+
+        self.assertEqual(mock_collection.find.call_args[0], ({"o": 1}, {"c": 1, "o": 1, "d": 1, "v": 1}))
+        mock_collection.find.return_value.sort.assert_called_once_with([("d", -1), ("_id", -1)])
+        registro = pagina["registros"][0]
+        self.assertEqual(registro["data_refeicao"], datetime(2025, 6, 25))
+        self.assertEqual(registro["valor_refeicao"], 8.0)
+        self.assertEqual(registro["colaborador_nome"], "Carlos Mendes")
+        self.assertEqual(registro["obra_nome"], "aeroporto")
+        self.assertEqual(registro["id"], f"{registro_id}_202506")
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_copiar_registros_ignora_duplicados_do_indice_unico(self, mock_get_client):
+        origem_collection = MagicMock()
+        cursor = origem_collection.find.return_value.sort.return_value.batch_size.return_value
+        cursor.__iter__.return_value = iter([
+            {"_id": ObjectId(), "obra_id": 1, "colaborador_id": 13, "data_refeicao": datetime(2025, 6, 24)}
+            for _ in range(3)
+        ])
+        destino_collection = MagicMock()
+        destino_collection.find.return_value.sort.return_value.limit.return_value = []
+        destino_collection.insert_many.side_effect = BulkWriteError({"nInserted": 1, "writeErrors": [
+            {"index": 1, "code": 11000, "errmsg": "duplicate key"},
+            {"index": 2, "code": 11000, "errmsg": "duplicate key"},
+        ]})
+        mock_get_client.return_value = {"controle_diario": origem_collection, "controle_diario_compacto": destino_collection}
+
+        origem = ControleRefeicoes(timeseries=False, compacto=False)
+        destino = ControleRefeicoes(timeseries=False, compacto=True)
+        with self.assertLogs("Sistema.utils.mongo.mongo_model", "WARNING"):
+            self.assertEqual(list(origem.copiar_registros(destino)), [(1, 2)])
+
+        destino_collection.insert_many.side_effect = BulkWriteError({"nInserted": 0, "writeErrors": [
+            {"index": 0, "code": 121, "errmsg": "Document failed validation"},
+        ]})
+        cursor.__iter__.return_value = iter([{"_id": ObjectId(), "obra_id": 1, "colaborador_id": 14, "data_refeicao": datetime(2025, 6, 24)}])
+        with self.assertRaises(BulkWriteError):
+            list(origem.copiar_registros(destino))
+
+    @patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+    def test_copiar_registros_para_esquema_compacto(self, mock_get_client):
+        registro_id = ObjectId()
+        origem_collection = MagicMock()
+        cursor = origem_collection.find.return_value.sort.return_value.batch_size.return_value
+        cursor.__iter__.return_value = iter([{
+            "_id": registro_id, "colaborador_id": 13, "colaborador_nome": "Carlos Mendes", "obra_id": 1,
+            "obra_nome": "aeroporto", "data_refeicao": datetime(2025, 6, 24), "valor_refeicao": 8.0,
+            "registrado_em": datetime(2025, 6, 24, 11), "registrado_por_id": 6, "registrado_por_nome": "joao",
+        }])
+        destino_collection = MagicMock()
+        destino_collection.find.return_value.sort.return_value.limit.return_value = []
+        mock_get_client.return_value = {"controle_diario": origem_collection, "controle_diario_compacto": destino_collection}
+
+        origem = ControleRefeicoes(timeseries=False, compacto=False)
+        destino = ControleRefeicoes(timeseries=False, compacto=True)
+        self.assertEqual(list(origem.copiar_registros(destino)), [(1, 0)])
+
+        documento = destino_collection.insert_many.call_args[0][0][0]
+        self.assertEqual(documento, {"_id": registro_id, "c": 13, "o": 1, "d": datetime(2025, 6, 24), "v": 800, "u": 6})
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,78 @@
+import asyncio
+import inspect
+import re
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from Sistema.utils.mongo.mongo_model import ControleRefeicoes
+from Sistema.utils.mongo.mongo_model_async import AsyncControleRefeicoes
+from Sistema.utils.sql.sql_model import ControleRefeicoesSQL
+
+
+class TestAsyncControleRefeicoes(unittest.TestCase):
+
+    def test_metodos_viram_corrotinas(self):
+        controle = MagicMock()
+        controle.total_refeicoes.return_value = 5
+        async_controle = AsyncControleRefeicoes(controle)
+
+        total = asyncio.run(async_controle.total_refeicoes({"obra_id": "1"}))
+
+        self.assertEqual(total, 5)
+        controle.total_refeicoes.assert_called_once_with({"obra_id": "1"})
+
+    def test_consultas_independentes_rodam_ao_mesmo_tempo(self):
+        # As duas consultas só terminam se estiverem rodando em paralelo
+        barreira = threading.Barrier(2, timeout=5)
+
+        def esperar_e_retornar(valor):
+            barreira.wait()
+            return valor
+
+        controle = MagicMock()
+        controle.usa_orm.return_value = False
+        controle.resumo_dashboard.side_effect = lambda filtros: esperar_e_retornar({"total_refeicoes": 1})
+        controle.totais_por_obra_mes.side_effect = lambda filtros: esperar_e_retornar([])
+        async_controle = AsyncControleRefeicoes(controle)
+
+        async def carregar():
+            return await asyncio.gather(
+                async_controle.resumo_dashboard({}),
+                async_controle.totais_por_obra_mes({}),
+            )
+
+        self.assertEqual(asyncio.run(carregar()), [{"total_refeicoes": 1}, []])
+
+    @patch("Sistema.utils.mongo.mongo_model_async.sync_to_async")
+    def test_metodos_com_orm_rodam_na_thread_da_requisicao(self, mock_sync_to_async):
+        mongo = AsyncControleRefeicoes(ControleRefeicoes())
+        for metodo in ("registrar_refeicoes", "atualizar_data_refeicao", "iterar_registros"):
+            getattr(mongo, metodo)
+            self.assertTrue(mock_sync_to_async.call_args.kwargs["thread_sensitive"], metodo)
+        mongo.resumo_dashboard
+        self.assertFalse(mock_sync_to_async.call_args.kwargs["thread_sensitive"])
+
+        # No backend SQL todas as consultas passam pelo ORM
+        AsyncControleRefeicoes(ControleRefeicoesSQL()).resumo_dashboard
+        self.assertTrue(mock_sync_to_async.call_args.kwargs["thread_sensitive"])
+
+    def test_metodos_sem_orm_nao_chamam_o_orm(self):
+        # Segue as chamadas self.metodo(...) a partir de cada método liberado da thread da requisição
+        pendentes = list(ControleRefeicoes.metodos_sem_orm)
+        vistos = set()
+        while pendentes:
+            nome = pendentes.pop()
+            metodo = getattr(ControleRefeicoes, nome, None)
+            if nome in vistos or not inspect.isfunction(metodo):
+                continue
+            vistos.add(nome)
+            fonte = inspect.getsource(metodo)
+            for uso_do_orm in ("preencher_nomes", "_resolver_colaboradores", ".objects"):
+                self.assertNotIn(uso_do_orm, fonte, f"{nome} usa o ORM")
+            pendentes += re.findall(r"self\.(\w+)\(", fonte)
+        self.assertIn("_calcular_resumo_dashboard", vistos)
+
+
+if __name__ == '__main__':
+    unittest.main()
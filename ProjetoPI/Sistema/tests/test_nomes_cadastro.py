@@ -0,0 +1,36 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from Sistema.models import Obra, Colaborador
+from Sistema.utils.nomes_cadastro import esquecer_nome, preencher_nomes
+
+
+class PreencherNomesTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.obra = Obra.objects.create(nome='Obra A', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01')
+        self.ana = Colaborador.objects.create(
+            nome='Ana', cpf='111.111.111-11', data_nascimento='1990-01-01',
+            telefone='11999999999', endereco='Rua Y', obra=self.obra,
+        )
+
+    def test_uma_consulta_por_cadastro_e_depois_cache(self):
+        registros = [{"colaborador_id": self.ana.id, "obra_id": self.obra.id} for _ in range(3)]
+        with self.assertNumQueries(2):
+            preencher_nomes(registros)
+        self.assertEqual({(r["colaborador_nome"], r["obra_nome"]) for r in registros}, {("Ana", "Obra A")})
+
+        with self.assertNumQueries(0):
+            preencher_nomes([{"colaborador_id": self.ana.id, "obra_id": self.obra.id}])
+
+    def test_mantem_nomes_ja_gravados_e_esquece_renomeados(self):
+        registro = {"colaborador_id": self.ana.id, "colaborador_nome": "Ana Antiga"}
+        with self.assertNumQueries(0):
+            preencher_nomes([registro])
+        self.assertEqual(registro["colaborador_nome"], "Ana Antiga")
+
+        preencher_nomes([{"colaborador_id": self.ana.id}])
+        Colaborador.objects.filter(id=self.ana.id).update(nome='Ana Souza')
+        esquecer_nome("colaborador", self.ana.id)
+        self.assertEqual(preencher_nomes([{"colaborador_id": self.ana.id}])[0]["colaborador_nome"], "Ana Souza")
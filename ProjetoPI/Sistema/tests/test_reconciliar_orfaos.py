@@ -0,0 +1,67 @@
+from io import StringIO
+from unittest.mock import MagicMock, patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from Sistema.models import Colaborador, Obra
+
+
+@patch("Sistema.utils.mongo.mongo_model.get_mongo_client")
+class ReconciliarOrfaosTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.obra = Obra.objects.create(nome='Obra A', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01')
+        self.ana = Colaborador.objects.create(
+            nome='Ana', cpf='111.111.111-11', data_nascimento='1990-01-01',
+            telefone='11999999999', endereco='Rua Y', obra=self.obra,
+        )
+        self.collection = MagicMock()
+        self.collection.name = "controle_diario"
+        ids_por_campo = {
+            "$obra_id": [self.obra.id, 9001],
+            "$colaborador_id": [None, self.ana.id, 9002, 9003],
+        }
+        self.collection.aggregate.side_effect = lambda pipeline, **kwargs: iter(
+            [{"_id": item_id} for item_id in ids_por_campo.get(pipeline[0].get("$group", {}).get("_id"), [])]
+        )
+        self.collection.count_documents.return_value = 5
+        self.collection.delete_many.return_value.deleted_count = 5
+        self.resumo = MagicMock()
+
+    def _executar(self, mock_get_client, *argumentos):
+        mock_get_client.return_value = {"controle_diario": self.collection, "controle_diario_resumo": self.resumo}
+        saida = StringIO()
+        call_command('reconciliar_orfaos_refeicoes', '--tamanho-lote', '2', *argumentos, stdout=saida)
+        return saida.getvalue()
+
+    def test_simular_so_conta(self, mock_get_client):
+        saida = self._executar(mock_get_client, '--simular')
+
+        self.assertIn("obra_id: 1 ids sem cadastro, 5 registros seriam removidos.", saida)
+        self.assertIn("colaborador_id: 2 ids sem cadastro, 10 registros seriam removidos.", saida)
+        self.assertIn("ids: 9002, 9003", saida)
+        self.collection.delete_many.assert_not_called()
+        self.resumo.delete_many.assert_not_called()
+
+    def test_remove_registros_e_resumo_dos_orfaos(self, mock_get_client):
+        saida = self._executar(mock_get_client)
+
+        self.assertIn("obra_id: 1 ids sem cadastro, 5 registros removidos.", saida)
+        self.collection.delete_many.assert_any_call({"obra_id": {"$in": [9001]}})
+        self.resumo.delete_many.assert_any_call({"obra_id": {"$in": [9001]}})
+        removidos = [
+            sorted(chamada.args[0]["colaborador_id"]["$in"])
+            for chamada in self.collection.delete_many.call_args_list if "colaborador_id" in chamada.args[0]
+        ]
+        self.assertEqual(removidos, [[9002], [9003]])
+        # Sem --arquivar nenhum $merge
+        self.assertFalse(any("$merge" in str(c) for c in self.collection.aggregate.call_args_list))
+
+    def test_arquivar_copia_antes_de_apagar(self, mock_get_client):
+        self._executar(mock_get_client, '--arquivar')
+
+        pipelines = [c.args[0] for c in self.collection.aggregate.call_args_list if "$merge" in str(c)]
+        self.assertEqual(pipelines[0][0], {"$match": {"obra_id": {"$in": [9001]}}})
+        self.assertEqual(pipelines[0][-1]["$merge"]["into"], "controle_diario_orfaos")
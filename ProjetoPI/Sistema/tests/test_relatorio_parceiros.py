@@ -0,0 +1,73 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from Sistema.models import Colaborador, Hotel, Obra, Restaurante
+from Sistema.utils import relatorio_parceiros
+from Sistema.utils.memoria.memoria_model import ControleRefeicoesMemoria
+from Sistema.utils.relatorio_parceiros import faturamento_parceiros, vinculos_das_obras
+
+
+class FaturamentoParceirosTest(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='admin', password='pass123')
+        self.restaurante = Restaurante.objects.create(
+            nome='Restaurante Bom Sabor', cnpj='98.765.432/0001-99', endereco='Rua A',
+            telefone='11999999999', responsavel='Carlos',
+        )
+        self.hotel = Hotel.objects.create(
+            nome='Hotel Sol', cnpj='12.345.678/0001-99', cidade='São Paulo', endereco='Rua B',
+            telefone='11999999999', responsavel='Maria',
+        )
+        self.obras = [
+            Obra.objects.create(
+                nome=f'Obra {i}', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01',
+                restaurante_vinculado=self.restaurante, hotel_vinculado=self.hotel if i == 0 else None,
+            )
+            for i in range(2)
+        ]
+        self.obra_sem_vinculo = Obra.objects.create(
+            nome='Obra Solta', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01',
+        )
+        self.controle = ControleRefeicoesMemoria()
+        for i, obra in enumerate(self.obras + [self.obra_sem_vinculo]):
+            colaborador = Colaborador.objects.create(
+                nome=f'Colaborador {i}', cpf=f'{i}11.111.111-11', data_nascimento='1990-01-01',
+                telefone='11999999999', endereco='Rua Y', obra=obra,
+            )
+            for data in ('2025-06-24', '2025-06-25', '2025-07-01'):
+                self.controle.registrar_refeicoes(data, [colaborador.id], self.usuario)
+
+    def test_totais_mensais_por_restaurante_e_hotel(self):
+        faturamento = faturamento_parceiros(self.controle, {})
+
+        junho, julho = faturamento["restaurantes"][:2]
+        self.assertEqual(junho["parceiro_nome"], 'Restaurante Bom Sabor')
+        self.assertEqual((junho["ano"], junho["mes"]), (2025, 6))
+        self.assertEqual(junho["obras"], 2)
+        self.assertEqual(junho["total_refeicoes"], 4)
+        self.assertEqual((julho["mes"], julho["total_refeicoes"]), (7, 2))
+
+        sem_vinculo = faturamento["restaurantes"][2:]
+        self.assertEqual([l["parceiro_id"] for l in sem_vinculo], [None, None])
+        self.assertEqual(sum(l["total_refeicoes"] for l in sem_vinculo), 3)
+
+        hotel_junho = faturamento["hoteis"][0]
+        self.assertEqual((hotel_junho["parceiro_nome"], hotel_junho["obras"], hotel_junho["total_refeicoes"]), ('Hotel Sol', 1, 2))
+        self.assertEqual(hotel_junho["valor_total"], round(2 * self.controle.listar_registros()[0]["valor_refeicao"], 2))
+
+    def test_vinculos_resolvidos_em_lotes_sem_consulta_por_obra(self):
+        ids = [obra.id for obra in self.obras] + [self.obra_sem_vinculo.id, 999999]
+        with self.assertNumQueries(1):
+            vinculos = vinculos_das_obras(ids)
+        self.assertEqual(vinculos[self.obras[0].id], ((self.restaurante.id, 'Restaurante Bom Sabor'), (self.hotel.id, 'Hotel Sol')))
+        self.assertEqual(vinculos[self.obra_sem_vinculo.id], ((None, None), (None, None)))
+        self.assertNotIn(999999, vinculos)
+
+        tamanho_original = relatorio_parceiros.TAMANHO_LOTE_OBRAS
+        relatorio_parceiros.TAMANHO_LOTE_OBRAS = 2
+        try:
+            with self.assertNumQueries(2):
+                self.assertEqual(len(vinculos_das_obras(ids)), 3)
+        finally:
+            relatorio_parceiros.TAMANHO_LOTE_OBRAS = tamanho_original
@@ -0,0 +1,62 @@
+from io import StringIO
+from unittest.mock import patch
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from Sistema.models import Colaborador, Obra
+from Sistema.signals import agendar_propagacao
+from Sistema.utils.memoria.memoria_model import ControleRefeicoesMemoria
+
+
+class PropagacaoNomesTest(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='encarregado', password='pass123')
+        self.obra = Obra.objects.create(nome='Obra A', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01')
+        self.ana = Colaborador.objects.create(
+            nome='Ana', cpf='111.111.111-11', data_nascimento='1990-01-01',
+            telefone='11999999999', endereco='Rua Y', obra=self.obra,
+        )
+        self.controle = ControleRefeicoesMemoria()
+        self.controle.registrar_refeicoes("2025-06-24", [self.ana.id], self.usuario)
+        self.controle.registrar_refeicoes("2025-06-25", [self.ana.id], self.usuario)
+
+    @patch("Sistema.signals.agendar_propagacao")
+    def test_renomear_agenda_propagacao_apos_commit(self, mock_agendar):
+        with self.captureOnCommitCallbacks(execute=True):
+            obra = Obra.objects.get(pk=self.obra.pk)
+            obra.nome = 'Obra Nova'
+            obra.save()
+            mock_agendar.assert_not_called()
+        mock_agendar.assert_called_once_with("obra_nome", self.obra.pk, 'Obra Nova')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            obra.empresa = 'Empresa Y'
+            obra.save()
+            self.ana.telefone = '11888888888'
+            self.ana.save()
+            Colaborador.objects.create(
+                nome='Bruno', cpf='222.222.222-22', data_nascimento='1990-01-01',
+                telefone='11999999999', endereco='Rua Y', obra=obra,
+            )
+        self.assertEqual(mock_agendar.call_count, 1)
+
+    @patch("Sistema.signals.get_controle_refeicoes")
+    def test_propagacao_atualiza_registros(self, mock_get_controle):
+        mock_get_controle.return_value = self.controle
+        agendar_propagacao("colaborador_nome", self.ana.id, 'Ana Souza').result(timeout=5)
+
+        self.assertEqual(self.controle.listar_colaboradores_unicos(), [{"colaborador_id": self.ana.id, "colaborador_nome": 'Ana Souza'}])
+
+    @patch("Sistema.management.commands.reconciliar_nomes_refeicoes.get_controle_refeicoes")
+    def test_comando_reconcilia_nomes_alterados_sem_signal(self, mock_get_controle):
+        mock_get_controle.return_value = self.controle
+        Obra.objects.filter(pk=self.obra.pk).update(nome='Obra Renomeada')
+
+        saida = StringIO()
+        call_command('reconciliar_nomes_refeicoes', '--tamanho-lote', '1', stdout=saida)
+
+        self.assertEqual(self.controle.listar_obras_unicas(), [{"obra_id": self.obra.id, "obra_nome": 'Obra Renomeada'}])
+        self.assertIn("obra_nome: 2 documentos corrigidos.", saida.getvalue())
+        self.assertIn("colaborador_nome: 0 documentos corrigidos.", saida.getvalue())
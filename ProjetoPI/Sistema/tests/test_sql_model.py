@@ -0,0 +1,159 @@
+from bson import ObjectId
+from datetime import datetime
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.utils import timezone
+from pymongo.errors import DuplicateKeyError
+
+from Sistema.management.commands.copiar_refeicoes_mongo_sql import Command
+from Sistema.models import Obra, Colaborador, RegistroRefeicao
+from Sistema.utils.sql.sql_model import ControleRefeicoesSQL
+
+
+class ControleRefeicoesSQLTest(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='encarregado', password='pass123')
+        self.obra = Obra.objects.create(nome='Obra A', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01')
+        self.outra_obra = Obra.objects.create(nome='Obra B', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01')
+        self.ana = Colaborador.objects.create(
+            nome='Ana', cpf='111.111.111-11', data_nascimento='1990-01-01',
+            telefone='11999999999', endereco='Rua Y', obra=self.obra,
+        )
+        self.bruno = Colaborador.objects.create(
+            nome='Bruno', cpf='222.222.222-22', data_nascimento='1990-01-01',
+            telefone='11999999999', endereco='Rua Y', obra=self.outra_obra,
+        )
+        self.controle = ControleRefeicoesSQL()
+
+    def test_registrar_nao_duplica_colaborador_no_mesmo_dia(self):
+        resultado = self.controle.registrar_refeicoes("2025-06-24", [self.ana.id, self.bruno.id, "x"], self.usuario)
+        self.assertEqual(resultado, {"inseridos": 2, "existentes": 0, "falhas": 0, "nao_encontrados": ["x"]})
+
+        resultado = self.controle.registrar_refeicoes("2025-06-24", [self.ana.id], self.usuario)
+        self.assertEqual(resultado["inseridos"], 0)
+        self.assertEqual(resultado["existentes"], 1)
+        self.assertEqual(RegistroRefeicao.objects.count(), 2)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RegistroRefeicao.objects.create(
+                colaborador=self.ana, obra=self.obra, data_refeicao="2025-06-24", valor_refeicao=8,
+            )
+
+    def test_registro_simultaneo_conta_so_o_que_o_banco_aceitou(self):
+        # Outro envio gravou Ana depois da consulta de existentes
+        RegistroRefeicao.objects.create(colaborador=self.ana, obra=self.obra, data_refeicao="2025-06-24", valor_refeicao=8)
+        novos = [
+            RegistroRefeicao(colaborador=colaborador, obra=colaborador.obra, data_refeicao="2025-06-24", valor_refeicao=8)
+            for colaborador in (self.ana, self.bruno)
+        ]
+
+        self.assertEqual(self.controle._inserir(novos), 1)
+        self.assertEqual(RegistroRefeicao.objects.count(), 2)
+
+    def test_resumo_dashboard_aplica_filtros(self):
+        self.controle.registrar_refeicoes("2025-06-24", [self.ana.id, self.bruno.id], self.usuario)
+        self.controle.registrar_refeicoes("2025-06-25", [self.ana.id], self.usuario)
+        self.controle.registrar_refeicoes("2025-07-01", [self.ana.id], self.usuario)
+
+        with self.assertNumQueries(2):
+            resumo = self.controle.resumo_dashboard({"data_inicio": "2025-06-01", "data_fim": "2025-06-30"})
+        self.assertEqual(resumo["total_refeicoes"], 3)
+        self.assertEqual(resumo["total_colaboradores"], 2)
+        self.assertEqual(resumo["soma_valor_refeicoes"], 24.0)
+        self.assertEqual([d["data_formatada"] for d in resumo["refeicoes_por_dia"]], ["24/06/25", "25/06/25"])
+
+        self.assertEqual(self.controle.total_refeicoes({"obra_id": str(self.outra_obra.id)}), 1)
+        self.assertEqual(
+            self.controle.listar_obras_unicas(),
+            [{"obra_id": self.obra.id, "obra_nome": "Obra A"}, {"obra_id": self.outra_obra.id, "obra_nome": "Obra B"}],
+        )
+        with self.assertRaises(ValueError):
+            self.controle.resumo_dashboard({"data_inicio": "24/06/2025"})
+
+    def test_paginacao_por_cursor(self):
+        for dia in range(1, 6):
+            self.controle.registrar_refeicoes(f"2025-06-0{dia}", [self.ana.id], self.usuario)
+
+        with self.assertNumQueries(1):
+            primeira = self.controle.listar_registros_paginados(limite=2)
+        self.assertEqual([r["data_refeicao"].day for r in primeira["registros"]], [5, 4])
+        self.assertEqual(primeira["registros"][0]["colaborador_nome"], "Ana")
+        self.assertIsNone(primeira["anterior"])
+
+        segunda = self.controle.listar_registros_paginados(limite=2, apos=primeira["proximo"])
+        self.assertEqual([r["data_refeicao"].day for r in segunda["registros"]], [3, 2])
+
+        voltando = self.controle.listar_registros_paginados(limite=2, antes=segunda["anterior"])
+        self.assertEqual([r["data_refeicao"].day for r in voltando["registros"]], [5, 4])
+
+        with self.assertRaises(ValueError):
+            self.controle.listar_registros_paginados(apos="invalido")
+
+    def test_atualizar_e_excluir(self):
+        self.controle.registrar_refeicoes("2025-06-24", [self.ana.id], self.usuario)
+        self.controle.registrar_refeicoes("2025-06-25", [self.ana.id], self.usuario)
+        registro = self.controle.listar_registros_paginados()["registros"][0]
+
+        with self.assertRaises(DuplicateKeyError):
+            self.controle.atualizar_data_refeicao(registro["id"], "2025-06-24")
+        self.assertEqual(self.controle.atualizar_data_refeicao(registro["id"], "2025-06-26").modified_count, 1)
+        self.assertEqual(self.controle.buscar_registro(registro["id"])["data_refeicao"], datetime(2025, 6, 26))
+
+        self.assertEqual(self.controle.excluir_registro(registro["id"]).deleted_count, 1)
+        self.assertIsNone(self.controle.buscar_registro(registro["id"]))
+        self.assertEqual(self.controle.registrar_refeicoes("2025-06-26", [self.ana.id], self.usuario)["inseridos"], 1)
+
+    def test_operacoes_em_lote(self):
+        self.controle.registrar_refeicoes("2025-06-24", [self.ana.id, self.bruno.id], self.usuario)
+        self.controle.registrar_refeicoes("2025-06-25", [self.ana.id], self.usuario)
+
+        resultado = self.controle.atualizar_data_refeicoes_em_lote("2025-06-25", filtros={"data_fim": "2025-06-24"})
+        self.assertEqual(resultado, {"atualizados": 1, "conflitos": 1})
+
+        self.assertEqual(self.controle.excluir_registros_em_lote(filtros={"obra_id": str(self.obra.id)}), {"excluidos": 2})
+        with self.assertRaises(ValueError):
+            self.controle.excluir_registros_em_lote(filtros={})
+        with self.assertRaises(ValueError):
+            self.controle.excluir_registros_em_lote(ids=["abc"])
+
+    def test_iterar_registros_em_ordem_de_data(self):
+        self.controle.registrar_refeicoes("2025-06-25", [self.ana.id], self.usuario)
+        self.controle.registrar_refeicoes("2025-06-24", [self.ana.id, self.bruno.id], self.usuario)
+
+        registros = list(self.controle.iterar_registros({"colaborador_id": str(self.ana.id)}, tamanho_lote=1))
+        self.assertEqual([r["data_refeicao"].day for r in registros], [24, 25])
+        self.assertEqual(registros[0]["registrado_por_nome"], "encarregado")
+
+    def test_totais_por_obra_mes(self):
+        self.controle.registrar_refeicoes("2025-06-24", [self.ana.id, self.bruno.id], self.usuario)
+        self.controle.registrar_refeicoes("2025-06-25", [self.ana.id], self.usuario)
+        self.controle.registrar_refeicoes("2025-07-01", [self.ana.id], self.usuario)
+
+        totais = self.controle.totais_por_obra_mes({"data_inicio": "2025-06-01"})
+        self.assertEqual(
+            [(t["obra_id"], t["ano"], t["mes"], t["total"]) for t in totais],
+            [(self.obra.id, 2025, 6, 2), (self.outra_obra.id, 2025, 6, 1), (self.obra.id, 2025, 7, 1)],
+        )
+        self.assertIsInstance(totais[0]["soma_valor_refeicao"], float)
+
+
+class CopiarRefeicoesMongoSQLTest(TestCase):
+
+    def test_copia_mantem_data_do_registro(self):
+        obra = Obra.objects.create(nome='Obra A', empresa='Empresa X', endereco='Rua X', data_inicio='2025-01-01')
+        ana = Colaborador.objects.create(
+            nome='Ana', cpf='111.111.111-11', data_nascimento='1990-01-01',
+            telefone='11999999999', endereco='Rua Y', obra=obra,
+        )
+        documento = {
+            "_id": ObjectId(), "colaborador_id": ana.id, "obra_id": obra.id, "data_refeicao": datetime(2024, 3, 5),
+            "valor_refeicao": 8.0, "registrado_em": datetime(2024, 3, 5, 11, 30), "registrado_por_id": None,
+        }
+
+        registro = Command()._registro(documento, set())
+        registro.save()
+
+        registro.refresh_from_db()
+        self.assertEqual(timezone.localtime(registro.registrado_em).replace(tzinfo=None), datetime(2024, 3, 5, 11, 30))
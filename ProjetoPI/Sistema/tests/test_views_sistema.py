@@ -3,8 +3,10 @@ from django.urls import reverse
 from django.contrib.auth.models import User, Group, Permission
 from django.contrib.messages import get_messages
 from django.utils.http import urlencode
-from Sistema.models import Obra, Colaborador, Hotel, Restaurante, Profile
+from django.contrib.contenttypes.models import ContentType
+from Sistema.models import Obra, Colaborador, Hotel, Restaurante, Profile, PermissaoVirtual
 from datetime import datetime
+from unittest.mock import patch
 
 class SistemaViewsTest(TestCase):
     def setUp(self):
@@ -117,6 +119,30 @@ class SistemaViewsTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Colaborador Teste')
 
+    def test_listar_colaboradores_filtra_e_pagina(self):
+        outra_obra = Obra.objects.create(nome='Outra Obra', empresa='Empresa X', endereco='Rua Z', data_inicio='2023-01-01')
+        Colaborador.objects.create(
+            nome='Colaborador Outra Obra', cpf='987.654.321-00', data_nascimento='1990-01-01',
+            telefone='11999999999', endereco='Rua Y', obra=outra_obra,
+        )
+        url = reverse('listar-colaboradores')
+
+        self.client.login(username='encarregado', password='pass123')
+        response = self.client.get(url)
+        self.assertContains(response, 'Colaborador Teste')
+        self.assertNotContains(response, 'Colaborador Outra Obra')
+
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.get(url, {'obra_id': outra_obra.id})
+        self.assertNotContains(response, 'Colaborador Teste')
+        self.assertContains(response, 'Colaborador Outra Obra')
+
+        response = self.client.get(url, {'busca': '987'})
+        self.assertEqual([c.nome for c in response.context['colaboradores']], ['Colaborador Outra Obra'])
+
+        response = self.client.get(url, {'obra_id': 'x', 'apos': 'invalido'})
+        self.assertEqual(len(response.context['colaboradores']), 2)
+
     def test_editar_colaborador_get_and_post(self):
         self.client.login(username='admin', password='adminpass123')
         url = reverse('editar-colaborador', args=[self.colaborador.id])
@@ -289,6 +315,30 @@ class SistemaViewsTest(TestCase):
         self.assertRedirects(response, reverse('listar-colaboradores'))
         self.assertFalse(Colaborador.objects.filter(id=colab.id).exists())
 
+    @patch("Sistema.views.LIMITE_EXCLUSAO_IMEDIATA", 0)
+    @patch("Sistema.utils.exclusao_lotes._obter_executor")
+    def test_deletar_generico_grande_vai_para_segundo_plano(self, mock_executor):
+        self.client.login(username='admin', password='adminpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('deletar-generico'), {
+                'model': 'Obra', 'ids': [self.obra.id], 'redirect_to': 'listar-obras',
+            })
+
+        self.assertEqual(response.status_code, 302)
+        url, job_id = response.url.split('?exclusao=')
+        self.assertEqual(url, reverse('listar-obras'))
+        mock_executor.return_value.submit.assert_called_once()
+        self.assertTrue(Obra.objects.filter(id=self.obra.id).exists())
+
+        situacao = self.client.get(reverse('status-exclusao', args=[job_id])).json()
+        self.assertEqual(situacao['estado'], 'pendente')
+        self.assertEqual(situacao['modelo'], 'Obra')
+        self.assertEqual(self.client.get(reverse('status-exclusao', args=['outro'])).status_code, 404)
+
+        # Outro usuário (não administrador) não acompanha a exclusão
+        self.client.login(username='encarregado', password='pass123')
+        self.assertEqual(self.client.get(reverse('status-exclusao', args=[job_id])).status_code, 404)
+
     def test_deletar_generico_post_invalid_model(self):
         self.client.login(username='admin', password='adminpass123')
         url = reverse('deletar-generico')
@@ -373,20 +423,34 @@ class SistemaViewsTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, self.obra.nome)
 
-    def test_relatorio_view_valid_and_invalid(self):
+    @patch("Sistema.views.pedido_model")
+    def test_relatorio_view_valid_and_invalid(self, mock_pedido_model):
+        mock_pedido_model.resumo_dashboard.return_value = {
+            "total_refeicoes": 0, "total_colaboradores": 0,
+            "refeicoes_por_dia": [], "soma_valor_refeicoes": 0,
+        }
+        mock_pedido_model.listar_obras_unicas.return_value = []
+        mock_pedido_model.listar_colaboradores_unicos.return_value = []
         self.client.login(username='admin', password='adminpass123')
 
-        # Testa com datas inválidas
+        # Intervalos longos são atendidos pelo resumo pré-agregado
         query = urlencode({
             'data_inicio': '2023-01-01',
-            'data_fim': '2023-03-15',  # > 31 dias
+            'data_fim': '2023-12-31',
             'obra_id': self.obra.id,
             'colaborador_id': self.colaborador.id
         })
         response = self.client.get(reverse('relatorio') + '?' + query)
         self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(get_messages(response.wsgi_request)), [])
+        mock_pedido_model.resumo_dashboard.assert_called_once()
+
+        # Testa com datas inválidas
+        query = urlencode({'data_inicio': '2023-13-01', 'data_fim': '2023-03-15'})
+        response = self.client.get(reverse('relatorio') + '?' + query)
+        self.assertEqual(response.status_code, 200)
         messages = list(get_messages(response.wsgi_request))
-        self.assertTrue(any("intervalo de datas não pode ultrapassar" in m.message for m in messages))
+        self.assertTrue(any("Datas inválidas" in m.message for m in messages))
 
         # Testa sem filtros (default)
         response = self.client.get(reverse('relatorio'))
@@ -394,3 +458,210 @@ class SistemaViewsTest(TestCase):
 
     # Para as views que acessam MongoDB (listar_pedidos, cadastrar_pedido, listar_registros, etc)
     # você pode criar mocks para o pedido_model se quiser testar esses fluxos.
+
+    def test_listar_pedidos_abre_nas_obras_do_encarregado(self):
+        permissao, _ = Permission.objects.get_or_create(
+            codename='view_refeicao', content_type=ContentType.objects.get_for_model(PermissaoVirtual),
+            defaults={'name': 'Pode visualizar refeições'},
+        )
+        self.encarregado_user.user_permissions.add(permissao)
+        outra_obra = Obra.objects.create(nome='Outra Obra', empresa='Empresa X', endereco='Rua Z', data_inicio='2023-01-01')
+        for i in range(3):
+            Colaborador.objects.create(
+                nome=f'Equipe {i}', cpf=f'{i}87.654.321-00', data_nascimento='1990-01-01',
+                telefone='11999999999', endereco='Rua Y', obra=outra_obra,
+            )
+
+        self.client.login(username='encarregado', password='pass123')
+        response = self.client.get(reverse('listar_pedidos'))
+        self.assertEqual(response.context['obra_id'], 'minhas')
+        self.assertEqual([c.nome for c in response.context['colaboradores']], ['Colaborador Teste'])
+        self.assertNotContains(response, 'Equipe 0')
+
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.get(reverse('listar_pedidos'))
+        self.assertEqual(len(response.context['colaboradores']), 4)
+
+        url = reverse('listar_pedidos_colaboradores')
+        with patch('Sistema.views.COLABORADORES_POR_PAGINA_PEDIDO', 2):
+            dados = self.client.get(url, {'obra_id': outra_obra.id}).json()
+            self.assertEqual([c['nome'] for c in dados['colaboradores']], ['Equipe 0', 'Equipe 1'])
+            dados = self.client.get(url, {'obra_id': outra_obra.id, 'apos': dados['proximo']}).json()
+            self.assertEqual(dados, {'colaboradores': [{'id': dados['colaboradores'][0]['id'], 'nome': 'Equipe 2', 'obra_nome': 'Outra Obra'}], 'proximo': None})
+
+        dados = self.client.get(url, {'obra_id': 'todas', 'busca': 'colab'}).json()
+        self.assertEqual([c['nome'] for c in dados['colaboradores']], ['Colaborador Teste'])
+
+    @patch("Sistema.views.pedido_model")
+    def test_cadastrar_pedido_informa_nao_encontrados(self, mock_pedido_model):
+        mock_pedido_model.registrar_refeicoes.return_value = {
+            "inseridos": 1, "existentes": 2, "falhas": 0, "nao_encontrados": [999],
+        }
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.post(reverse('cadastrar_pedido'), {
+            'data': '2025-06-25',
+            'refeicoes': [self.colaborador.id, 999],
+        })
+        self.assertRedirects(response, reverse('listar_pedidos'))
+        mock_pedido_model.registrar_refeicoes.assert_called_once()
+        messages = [m.message for m in get_messages(response.wsgi_request)]
+        self.assertTrue(any("999" in m for m in messages))
+        self.assertTrue(any("2 refeição(ões) já estavam registradas" in m for m in messages))
+
+    @patch("Sistema.views.pedido_model")
+    def test_listar_registros_usa_cursor(self, mock_pedido_model):
+        mock_pedido_model.listar_registros_paginados.return_value = {
+            "registros": [], "proximo": "20250625000000000000_abc", "anterior": None,
+        }
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.get(reverse('listar_registros') + '?apos=xyz')
+        self.assertEqual(response.status_code, 200)
+        mock_pedido_model.listar_registros_paginados.assert_called_once_with(limite=100, apos='xyz', antes=None)
+        self.assertContains(response, '?apos=20250625000000000000_abc')
+
+    @patch("Sistema.views.pedido_model")
+    def test_relatorio_usa_resumo_unico(self, mock_pedido_model):
+        mock_pedido_model.resumo_dashboard.return_value = {
+            "total_refeicoes": 7, "total_colaboradores": 3,
+            "refeicoes_por_dia": [{"data_formatada": "25/06/25", "total": 7}],
+            "soma_valor_refeicoes": 56.0,
+        }
+        mock_pedido_model.listar_obras_unicas.return_value = []
+        mock_pedido_model.listar_colaboradores_unicos.return_value = []
+        self.client.login(username='admin', password='adminpass123')
+        query = urlencode({'data_inicio': '2025-06-01', 'data_fim': '2025-06-30'})
+        response = self.client.get(reverse('relatorio') + '?' + query)
+        self.assertEqual(response.status_code, 200)
+        mock_pedido_model.resumo_dashboard.assert_called_once()
+        mock_pedido_model.total_refeicoes.assert_not_called()
+        self.assertEqual(response.context['resumo']['total_refeicoes'], 7)
+
+    def test_estatisticas_mongo_apenas_administradores(self):
+        self.client.login(username='encarregado', password='pass123')
+        response = self.client.get(reverse('estatisticas_mongo'))
+        self.assertEqual(response.status_code, 302)
+
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.get(reverse('estatisticas_mongo'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("max_pool_size", response.json()["pool"])
+        self.assertIn("comandos", response.json())
+        self.assertIsNone(response.json()["fila_escrita"])
+
+    @patch("Sistema.views.pedido_model")
+    def test_relatorio_parceiros(self, mock_pedido_model):
+        mock_pedido_model.totais_por_obra_mes.return_value = [
+            {"obra_id": self.obra.id, "ano": 2025, "mes": 6, "total": 5, "soma_valor_refeicao": 40.0},
+        ]
+        self.client.login(username='encarregado', password='pass123')
+        response = self.client.get(reverse('relatorio_parceiros'))
+        self.assertEqual(response.status_code, 302)
+
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.get(reverse('relatorio_parceiros'), {'data_inicio': '2025-06-01', 'data_fim': '2025-06-30'})
+        self.assertEqual(response.status_code, 200)
+        mock_pedido_model.totais_por_obra_mes.assert_called_once_with({'data_inicio': '2025-06-01', 'data_fim': '2025-06-30'})
+        self.assertContains(response, "06/2025")
+        self.assertContains(response, "R$ 40")
+
+        response = self.client.get(reverse('relatorio_parceiros'), {'data_inicio': '2025-06-30', 'data_fim': '2025-06-01'})
+        self.assertEqual(mock_pedido_model.totais_por_obra_mes.call_count, 1)
+
+    @patch("Sistema.views.LIMITE_SELECT_COLABORADORES", 1)
+    @patch("Sistema.views.pedido_model")
+    def test_relatorio_troca_select_por_busca(self, mock_pedido_model):
+        mock_pedido_model.listar_obras_unicas.return_value = []
+        mock_pedido_model.listar_colaboradores_unicos.return_value = [
+            {"colaborador_id": 1, "colaborador_nome": "Ana"},
+            {"colaborador_id": 2, "colaborador_nome": "Bruno"},
+        ]
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.get(reverse('relatorio'))
+        self.assertTrue(response.context['usar_busca_colaborador'])
+        self.assertEqual(response.context['colaboradores'], [])
+        self.assertContains(response, 'busca-colaborador')
+
+    @patch("Sistema.views.pedido_model")
+    def test_buscar_colaboradores_refeicoes(self, mock_pedido_model):
+        mock_pedido_model.buscar_colaboradores_unicos.return_value = [{"colaborador_id": 1, "colaborador_nome": "Ana"}]
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.get(reverse('buscar_colaboradores_refeicoes') + '?q=an')
+        self.assertEqual(response.json(), {"colaboradores": [{"colaborador_id": 1, "colaborador_nome": "Ana"}]})
+        mock_pedido_model.buscar_colaboradores_unicos.assert_called_once_with('an')
+
+    @patch("Sistema.views.pedido_model")
+    def test_editar_registro_data_ja_registrada(self, mock_pedido_model):
+        from pymongo.errors import DuplicateKeyError
+        mock_pedido_model.buscar_registro.return_value = {"colaborador_nome": "Colaborador Teste"}
+        mock_pedido_model.atualizar_data_refeicao.side_effect = DuplicateKeyError("E11000")
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.post(reverse('editar_registro', args=['abc']), {'data_refeicao': '2025-06-25'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'já tem refeição registrada nesta data')
+
+    @patch("Sistema.views.pedido_model")
+    def test_exportar_registros_csv(self, mock_pedido_model):
+        mock_pedido_model.iterar_registros.return_value = iter([{
+            "colaborador_id": 1, "colaborador_nome": "Ana", "obra_id": 2, "obra_nome": "Obra Teste",
+            "data_refeicao": datetime(2025, 6, 25), "valor_refeicao": 8.0,
+            "registrado_em": datetime(2025, 6, 25, 11, 30), "registrado_por_nome": "admin",
+        }])
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.get(reverse('exportar_registros') + '?formato=csv&obra_id=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        conteudo = b"".join(response.streaming_content).decode("utf-8")
+        self.assertIn("Ana;2;Obra Teste;25/06/2025;8,00;25/06/2025 11:30;admin", conteudo)
+        filtros = mock_pedido_model.iterar_registros.call_args[0][0]
+        self.assertEqual(filtros["obra_id"], "2")
+
+    @patch("Sistema.views.pedido_model")
+    async def test_exportar_registros_csv_asgi_envia_aos_poucos(self, mock_pedido_model):
+        mock_pedido_model.iterar_registros.return_value = iter([{
+            "colaborador_id": 1, "colaborador_nome": "Ana", "obra_id": 2, "obra_nome": "Obra Teste",
+            "data_refeicao": datetime(2025, 6, 25), "valor_refeicao": 8.0,
+        }])
+        await self.async_client.alogin(username='admin', password='adminpass123')
+        response = await self.async_client.get(reverse('exportar_registros'))
+        self.assertTrue(response.is_async)
+        conteudo = b"".join([parte async for parte in response.streaming_content]).decode("utf-8")
+        self.assertIn("Ana;2;Obra Teste;25/06/2025;8,00;;", conteudo)
+
+    @patch("Sistema.views.pedido_model")
+    def test_exportar_registros_formato_invalido(self, mock_pedido_model):
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.get(reverse('exportar_registros') + '?formato=pdf')
+        self.assertEqual(response.status_code, 400)
+
+    @patch("Sistema.views.pedido_model")
+    def test_editar_registros_em_lote(self, mock_pedido_model):
+        mock_pedido_model.atualizar_data_refeicoes_em_lote.return_value = {"atualizados": 2, "conflitos": 1}
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.post(reverse('editar_registros_em_lote'), {
+            'ids': ['a', 'b', 'c'], 'data_refeicao': '2025-06-25',
+        })
+        self.assertRedirects(response, reverse('listar_registros'), fetch_redirect_response=False)
+        args, kwargs = mock_pedido_model.atualizar_data_refeicoes_em_lote.call_args
+        self.assertEqual(args[0], '2025-06-25')
+        self.assertEqual(kwargs['ids'], ['a', 'b', 'c'])
+        messages = [m.message for m in get_messages(response.wsgi_request)]
+        self.assertTrue(any("1 refeição(ões) não foram alteradas" in m for m in messages))
+
+    @patch("Sistema.views.pedido_model")
+    def test_excluir_registros_em_lote_sem_selecao(self, mock_pedido_model):
+        self.client.login(username='admin', password='adminpass123')
+        response = self.client.post(reverse('excluir_registros_em_lote'), {'obra_id': self.obra.id})
+        self.assertRedirects(response, reverse('listar_registros'), fetch_redirect_response=False)
+        mock_pedido_model.excluir_registros_em_lote.assert_not_called()
+        messages = [m.message for m in get_messages(response.wsgi_request)]
+        self.assertTrue(any("Selecione pelo menos um registro" in m for m in messages))
+
+    @patch("Sistema.views.pedido_model")
+    def test_operacoes_em_lote_exigem_administrador(self, mock_pedido_model):
+        self.client.login(username='encarregado', password='pass123')
+        for rota in ('editar_registros_em_lote', 'excluir_registros_em_lote'):
+            response = self.client.post(reverse(rota), {'ids': ['a'], 'data_refeicao': '2025-06-25'})
+            self.assertEqual(response.status_code, 302)
+            self.assertNotEqual(response.url, reverse('listar_registros'))
+        mock_pedido_model.atualizar_data_refeicoes_em_lote.assert_not_called()
+        mock_pedido_model.excluir_registros_em_lote.assert_not_called()
@@ -0,0 +1,199 @@
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from bson import ObjectId
+from django.conf import settings
+from django.utils.module_loading import import_string
+from Sistema.models import Colaborador
+
+VALOR_REFEICAO = 8.00
+
+# Backend usado quando settings.REFEICOES_BACKEND não é definido
+BACKEND_PADRAO = "Sistema.utils.mongo.mongo_model.ControleRefeicoes"
+
+
+class BackendRefeicoes(ABC):
+    """API comum dos registros de refeições usada pelas views.
+
+    Cada backend (Mongo, memória, SQL) implementa os métodos abstratos com as
+    mesmas entradas, retornos e exceções do ControleRefeicoes original:
+    datas chegam como "AAAA-MM-DD", filtros inválidos lançam ValueError e
+    ids de registro são tratados como texto opaco (ObjectId no Mongo e na
+    memória, inteiro no SQL).
+    """
+
+    # Métodos que garantidamente não consultam o ORM do Django. Os demais são
+    # tratados como se consultassem: AsyncControleRefeicoes os roda na thread
+    # "sensível" do asgiref, onde a conexão SQL da requisição é gerenciada.
+    metodos_sem_orm = frozenset()
+
+    def usa_orm(self, metodo):
+        return metodo not in self.metodos_sem_orm
+
+    @abstractmethod
+    def registrar_refeicoes(self, data, colaboradores_ids, usuario):
+        ...
+
+    @abstractmethod
+    def listar_registros(self):
+        ...
+
+    @abstractmethod
+    def listar_registros_paginados(self, limite=100, apos=None, antes=None, filtros=None):
+        ...
+
+    @abstractmethod
+    def iterar_registros(self, filtros, tamanho_lote=1000):
+        ...
+
+    @abstractmethod
+    def buscar_registro(self, registro_id):
+        ...
+
+    @abstractmethod
+    def atualizar_data_refeicao(self, registro_id, nova_data):
+        ...
+
+    @abstractmethod
+    def excluir_registro(self, registro_id):
+        ...
+
+    @abstractmethod
+    def atualizar_data_refeicoes_em_lote(self, nova_data, ids=None, filtros=None):
+        ...
+
+    @abstractmethod
+    def excluir_registros_em_lote(self, ids=None, filtros=None):
+        ...
+
+    @abstractmethod
+    def resumo_dashboard(self, filtros):
+        ...
+
+    @abstractmethod
+    def totais_por_obra_mes(self, filtros):
+        """[{obra_id, ano, mes, total, soma_valor_refeicao}], ordenado por ano, mês e obra."""
+        ...
+
+    @abstractmethod
+    def listar_obras_unicas(self):
+        ...
+
+    @abstractmethod
+    def corrigir_nomes(self, campo_nome, nomes):
+        """Grava {id: nome} atual em colaborador_nome ou obra_nome dos registros existentes; retorna quantos mudaram."""
+        ...
+
+    @abstractmethod
+    def listar_colaboradores_unicos(self):
+        ...
+
+    # Consultas avulsas do dashboard: por padrão derivadas de resumo_dashboard
+    def total_refeicoes(self, filtros):
+        return self.resumo_dashboard(filtros)["total_refeicoes"]
+
+    def total_colaboradores_unicos(self, filtros):
+        return self.resumo_dashboard(filtros)["total_colaboradores"]
+
+    def refeicoes_por_dia(self, filtros):
+        return self.resumo_dashboard(filtros)["refeicoes_por_dia"]
+
+    def somar_valor_refeicoes(self, filtros):
+        return self.resumo_dashboard(filtros)["soma_valor_refeicoes"]
+
+    def buscar_colaboradores_unicos(self, termo, limite=20):
+        """Busca por parte do nome na lista de colaboradores com refeições."""
+        termo = (termo or "").strip().casefold()
+        if not termo:
+            return []
+        encontrados = []
+        for colaborador in self.listar_colaboradores_unicos():
+            if termo in (colaborador["colaborador_nome"] or "").casefold():
+                encontrados.append(colaborador)
+                if len(encontrados) >= limite:
+                    break
+        return encontrados
+
+    def _montar_registros(self, data_formatada, colaboradores, usuario):
+        return [
+            {
+                "colaborador_id": colaborador.id,
+                "colaborador_nome": colaborador.nome,
+                "obra_id": colaborador.obra.id,
+                "obra_nome": colaborador.obra.nome,
+                "data_refeicao": data_formatada,
+                "valor_refeicao": VALOR_REFEICAO,
+                "registrado_em": datetime.now(),
+                "registrado_por_id": usuario.id,
+                "registrado_por_nome": usuario.username,
+            }
+            for colaborador in colaboradores
+        ]
+
+    def _resolver_colaboradores(self, colaboradores_ids):
+        """Busca todos os colaboradores (com a obra) em uma única consulta.
+
+        Retorna a lista de colaboradores encontrados e os ids enviados que
+        não existem (ou não são números válidos).
+        """
+        ids_validos = []
+        nao_encontrados = []
+        for colaborador_id in colaboradores_ids:
+            try:
+                ids_validos.append(int(colaborador_id))
+            except (TypeError, ValueError):
+                nao_encontrados.append(colaborador_id)
+
+        # Remove repetidos mantendo a ordem enviada
+        ids_validos = list(dict.fromkeys(ids_validos))
+        if not ids_validos:
+            return [], nao_encontrados
+
+        encontrados = {
+            colaborador.id: colaborador
+            for colaborador in Colaborador.objects.select_related("obra").filter(id__in=ids_validos)
+        }
+        colaboradores = []
+        for colaborador_id in ids_validos:
+            if colaborador_id in encontrados:
+                colaboradores.append(encontrados[colaborador_id])
+            else:
+                nao_encontrados.append(colaborador_id)
+        return colaboradores, nao_encontrados
+
+    def _codificar_cursor(self, registro):
+        return f'{registro["data_refeicao"].strftime("%Y%m%d%H%M%S%f")}_{registro["_id"]}'
+
+    def _decodificar_cursor(self, cursor):
+        """Converte o cursor de volta em (data_refeicao, _id). Lança ValueError se inválido."""
+        try:
+            data, registro_id = cursor.split("_", 1)
+            return datetime.strptime(data, "%Y%m%d%H%M%S%f"), ObjectId(registro_id)
+        except Exception as e:
+            raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def resumo_vazio():
+    """Resumo do dashboard quando não há filtros ou os filtros são inválidos."""
+    return {
+        "total_refeicoes": 0,
+        "total_colaboradores": 0,
+        "refeicoes_por_dia": [],
+        "soma_valor_refeicoes": 0,
+    }
+
+
+# Uma instância por backend e processo (o backend em memória guarda os
+# registros na própria instância)
+_instancias = {}
+_lock = threading.Lock()
+
+
+def get_controle_refeicoes(caminho=None):
+    """Backend configurado em settings.REFEICOES_BACKEND (caminho da classe)."""
+    caminho = caminho or getattr(settings, "REFEICOES_BACKEND", BACKEND_PADRAO)
+    if caminho not in _instancias:
+        with _lock:
+            if caminho not in _instancias:
+                _instancias[caminho] = import_string(caminho)()
+    return _instancias[caminho]
@@ -0,0 +1,99 @@
+import base64
+import json
+
+from django.db.models import Q
+from Sistema.models import Colaborador, Obra, normalizar_busca
+
+COLABORADORES_POR_PAGINA = 50
+
+
+def obras_visiveis(user):
+    """Encarregados veem só as obras em que são encarregado_responsavel; os demais, todas."""
+    if user.groups.filter(name='Encarregados').exists():
+        return Obra.objects.filter(encarregado_responsavel=user)
+    return Obra.objects.all()
+
+
+def colaboradores_visiveis(user):
+    """Colaboradores das obras visíveis ao usuário, já com a obra no mesmo SELECT."""
+    colaboradores = Colaborador.objects.select_related('obra')
+    if user.groups.filter(name='Encarregados').exists():
+        colaboradores = colaboradores.filter(obra__encarregado_responsavel=user)
+    return colaboradores
+
+
+def _prefixo_cpf(digitos):
+    # "12345678" -> "123.456.78": o CPF é gravado com a máscara
+    partes = [digitos[:3], digitos[3:6], digitos[6:9]]
+    prefixo = ".".join(parte for parte in partes if parte)
+    return f"{prefixo}-{digitos[9:11]}" if len(digitos) > 9 else prefixo
+
+
+def _comeca_com(campo, prefixo):
+    # Intervalo em vez de LIKE 'x%': o LIKE só usa o índice em algumas collations
+    return Q(**{f"{campo}__gte": prefixo, f"{campo}__lt": prefixo + "\uffff"})
+
+
+def filtrar_colaboradores(colaboradores, obra_id=None, busca=None):
+    """Filtra por obra e pelo início do nome (sem diferenciar acentos e
+    maiúsculas) ou do CPF (com ou sem máscara).
+
+    As duas buscas são intervalos sobre os índices de nome_busca e cpf.
+    Lança ValueError se obra_id não for um número.
+    """
+    if obra_id:
+        colaboradores = colaboradores.filter(obra_id=int(obra_id))
+    busca = (busca or "").strip()
+    if busca:
+        condicao = _comeca_com("nome_busca", normalizar_busca(busca)) | _comeca_com("cpf", busca)
+        if busca.isdigit():
+            condicao |= _comeca_com("cpf", _prefixo_cpf(busca))
+        colaboradores = colaboradores.filter(condicao)
+    return colaboradores
+
+
+def _codificar_cursor(colaborador):
+    # Opaco na URL: o nome não aparece em texto no link da página
+    dados = json.dumps([colaborador.nome, colaborador.id]).encode()
+    return base64.urlsafe_b64encode(dados).decode()
+
+
+def _decodificar_cursor(cursor):
+    """Converte o cursor de volta em (nome, id). Lança ValueError se inválido."""
+    try:
+        nome, colaborador_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(nome), int(colaborador_id)
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def paginar_colaboradores(colaboradores, limite=COLABORADORES_POR_PAGINA, apos=None, antes=None):
+    """Página em ordem de nome com paginação por cursor (nome, id), sem OFFSET.
+
+    Retorna {"colaboradores": [...], "proximo": cursor|None, "anterior": cursor|None}.
+    Lança ValueError se o cursor for inválido.
+    """
+    if apos:
+        nome, colaborador_id = _decodificar_cursor(apos)
+        colaboradores = colaboradores.filter(Q(nome__gt=nome) | Q(nome=nome, id__gt=colaborador_id))
+        ordem = ("nome", "id")
+    elif antes:
+        nome, colaborador_id = _decodificar_cursor(antes)
+        colaboradores = colaboradores.filter(Q(nome__lt=nome) | Q(nome=nome, id__lt=colaborador_id))
+        ordem = ("-nome", "-id")
+    else:
+        ordem = ("nome", "id")
+
+    pagina = list(colaboradores.order_by(*ordem)[:limite + 1])
+    tem_mais = len(pagina) > limite
+    pagina = pagina[:limite]
+    if antes:
+        pagina.reverse()
+
+    tem_proxima = tem_mais if not antes else True
+    tem_anterior = bool(apos) or (bool(antes) and tem_mais)
+    return {
+        "colaboradores": pagina,
+        "proximo": _codificar_cursor(pagina[-1]) if pagina and tem_proxima else None,
+        "anterior": _codificar_cursor(pagina[0]) if pagina and tem_anterior else None,
+    }
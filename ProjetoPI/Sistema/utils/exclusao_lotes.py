@@ -0,0 +1,178 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from threading import Lock
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import CASCADE, PROTECT, RESTRICT, F, ProtectedError
+from django.utils import timezone
+from Sistema.models import ExclusaoLote
+
+logger = logging.getLogger(__name__)
+
+# Linhas apagadas por transação: cada lote segura o lock de escrita do SQLite por pouco tempo
+TAMANHO_LOTE_EXCLUSAO = 200
+# Até quantas linhas (com os dependentes em CASCADE) a exclusão roda direto na requisição
+LIMITE_EXCLUSAO_IMEDIATA = 500
+# Sem progresso por esse tempo, o job foi interrompido (processo reciclado ou derrubado)
+MINUTOS_EXCLUSAO_PARADA = 10
+
+_executor = None
+_lock_executor = Lock()
+
+
+def _obter_executor():
+    # Uma exclusão por vez: duas em paralelo só disputariam o mesmo lock de escrita
+    global _executor
+    if _executor is None:
+        with _lock_executor:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="exclusao-lotes")
+    return _executor
+
+
+def _descartar_executor():
+    global _executor
+    _executor = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_descartar_executor)
+
+
+def _relacionados(modelo, regras):
+    return [
+        rel for rel in modelo._meta.related_objects
+        if not rel.many_to_many and rel.on_delete in regras
+    ]
+
+
+def _dependentes(relacao, queryset):
+    return relacao.related_model._base_manager.filter(**{f"{relacao.field.name}__in": queryset.values("pk")})
+
+
+def contar_afetados(queryset, limite=None):
+    """Linhas do queryset mais todas as que seriam apagadas em CASCADE.
+
+    Com `limite`, para de contar assim que o total passa dele (cada COUNT é
+    feito sobre um LIMIT); o valor retornado só indica que o limite foi passado.
+    """
+    total = (queryset if limite is None else queryset[:limite + 1]).count()
+    for relacao in _relacionados(queryset.model, (CASCADE,)):
+        if limite is not None and total > limite:
+            break
+        total += contar_afetados(_dependentes(relacao, queryset), None if limite is None else limite - total)
+    return total
+
+
+def referencias_protegidas(queryset):
+    """Nome do primeiro modelo (PROTECT/RESTRICT) que impede a exclusão, ou None."""
+    for relacao in _relacionados(queryset.model, (PROTECT, RESTRICT)):
+        if _dependentes(relacao, queryset).exists():
+            return relacao.related_model._meta.verbose_name_plural
+    for relacao in _relacionados(queryset.model, (CASCADE,)):
+        protegido = referencias_protegidas(_dependentes(relacao, queryset))
+        if protegido:
+            return protegido
+    return None
+
+
+def excluir_em_lotes(queryset, tamanho_lote=TAMANHO_LOTE_EXCLUSAO, progresso=None):
+    """Apaga o queryset e os dependentes em CASCADE, de baixo para cima, em transações curtas.
+
+    Cada transação apaga no máximo tamanho_lote linhas de um modelo, então
+    outras escritas conseguem passar entre os lotes. `progresso` recebe o
+    número de linhas apagadas em cada lote. Retorna o total apagado.
+    """
+    excluidos = 0
+    for relacao in _relacionados(queryset.model, (CASCADE,)):
+        excluidos += excluir_em_lotes(_dependentes(relacao, queryset), tamanho_lote, progresso)
+
+    while True:
+        pks = list(queryset.values_list("pk", flat=True)[:tamanho_lote])
+        if not pks:
+            return excluidos
+        with transaction.atomic():
+            apagados, _ = queryset.model._base_manager.filter(pk__in=pks).delete()
+        excluidos += apagados
+        if progresso:
+            progresso(apagados)
+
+
+def consultar_exclusao(job_id, solicitado_por=None):
+    """Situação da exclusão: {estado, modelo, total, excluidos, erro} ou None se não existir.
+
+    Com `solicitado_por`, só encontra os jobs pedidos por esse usuário.
+    """
+    try:
+        jobs = ExclusaoLote.objects.filter(pk=job_id)
+        if solicitado_por is not None:
+            jobs = jobs.filter(solicitado_por=solicitado_por)
+        job = jobs.first()
+    except ValidationError:
+        return None
+    if job is None:
+        return None
+    return {"estado": job.estado, "modelo": job.modelo, "total": job.total, "excluidos": job.excluidos, "erro": job.erro}
+
+
+def iniciar_exclusao(modelo, ids, usuario=None):
+    """Agenda a exclusão em segundo plano e retorna o id do job para consultar_exclusao.
+
+    Recusa (ProtectedError) antes de apagar qualquer coisa se algum
+    dependente estiver protegido, já que os lotes não são uma única transação.
+    A situação fica na tabela ExclusaoLote, visível a todos os processos; se
+    o processo cair no meio, "python manage.py retomar_exclusoes" termina o job.
+    O total de linhas afetadas é contado já em segundo plano.
+    """
+    queryset = modelo.objects.filter(id__in=ids)
+    protegido = referencias_protegidas(queryset)
+    if protegido:
+        raise ProtectedError(f"Há {protegido} vinculados aos registros selecionados.", set())
+
+    job = ExclusaoLote.objects.create(modelo=modelo.__name__, ids=list(ids), solicitado_por=usuario)
+    # Só depois do commit: a thread precisa encontrar o job no banco
+    transaction.on_commit(lambda: _obter_executor().submit(_executar_em_thread, job.pk))
+    return job.pk.hex
+
+
+def executar_exclusao(job_id, tamanho_lote=TAMANHO_LOTE_EXCLUSAO):
+    """Roda (ou continua) a exclusão do job e retorna a situação final.
+
+    Os lotes já apagados não voltam, então rodar de novo um job interrompido
+    apaga só o que faltou e soma ao progresso já gravado.
+    """
+    job = ExclusaoLote.objects.get(pk=job_id)
+    modelo = apps.get_model("Sistema", job.modelo)
+    queryset = modelo.objects.filter(id__in=job.ids)
+    ExclusaoLote.objects.filter(pk=job.pk).update(
+        estado="em_andamento", erro=None, total=job.excluidos + contar_afetados(queryset), atualizado_em=timezone.now(),
+    )
+
+    def progresso(apagados):
+        ExclusaoLote.objects.filter(pk=job.pk).update(excluidos=F("excluidos") + apagados, atualizado_em=timezone.now())
+
+    try:
+        excluir_em_lotes(queryset, tamanho_lote, progresso)
+        estado, erro = "concluido", None
+    except Exception as e:
+        logger.exception("Erro na exclusão %s de %s %s", job.pk, job.modelo, job.ids)
+        estado, erro = "erro", str(e)
+    ExclusaoLote.objects.filter(pk=job.pk).update(estado=estado, erro=erro, atualizado_em=timezone.now())
+    return consultar_exclusao(job.pk)
+
+
+def exclusoes_interrompidas(minutos=MINUTOS_EXCLUSAO_PARADA):
+    """Jobs pendentes ou em andamento sem progresso há `minutos` minutos."""
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return ExclusaoLote.objects.filter(estado__in=("pendente", "em_andamento"), atualizado_em__lt=limite)
+
+
+def _executar_em_thread(job_id):
+    try:
+        executar_exclusao(job_id)
+    finally:
+        # A thread do executor abre a própria conexão; não deixa ela pendurada
+        connection.close()
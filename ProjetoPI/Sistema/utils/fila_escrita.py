@@ -0,0 +1,172 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE_FILA = 500
+# Tempo máximo (s) que um registro espera na fila antes de ser gravado
+INTERVALO_FILA = 0.2
+TENTATIVAS_GRAVACAO = 3
+
+
+def _ids(lote):
+    # Só o que identifica cada registro: nomes e usuário não vão para o log
+    return [registro.get("colaborador_id") if isinstance(registro, dict) else registro for registro in lote]
+
+
+class FilaEscrita:
+    """Fila de escrita adiada (write-behind) em memória do processo.
+
+    As requisições só enfileiram os registros e retornam; uma thread de
+    fundo junta o que chegou de várias requisições e chama `gravar` com
+    lotes de até `tamanho_lote` registros, assim que o lote enche ou a cada
+    `intervalo` segundos. O que ainda estiver na fila é gravado quando o
+    processo encerra normalmente (atexit); num encerramento forçado
+    (SIGKILL, queda) esses registros se perdem.
+
+    `gravar` pode retornar (inseridos, falhas): as operações que falharam
+    individualmente contam como registros com erro, não como gravados.
+    """
+
+    def __init__(self, gravar, tamanho_lote=TAMANHO_LOTE_FILA, intervalo=INTERVALO_FILA):
+        self._gravar = gravar
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self._iniciar()
+        atexit.register(self.encerrar)
+        if hasattr(os, "register_at_fork"):
+            # O filho não herda a thread; os registros copiados do pai são gravados pelo pai
+            os.register_at_fork(after_in_child=self._iniciar)
+
+    def _iniciar(self):
+        self._condicao = threading.Condition()
+        self._fila = deque()
+        self._thread = None
+        self._encerrada = False
+        self._urgente = False
+        self._em_gravacao = 0
+        self.zerar()
+
+    def zerar(self):
+        with self._condicao:
+            self.lotes = 0
+            self.registros_gravados = 0
+            self.registros_descartados = 0
+            self.registros_com_erro = 0
+            self.falhas = 0
+            self.pico_profundidade = len(self._fila)
+            self.latencia_total_ms = 0.0
+            self.latencia_max_ms = 0.0
+            self.latencia_ultimo_ms = None
+
+    def estatisticas(self):
+        with self._condicao:
+            return {
+                "profundidade": len(self._fila),
+                "pico_profundidade": self.pico_profundidade,
+                "em_gravacao": self._em_gravacao,
+                "lotes": self.lotes,
+                "registros_gravados": self.registros_gravados,
+                "registros_descartados": self.registros_descartados,
+                "registros_com_erro": self.registros_com_erro,
+                "falhas": self.falhas,
+                "latencia_media_ms": round(self.latencia_total_ms / self.lotes, 1) if self.lotes else None,
+                "latencia_max_ms": round(self.latencia_max_ms, 1),
+                "latencia_ultimo_ms": self.latencia_ultimo_ms,
+            }
+
+    def enfileirar(self, registros):
+        if not registros:
+            return
+        with self._condicao:
+            if not self._encerrada:
+                self._fila.extend(registros)
+                self.pico_profundidade = max(self.pico_profundidade, len(self._fila))
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._executar, name="fila-escrita", daemon=True)
+                    self._thread.start()
+                if len(self._fila) >= self.tamanho_lote:
+                    self._condicao.notify_all()
+                return
+        # Processo encerrando: grava direto na requisição
+        self._gravar_lote(list(registros))
+
+    def esvaziar(self, timeout=None):
+        """Grava imediatamente o que está na fila e espera terminar. Retorna False se o timeout expirar."""
+        with self._condicao:
+            self._urgente = True
+            self._condicao.notify_all()
+            return self._condicao.wait_for(lambda: not self._fila and not self._em_gravacao, timeout)
+
+    def encerrar(self, timeout=30):
+        """Grava o que resta e para a thread (chamado no atexit)."""
+        with self._condicao:
+            self._encerrada = True
+            self._condicao.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                logger.error("Fila de escrita encerrada com %d registros ainda não gravados", len(self._fila))
+
+    def _executar(self):
+        while True:
+            with self._condicao:
+                self._condicao.wait_for(
+                    lambda: len(self._fila) >= self.tamanho_lote or self._urgente or self._encerrada,
+                    self.intervalo,
+                )
+                if not self._fila:
+                    self._urgente = False
+                    self._condicao.notify_all()
+                    if self._encerrada:
+                        return
+                    continue
+                lote = [self._fila.popleft() for _ in range(min(self.tamanho_lote, len(self._fila)))]
+                self._em_gravacao = len(lote)
+            self._gravar_lote(lote)
+
+    def _gravar_lote(self, lote):
+        inicio = time.perf_counter()
+        gravado = False
+        falhas = 0
+        com_erro = 0
+        for tentativa in range(1, TENTATIVAS_GRAVACAO + 1):
+            try:
+                resultado = self._gravar(lote)
+                gravado = True
+                if isinstance(resultado, tuple):
+                    com_erro = resultado[1]
+                break
+            except Exception:
+                falhas += 1
+                logger.exception(
+                    "Falha ao gravar lote de %d refeições (tentativa %d de %d)", len(lote), tentativa, TENTATIVAS_GRAVACAO
+                )
+                if tentativa < TENTATIVAS_GRAVACAO:
+                    time.sleep(self.intervalo)
+        if not gravado:
+            logger.error("Lote de %d refeições descartado (colaboradores %s)", len(lote), _ids(lote))
+        elif com_erro:
+            logger.error(
+                "%d de %d refeições do lote não foram gravadas (colaboradores do lote: %s)", com_erro, len(lote), _ids(lote)
+            )
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+
+        with self._condicao:
+            self.lotes += 1
+            self.falhas += falhas
+            if gravado:
+                self.registros_gravados += len(lote) - com_erro
+                self.registros_com_erro += com_erro
+            else:
+                self.registros_descartados += len(lote)
+            self.latencia_total_ms += latencia_ms
+            self.latencia_max_ms = max(self.latencia_max_ms, latencia_ms)
+            self.latencia_ultimo_ms = round(latencia_ms, 1)
+            self._em_gravacao = 0
+            self._condicao.notify_all()
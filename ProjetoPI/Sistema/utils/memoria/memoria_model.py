@@ -0,0 +1,260 @@
+import threading
+from datetime import datetime
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from pymongo.results import DeleteResult, UpdateResult
+from Sistema.utils.backend_refeicoes import BackendRefeicoes
+from Sistema.utils.nomes_cadastro import CAMPOS_NOME
+
+# Mesmo código de erro que o Mongo usa para violação de índice único
+ERRO_CHAVE_DUPLICADA = 11000
+
+CAMPOS_LISTAGEM = ("_id", "colaborador_nome", "obra_nome", "data_refeicao", "valor_refeicao")
+CAMPOS_EXPORTACAO = (
+    "colaborador_id", "colaborador_nome", "obra_id", "obra_nome", "data_refeicao",
+    "valor_refeicao", "registrado_em", "registrado_por_nome",
+)
+
+
+class ControleRefeicoesMemoria(BackendRefeicoes):
+    """Registros de refeições guardados em memória, no próprio processo.
+
+    Feito para testes, benchmarks e desenvolvimento sem MongoDB: aceita os
+    mesmos filtros, agrupamentos e intervalos de datas do ControleRefeicoes
+    e mantém a regra de uma refeição por colaborador por dia. Os dados não
+    são compartilhados entre processos e somem quando o processo termina.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._registros = {}
+        # (colaborador_id, data_refeicao) -> _id: papel do índice único do Mongo
+        self._por_colaborador_dia = {}
+
+    def registrar_refeicoes(self, data, colaboradores_ids, usuario):
+        data_formatada = datetime.strptime(data, "%Y-%m-%d")
+        colaboradores, nao_encontrados = self._resolver_colaboradores(colaboradores_ids)
+        registros = self._montar_registros(data_formatada, colaboradores, usuario)
+
+        inseridos = 0
+        with self._lock:
+            for registro in registros:
+                chave = (registro["colaborador_id"], data_formatada)
+                if chave in self._por_colaborador_dia:
+                    continue
+                registro["_id"] = ObjectId()
+                self._registros[registro["_id"]] = registro
+                self._por_colaborador_dia[chave] = registro["_id"]
+                inseridos += 1
+
+        return {
+            "inseridos": inseridos,
+            "existentes": len(registros) - inseridos,
+            "falhas": 0,
+            "nao_encontrados": nao_encontrados,
+        }
+
+    def listar_registros(self):
+        with self._lock:
+            registros = [dict(r) for r in self._registros.values()]
+        for r in registros:
+            r["id"] = str(r["_id"])
+        return registros
+
+    def listar_registros_paginados(self, limite=100, apos=None, antes=None, filtros=None):
+        """Mesma paginação por cursor do ControleRefeicoes (mais recente primeiro)."""
+        registros = sorted(self._selecionar(filtros or {}), key=_chave_ordem, reverse=True)
+
+        if apos:
+            posicao = self._decodificar_cursor(apos)
+            registros = [r for r in registros if _chave_ordem(r) < posicao]
+        elif antes:
+            posicao = self._decodificar_cursor(antes)
+            registros = [r for r in reversed(registros) if _chave_ordem(r) > posicao]
+
+        tem_mais = len(registros) > limite
+        registros = [_projetar(r, CAMPOS_LISTAGEM) for r in registros[:limite]]
+        if antes:
+            registros.reverse()
+
+        for r in registros:
+            r["id"] = str(r["_id"])
+
+        if antes:
+            tem_proxima, tem_anterior = True, tem_mais
+        else:
+            tem_proxima, tem_anterior = tem_mais, bool(apos)
+
+        return {
+            "registros": registros,
+            "proximo": self._codificar_cursor(registros[-1]) if registros and tem_proxima else None,
+            "anterior": self._codificar_cursor(registros[0]) if registros and tem_anterior else None,
+        }
+
+    def iterar_registros(self, filtros, tamanho_lote=1000):
+        registros = sorted(self._selecionar(filtros), key=_chave_ordem)
+        return (_projetar(r, CAMPOS_EXPORTACAO) for r in registros)
+
+    def buscar_registro(self, registro_id):
+        with self._lock:
+            registro = self._registros.get(ObjectId(registro_id))
+            return dict(registro) if registro else None
+
+    def atualizar_data_refeicao(self, registro_id, nova_data):
+        data_formatada = datetime.strptime(nova_data, "%Y-%m-%d")
+        with self._lock:
+            registro = self._registros.get(ObjectId(registro_id))
+            if registro is None:
+                return UpdateResult({"n": 0, "nModified": 0}, acknowledged=True)
+            if registro["data_refeicao"] == data_formatada:
+                return UpdateResult({"n": 1, "nModified": 0}, acknowledged=True)
+            if (registro["colaborador_id"], data_formatada) in self._por_colaborador_dia:
+                raise DuplicateKeyError("Colaborador já tem refeição registrada nesta data.", ERRO_CHAVE_DUPLICADA)
+            self._mudar_data(registro, data_formatada)
+        return UpdateResult({"n": 1, "nModified": 1}, acknowledged=True)
+
+    def excluir_registro(self, registro_id):
+        with self._lock:
+            excluido = self._remover(ObjectId(registro_id))
+        return DeleteResult({"n": int(excluido)}, acknowledged=True)
+
+    def atualizar_data_refeicoes_em_lote(self, nova_data, ids=None, filtros=None):
+        data_formatada = datetime.strptime(nova_data, "%Y-%m-%d")
+        atualizados = 0
+        conflitos = 0
+        with self._lock:
+            for registro in self._selecao_lote(ids, filtros):
+                if registro["data_refeicao"] == data_formatada:
+                    continue
+                if (registro["colaborador_id"], data_formatada) in self._por_colaborador_dia:
+                    conflitos += 1
+                    continue
+                self._mudar_data(registro, data_formatada)
+                atualizados += 1
+        return {"atualizados": atualizados, "conflitos": conflitos}
+
+    def excluir_registros_em_lote(self, ids=None, filtros=None):
+        with self._lock:
+            excluidos = sum(self._remover(registro["_id"]) for registro in self._selecao_lote(ids, filtros))
+        return {"excluidos": excluidos}
+
+    def resumo_dashboard(self, filtros):
+        total = 0
+        soma = 0
+        colaboradores = set()
+        por_dia = {}
+        for registro in self._selecionar(filtros):
+            total += 1
+            soma += registro["valor_refeicao"]
+            colaboradores.add(registro["colaborador_id"])
+            dia = por_dia.setdefault(registro["data_refeicao"], {"total": 0, "soma_valor_refeicao": 0})
+            dia["total"] += 1
+            dia["soma_valor_refeicao"] += registro["valor_refeicao"]
+
+        return {
+            "total_refeicoes": total,
+            "total_colaboradores": len(colaboradores),
+            "refeicoes_por_dia": [
+                {"_id": data, "data_formatada": data.strftime("%d/%m/%y"), **por_dia[data]}
+                for data in sorted(por_dia)
+            ],
+            "soma_valor_refeicoes": soma,
+        }
+
+    def totais_por_obra_mes(self, filtros):
+        grupos = {}
+        for registro in self._selecionar(filtros):
+            data = registro["data_refeicao"]
+            grupo = grupos.setdefault((data.year, data.month, registro["obra_id"]), {"total": 0, "soma_valor_refeicao": 0})
+            grupo["total"] += 1
+            grupo["soma_valor_refeicao"] += registro["valor_refeicao"]
+        return [
+            {"obra_id": obra_id, "ano": ano, "mes": mes, **grupos[(ano, mes, obra_id)]}
+            for ano, mes, obra_id in sorted(grupos)
+        ]
+
+    def listar_obras_unicas(self):
+        return self._unicos("obra_id", "obra_nome")
+
+    def listar_colaboradores_unicos(self):
+        return self._unicos("colaborador_id", "colaborador_nome")
+
+    def corrigir_nomes(self, campo_nome, nomes):
+        campo_id = CAMPOS_NOME[campo_nome]
+        modificados = 0
+        with self._lock:
+            for registro in self._registros.values():
+                nome = nomes.get(registro[campo_id], registro[campo_nome])
+                if registro[campo_nome] != nome:
+                    registro[campo_nome] = nome
+                    modificados += 1
+        return modificados
+
+    def _unicos(self, campo_id, campo_nome):
+        # Um item por id, com o maior nome gravado (mesmo $group/$max do Mongo)
+        nomes = {}
+        with self._lock:
+            for r in self._registros.values():
+                nome = r[campo_nome]
+                if r[campo_id] not in nomes or (nome is not None and nome > (nomes[r[campo_id]] or "")):
+                    nomes[r[campo_id]] = nome
+        return [
+            {campo_id: item_id, campo_nome: nome}
+            for item_id, nome in sorted(nomes.items(), key=lambda par: (par[1] or "", par[0]))
+        ]
+
+    def _selecionar(self, filtros):
+        """Cópias dos registros que atendem aos filtros (mesmas regras de _construir_query do Mongo)."""
+        condicoes = _condicoes(filtros)
+        with self._lock:
+            return [dict(r) for r in self._registros.values() if all(condicao(r) for condicao in condicoes)]
+
+    def _selecao_lote(self, ids, filtros):
+        if ids:
+            try:
+                ids = {ObjectId(registro_id) for registro_id in ids}
+            except Exception as e:
+                raise ValueError("Id de registro inválido.") from e
+            return [self._registros[registro_id] for registro_id in ids if registro_id in self._registros]
+        condicoes = _condicoes(filtros or {})
+        if not condicoes:
+            # Nunca aplica uma operação em lote a todos os registros por engano
+            raise ValueError("Informe os registros ou ao menos um filtro.")
+        return [r for r in list(self._registros.values()) if all(condicao(r) for condicao in condicoes)]
+
+    def _mudar_data(self, registro, data):
+        del self._por_colaborador_dia[(registro["colaborador_id"], registro["data_refeicao"])]
+        registro["data_refeicao"] = data
+        self._por_colaborador_dia[(registro["colaborador_id"], data)] = registro["_id"]
+
+    def _remover(self, registro_id):
+        registro = self._registros.pop(registro_id, None)
+        if registro is None:
+            return False
+        del self._por_colaborador_dia[(registro["colaborador_id"], registro["data_refeicao"])]
+        return True
+
+
+def _condicoes(filtros):
+    condicoes = []
+    if filtros.get("data_inicio"):
+        inicio = datetime.strptime(filtros["data_inicio"], "%Y-%m-%d")
+        condicoes.append(lambda r: r["data_refeicao"] >= inicio)
+    if filtros.get("data_fim"):
+        fim = datetime.strptime(filtros["data_fim"], "%Y-%m-%d")
+        condicoes.append(lambda r: r["data_refeicao"] <= fim)
+    if filtros.get("obra_id"):
+        obra_id = int(filtros["obra_id"])
+        condicoes.append(lambda r: r["obra_id"] == obra_id)
+    if filtros.get("colaborador_id"):
+        colaborador_id = int(filtros["colaborador_id"])
+        condicoes.append(lambda r: r["colaborador_id"] == colaborador_id)
+    return condicoes
+
+
+def _chave_ordem(registro):
+    return (registro["data_refeicao"], registro["_id"])
+
+
+def _projetar(registro, campos):
+    return {campo: registro[campo] for campo in campos if campo in registro}
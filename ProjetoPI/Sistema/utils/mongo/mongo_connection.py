@@ -1,6 +1,301 @@
-from pymongo import MongoClient
+import contextvars
+import logging
+import os
+import threading
+from django.conf import settings
+from pymongo import MongoClient, monitoring
+
+logger = logging.getLogger(__name__)
+
+# Valores usados quando settings.MONGO não define a chave
+CONFIGURACAO_PADRAO = {
+    "URI": "mongodb://localhost:27017/",
+    "BANCO": "refeicoes",
+    "MAX_POOL_SIZE": 50,
+    "MIN_POOL_SIZE": 0,
+    "CONNECT_TIMEOUT_MS": 5000,
+    "SERVER_SELECTION_TIMEOUT_MS": 5000,
+    "SOCKET_TIMEOUT_MS": 20000,
+    "WAIT_QUEUE_TIMEOUT_MS": 2000,
+    "READ_PREFERENCE": "primary",
+    # Comandos mais demorados que isto (ms) são registrados no log como lentos
+    "LIMITE_LENTO_MS": 200,
+}
+
+
+def configuracao_mongo():
+    return {**CONFIGURACAO_PADRAO, **getattr(settings, "MONGO", {})}
+
+
+class EstatisticasPool(monitoring.ConnectionPoolListener):
+    """Contadores do pool de conexões, usados para dimensionar MAX_POOL_SIZE."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._lock:
+            self.abertas = 0
+            self.em_uso = 0
+            self.pico_em_uso = 0
+            self.checkouts = 0
+            self.falhas_checkout = 0
+            self.pools_limpos = 0
+
+    def resumo(self):
+        with self._lock:
+            return {
+                "abertas": self.abertas,
+                "em_uso": self.em_uso,
+                "pico_em_uso": self.pico_em_uso,
+                "checkouts": self.checkouts,
+                "falhas_checkout": self.falhas_checkout,
+                "pools_limpos": self.pools_limpos,
+            }
+
+    def connection_created(self, event):
+        with self._lock:
+            self.abertas += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.abertas -= 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.em_uso += 1
+            self.pico_em_uso = max(self.pico_em_uso, self.em_uso)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.em_uso -= 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.falhas_checkout += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_limpos += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+estatisticas = EstatisticasPool()
+
+# View que está executando os comandos, definida pelo MonitorViewMiddleware
+view_atual = contextvars.ContextVar("mongo_view_atual", default=None)
+
+# Comandos internos do driver que não interessam nas estatísticas
+COMANDOS_IGNORADOS = {"hello", "ismaster", "isMaster", "ping", "endSessions", "saslStart", "saslContinue", "killCursors"}
+
+
+def formato_filtro(valor):
+    """Estrutura do filtro com os valores trocados por "?": {"obra_id": "?", "data_refeicao": {"$gte": "?"}}.
+
+    Permite agrupar no log consultas iguais com valores diferentes sem
+    gravar dados dos registros.
+    """
+    if isinstance(valor, dict):
+        return {chave: formato_filtro(item) for chave, item in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        if valor and all(not isinstance(item, (dict, list, tuple)) for item in valor):
+            return ["?"]
+        return [formato_filtro(item) for item in valor]
+    return "?"
+
+
+def _filtro_do_comando(nome, comando):
+    if nome == "find":
+        return comando.get("filter", {})
+    if nome in ("count", "distinct"):
+        return comando.get("query", {})
+    if nome == "aggregate":
+        pipeline = comando.get("pipeline") or [{}]
+        return pipeline[0].get("$match", {})
+    if nome in ("update", "delete"):
+        operacoes = comando.get("updates") or comando.get("deletes") or [{}]
+        return operacoes[0].get("q", {})
+    return {}
+
+
+def _documentos_da_resposta(resposta):
+    cursor = resposta.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "values" in resposta:
+        return len(resposta["values"])
+    return resposta.get("n", 0)
+
+
+class MonitorComandos(monitoring.CommandListener):
+    """Tempo e documentos devolvidos por comando, agrupados por view/comando/coleção.
+
+    Comandos acima de LIMITE_LENTO_MS são registrados no log com o formato
+    do filtro (sem os valores).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+        self.zerar()
+
+    def zerar(self):
+        with self._lock:
+            self.operacoes = {}
+
+    def resumo(self):
+        with self._lock:
+            operacoes = [
+                {
+                    "view": view,
+                    "comando": comando,
+                    "colecao": colecao,
+                    "quantidade": dados["quantidade"],
+                    "falhas": dados["falhas"],
+                    "lentas": dados["lentas"],
+                    "documentos": dados["documentos"],
+                    "tempo_total_ms": round(dados["tempo_total_ms"], 2),
+                    "tempo_medio_ms": round(dados["tempo_total_ms"] / dados["quantidade"], 2),
+                    "tempo_maximo_ms": round(dados["tempo_maximo_ms"], 2),
+                }
+                for (view, comando, colecao), dados in self.operacoes.items()
+            ]
+        return sorted(operacoes, key=lambda operacao: operacao["tempo_total_ms"], reverse=True)
+
+    def started(self, event):
+        if event.command_name in COMANDOS_IGNORADOS:
+            return
+        colecao = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            colecao = event.command.get("collection")
+        with self._lock:
+            self._em_andamento[(event.connection_id, event.request_id)] = (
+                view_atual.get() or "-",
+                colecao if isinstance(colecao, str) else "-",
+                _filtro_do_comando(event.command_name, event.command),
+            )
+
+    def succeeded(self, event):
+        self._registrar(event, _documentos_da_resposta(event.reply), falhou=False)
+
+    def failed(self, event):
+        self._registrar(event, 0, falhou=True)
+
+    def _registrar(self, event, documentos, falhou):
+        with self._lock:
+            inicio = self._em_andamento.pop((event.connection_id, event.request_id), None)
+            if inicio is None:
+                return
+            view, colecao, filtro = inicio
+            duracao_ms = event.duration_micros / 1000
+            lenta = duracao_ms >= configuracao_mongo()["LIMITE_LENTO_MS"]
+            dados = self.operacoes.setdefault((view, event.command_name, colecao), {
+                "quantidade": 0, "falhas": 0, "lentas": 0, "documentos": 0,
+                "tempo_total_ms": 0.0, "tempo_maximo_ms": 0.0,
+            })
+            dados["quantidade"] += 1
+            dados["falhas"] += falhou
+            dados["lentas"] += lenta
+            dados["documentos"] += documentos
+            dados["tempo_total_ms"] += duracao_ms
+            dados["tempo_maximo_ms"] = max(dados["tempo_maximo_ms"], duracao_ms)
+
+        if lenta:
+            logger.warning(
+                "Operação lenta no Mongo: %s %s em %.1f ms (%d documentos, view %s) filtro=%s",
+                event.command_name, colecao, duracao_ms, documentos, view, formato_filtro(filtro),
+            )
+
+
+monitor_comandos = MonitorComandos()
+
+# Um cliente por processo: criado no primeiro uso e descartado após um fork,
+# já que o MongoClient herdado do processo pai não pode ser usado no filho.
+_registro = {"pid": None, "cliente": None}
+_lock = threading.Lock()
+
+
+def _criar_cliente(config):
+    return MongoClient(
+        config["URI"],
+        maxPoolSize=config["MAX_POOL_SIZE"],
+        minPoolSize=config["MIN_POOL_SIZE"],
+        connectTimeoutMS=config["CONNECT_TIMEOUT_MS"],
+        serverSelectionTimeoutMS=config["SERVER_SELECTION_TIMEOUT_MS"],
+        socketTimeoutMS=config["SOCKET_TIMEOUT_MS"],
+        waitQueueTimeoutMS=config["WAIT_QUEUE_TIMEOUT_MS"],
+        readPreference=config["READ_PREFERENCE"],
+        event_listeners=[estatisticas, monitor_comandos],
+    )
+
+
+def get_cliente():
+    pid = os.getpid()
+    if _registro["cliente"] is None or _registro["pid"] != pid:
+        with _lock:
+            if _registro["cliente"] is None or _registro["pid"] != pid:
+                _registro["cliente"] = _criar_cliente(configuracao_mongo())
+                _registro["pid"] = pid
+    return _registro["cliente"]
+
 
 def get_mongo_client():
-    client = MongoClient("mongodb://localhost:27017/")
-    db = client["refeicoes"]  
+    db = get_cliente()[configuracao_mongo()["BANCO"]]
     return db
+
+
+def fechar_cliente():
+    with _lock:
+        cliente = _registro["cliente"]
+        _registro["cliente"] = None
+        _registro["pid"] = None
+    if cliente is not None:
+        cliente.close()
+
+
+def _descartar_apos_fork():
+    # No filho apenas esquecemos o cliente do pai (fechá-lo afetaria o pai)
+    global _lock
+    _lock = threading.Lock()
+    _registro["cliente"] = None
+    _registro["pid"] = None
+    estatisticas._lock = threading.Lock()
+    estatisticas.zerar()
+    monitor_comandos._lock = threading.Lock()
+    monitor_comandos._em_andamento = {}
+    monitor_comandos.zerar()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_descartar_apos_fork)
+
+
+def estatisticas_pool():
+    config = configuracao_mongo()
+    return {
+        "pid": os.getpid(),
+        "cliente_criado": _registro["cliente"] is not None and _registro["pid"] == os.getpid(),
+        "max_pool_size": config["MAX_POOL_SIZE"],
+        "min_pool_size": config["MIN_POOL_SIZE"],
+        **estatisticas.resumo(),
+    }
+
+
+def estatisticas_comandos():
+    return monitor_comandos.resumo()
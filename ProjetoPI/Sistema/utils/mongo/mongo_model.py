@@ -1,57 +1,937 @@
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne, UpdateMany, DeleteOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import UpdateResult
 from Sistema.utils.mongo.mongo_connection import get_mongo_client
-from datetime import datetime
-from Sistema.models import Colaborador
+from datetime import datetime, timedelta, timezone as dt_timezone
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from Sistema.utils.backend_refeicoes import BackendRefeicoes
+from Sistema.utils.fila_escrita import FilaEscrita
+from Sistema.utils.nomes_cadastro import CAMPOS_NOME, PREFIXOS_NOME, esquecer_nome, preencher_nomes
+import logging
+import threading
+import uuid
 
-class ControleRefeicoes:
-    def __init__(self):
-        self.db = get_mongo_client()
-        self.collection = self.db["controle_diario"]  # nova coleção
+logger = logging.getLogger(__name__)
+TAMANHO_LOTE_INSERCAO = 500
+_lock_fila = threading.Lock()
+
+# Colunas exibidas em listar-registros.html
+CAMPOS_LISTAGEM = {
+    "colaborador_nome": 1,
+    "obra_nome": 1,
+    "data_refeicao": 1,
+    "valor_refeicao": 1,
+}
+
+# Colunas da exportação (CSV/XLSX) dos registros
+CAMPOS_EXPORTACAO = {
+    "_id": 0,
+    "colaborador_id": 1,
+    "colaborador_nome": 1,
+    "obra_id": 1,
+    "obra_nome": 1,
+    "data_refeicao": 1,
+    "valor_refeicao": 1,
+    "registrado_em": 1,
+    "registrado_por_nome": 1,
+}
+TAMANHO_LOTE_EXPORTACAO = 1000
+
+# Campos lidos antes de uma operação em lote para manter o resumo consistente
+CAMPOS_LOTE = {"colaborador_id": 1, "obra_id": 1, "data_refeicao": 1}
+
+# Índices usados pelas consultas do registro (paginação) e do dashboard (_construir_query)
+INDICES_CONTROLE_DIARIO = [
+    {"nome": "data_refeicao_id", "chaves": [("data_refeicao", DESCENDING), ("_id", DESCENDING)]},
+    {"nome": "obra_data_refeicao", "chaves": [("obra_id", ASCENDING), ("data_refeicao", ASCENDING)]},
+    # Uma refeição por colaborador por dia: garante que reenvios não dupliquem registros
+    {"nome": "colaborador_data_refeicao_unico", "chaves": [("colaborador_id", ASCENDING), ("data_refeicao", ASCENDING)], "unique": True},
+]
+
+# Modo série temporal (settings.REFEICOES_TIMESERIES): os registros ficam em
+# uma coleção time-series, com obra e colaborador agrupados no metaField.
+COLECAO_TIMESERIES = "controle_diario_ts"
+CAMPO_META = "meta"
+CAMPOS_META = ("obra_id", "colaborador_id")
+# Refeições são diárias: granularidade "hours" agrupa até 30 dias por bucket
+OPCOES_TIMESERIES = {"timeField": "data_refeicao", "metaField": CAMPO_META, "granularity": "hours"}
+# Editar e excluir registros por _id (e corrigir nomes fora do meta) em
+# time-series só é aceito a partir do MongoDB 7.0
+VERSAO_MINIMA_TIMESERIES = (7, 0)
+TAMANHO_LOTE_MIGRACAO = 1000
+
+# Coleções time-series não aceitam índice único: a unicidade por
+# colaborador/dia é garantida na gravação (_inserir_lote_timeseries) por um
+# marcador em COLECAO_CHAVES_TIMESERIES, cujo _id {c, d} é único.
+COLECAO_CHAVES_TIMESERIES = "controle_diario_ts_chaves"
+# Marcador mais novo que isso pode ser de uma gravação em andamento em outro
+# processo; mais antigo e sem registro, sobrou de um registro excluído
+SEGUNDOS_MARCADOR_TIMESERIES = 60
+# Os marcadores só precisam viver enquanto gravações simultâneas são possíveis
+INDICES_CHAVES_TIMESERIES = [
+    {"nome": "em_ttl", "chaves": [("em", ASCENDING)], "expireAfterSeconds": 86400},
+]
+INDICES_TIMESERIES = [
+    {"nome": "data_refeicao_id", "chaves": [("data_refeicao", DESCENDING), ("_id", DESCENDING)]},
+    {"nome": "meta_obra_data_refeicao", "chaves": [("meta.obra_id", ASCENDING), ("data_refeicao", ASCENDING)]},
+    {"nome": "meta_colaborador_data_refeicao", "chaves": [("meta.colaborador_id", ASCENDING), ("data_refeicao", ASCENDING)]},
+]
+
+# Esquema compacto (settings.REFEICOES_ESQUEMA_COMPACTO): nomes curtos de
+# campo, valor em centavos (inteiro) e sem os nomes de colaborador, obra e
+# usuário, resolvidos na leitura (nomes_cadastro). registrado_em não é
+# gravado: vem do horário de criação do _id.
+COLECAO_COMPACTA = "controle_diario_compacto"
+CAMPOS_COMPACTOS = {
+    "colaborador_id": "c",
+    "obra_id": "o",
+    "data_refeicao": "d",
+    "valor_refeicao": "v",
+    "registrado_por_id": "u",
+}
+CENTAVOS = 100
+
+INDICES_COMPACTOS = [
+    dict(indice, chaves=[(CAMPOS_COMPACTOS.get(campo, campo), direcao) for campo, direcao in indice["chaves"]])
+    for indice in INDICES_CONTROLE_DIARIO
+]
+
+# Arquivo mensal (settings.REFEICOES_MESES_ATIVOS): meses fechados saem da
+# coleção ativa para controle_diario_arquivo_AAAA_MM, sempre no formato comum
+# (sem meta). Cada arquivo guarda apenas registros do seu mês.
+PREFIXO_ARQUIVO = "controle_diario_arquivo_"
+TAMANHO_LOTE_ARQUIVAMENTO = 1000
+# Lista dos meses arquivados (nomes das coleções), invalidada por arquivar_mes
+CHAVE_CACHE_ARQUIVOS = "refeicoes:meses_arquivados"
+TTL_CACHE_ARQUIVOS = 60
+
+# Nos arquivos a unicidade por colaborador/dia já foi garantida na coleção ativa
+INDICES_ARQUIVO = [
+    {"nome": "data_refeicao_id", "chaves": [("data_refeicao", DESCENDING), ("_id", DESCENDING)]},
+    {"nome": "obra_data_refeicao", "chaves": [("obra_id", ASCENDING), ("data_refeicao", ASCENDING)]},
+    {"nome": "colaborador_data_refeicao", "chaves": [("colaborador_id", ASCENDING), ("data_refeicao", ASCENDING)]},
+]
+
+# Código de erro do MongoDB para violação de índice único
+ERRO_CHAVE_DUPLICADA = 11000
+
+# Registros de colaboradores/obras excluídos do cadastro (reconciliar_orfaos_refeicoes --arquivar)
+COLECAO_ORFAOS = "controle_diario_orfaos"
+TAMANHO_LOTE_ORFAOS = 1000
+
+# Coleção pré-agregada (um documento por dia/obra/colaborador) lida pelo dashboard
+COLECAO_RESUMO = "controle_diario_resumo"
+CHAVE_RESUMO = ("data_refeicao", "obra_id", "colaborador_id")
+
+INDICES_RESUMO = [
+    {"nome": "chave_resumo", "chaves": [(campo, ASCENDING) for campo in CHAVE_RESUMO], "unique": True},
+    {"nome": "obra_data_refeicao", "chaves": [("obra_id", ASCENDING), ("data_refeicao", ASCENDING)]},
+    {"nome": "colaborador_data_refeicao", "chaves": [("colaborador_id", ASCENDING), ("data_refeicao", ASCENDING)]},
+]
+
+# Listas dos filtros do dashboard (obras e colaboradores com refeições)
+CHAVE_CACHE_OBRAS = "refeicoes:obras_unicas"
+CHAVE_CACHE_COLABORADORES = "refeicoes:colaboradores_unicos"
+# Lista de filtros do dashboard que mostra cada campo de nome
+CHAVES_CACHE_POR_NOME = {"obra_nome": CHAVE_CACHE_OBRAS, "colaborador_nome": CHAVE_CACHE_COLABORADORES}
+# Operações UpdateMany por bulk_write ao corrigir nomes
+TAMANHO_LOTE_NOMES = 500
+
+# Resultados das agregações do dashboard, por consulta e filtro. A geração
+# entra na chave e é trocada a cada escrita que altera o resumo.
+PREFIXO_CACHE_RESULTADOS = "refeicoes:resultado"
+CHAVE_CACHE_GERACAO = "refeicoes:geracao"
+
+
+def _nova_geracao():
+    return uuid.uuid4().hex
+
+
+def _ttl_cache_filtros():
+    return getattr(settings, "REFEICOES_CACHE_FILTROS_TTL", 600)
+
+
+def _ttl_cache_resultados():
+    return getattr(settings, "REFEICOES_CACHE_RESULTADOS_TTL", 300)
+
+
+def _chave_filtro(query):
+    """Texto curto e estável para a query normalizada (mesmos filtros, mesma chave)."""
+    texto = json.dumps(query, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode()).hexdigest()
+
+
+def _inserir_ignorando_duplicados(colecao, documentos):
+    """insert_many não ordenado que pula chaves duplicadas; retorna (inseridos, duplicados).
+
+    Outros erros de escrita são relançados.
+    """
+    try:
+        colecao.insert_many(documentos, ordered=False)
+        return len(documentos), 0
+    except BulkWriteError as e:
+        erros = e.details.get("writeErrors", [])
+        if e.details.get("writeConcernErrors") or any(erro.get("code") != ERRO_CHAVE_DUPLICADA for erro in erros):
+            raise
+        for erro in erros:
+            logger.warning("Registro duplicado ignorado na cópia: %s", erro.get("keyValue"))
+        return e.details.get("nInserted", len(documentos) - len(erros)), len(erros)
+
+
+def nome_arquivo(ano, mes):
+    return f"{PREFIXO_ARQUIVO}{ano:04d}_{mes:02d}"
+
+
+def _mes_seguinte(data):
+    if data.month == 12:
+        return datetime(data.year + 1, 1, 1)
+    return datetime(data.year, data.month + 1, 1)
+
+
+class ControleRefeicoes(BackendRefeicoes):
+    # Números do dashboard: só agregações na coleção de resumo, sem nomes de cadastro
+    metodos_sem_orm = frozenset({
+        "resumo_dashboard", "totais_por_obra_mes", "total_refeicoes", "total_colaboradores_unicos",
+        "refeicoes_por_dia", "somar_valor_refeicoes",
+    })
+
+    def __init__(self, timeseries=None, compacto=None):
+        # None: segue settings.REFEICOES_TIMESERIES / REFEICOES_ESQUEMA_COMPACTO
+        # (os comandos de migração instanciam as duas versões explicitamente)
+        self._timeseries = timeseries
+        self._compacto = compacto
+        self._fila_escrita = None
+        # Índices e carga inicial do resumo conferidos uma vez por processo (_garantir_resumo)
+        self._resumo_pronto = False
+
+    @property
+    def timeseries(self):
+        if self._timeseries is not None:
+            return self._timeseries
+        return getattr(settings, "REFEICOES_TIMESERIES", False)
+
+    @property
+    def compacto(self):
+        """Esquema compacto na coleção comum; a time-series mantém o próprio formato."""
+        if self.timeseries:
+            return False
+        if self._compacto is not None:
+            return self._compacto
+        return getattr(settings, "REFEICOES_ESQUEMA_COMPACTO", False)
+
+    @property
+    def escrita_adiada(self):
+        return getattr(settings, "REFEICOES_ESCRITA_ADIADA", False)
+
+    @property
+    def fila_escrita(self):
+        # Criada no primeiro uso; a thread só sobe quando algo é enfileirado
+        if self._fila_escrita is None:
+            with _lock_fila:
+                if self._fila_escrita is None:
+                    self._fila_escrita = FilaEscrita(self._gravar_registros)
+        return self._fila_escrita
+
+    # O cliente é obtido a cada acesso (e criado só no primeiro uso do processo),
+    # então instanciar a classe no import das views não abre conexão.
+    @property
+    def db(self):
+        return get_mongo_client()
+
+    @property
+    def collection(self):
+        if self.timeseries:
+            return self.db[COLECAO_TIMESERIES]
+        if self.compacto:
+            return self.db[COLECAO_COMPACTA]
+        return self.db["controle_diario"]  # nova coleção
+
+    @property
+    def resumo_collection(self):
+        return self.db[COLECAO_RESUMO]
+
+    @property
+    def chaves_timeseries_collection(self):
+        return self.db[COLECAO_CHAVES_TIMESERIES]
 
     def registrar_refeicoes(self, data, colaboradores_ids, usuario):
-        registros = []
         data_formatada = datetime.strptime(data, "%Y-%m-%d")
+        colaboradores, nao_encontrados = self._resolver_colaboradores(colaboradores_ids)
 
-        for colaborador_id in colaboradores_ids:
-            try:
-                colaborador = Colaborador.objects.get(id=colaborador_id)
-                registro = {
-                    "colaborador_id": colaborador.id,
-                    "colaborador_nome": colaborador.nome,
-                    "obra_id": colaborador.obra.id,
-                    "obra_nome": colaborador.obra.nome,
-                    "data_refeicao": data_formatada,
-                    "valor_refeicao": 8.00,
-                    "registrado_em": datetime.now(),
-                    "registrado_por_id": usuario.id,
-                    "registrado_por_nome": usuario.username,
-                }
-                registros.append(registro)
-            except Colaborador.DoesNotExist:
-                continue  # ignora se colaborador não encontrado
-
-        if registros:
-            self.collection.insert_many(registros)
+        registros = self._montar_registros(data_formatada, colaboradores, usuario)
+
+        if self.escrita_adiada:
+            # Gravados pela thread da fila junto com os de outras requisições
+            self.fila_escrita.enfileirar(registros)
+            return {
+                "inseridos": 0,
+                "existentes": 0,
+                "falhas": 0,
+                "enfileirados": len(registros),
+                "nao_encontrados": nao_encontrados,
+            }
+
+        inseridos, falhas = self._gravar_registros(registros)
+        return {
+            "inseridos": inseridos,
+            "existentes": len(registros) - inseridos - falhas,
+            "falhas": falhas,
+            "nao_encontrados": nao_encontrados,
+        }
+
+    def _gravar_registros(self, registros):
+        """Grava os registros (de um ou mais dias) e atualiza o resumo.
+
+        Retorna (inseridos, falhas). Um mesmo colaborador repetido no mesmo
+        dia é gravado uma vez só, como um registro já existente.
+        """
+        por_dia = {}
+        for registro in registros:
+            por_dia.setdefault(registro["data_refeicao"], {}).setdefault(registro["colaborador_id"], registro)
+
+        # Upsert por (colaborador_id, data_refeicao): reenviar o mesmo formulário
+        # não duplica refeições. Submissões grandes são divididas em lotes.
+        gravar_lote = self._inserir_lote_timeseries if self.timeseries else self._upsert_lote
+        inseridos = []
+        falhas = 0
+        for data, registros_dia in por_dia.items():
+            if not self.timeseries:
+                # O índice único da coleção ativa não cobre os meses já arquivados
+                arquivados = self._colaboradores_no_arquivo(list(registros_dia), data)
+                registros_dia = {c: r for c, r in registros_dia.items() if c not in arquivados}
+            registros_dia = list(registros_dia.values())
+            for inicio in range(0, len(registros_dia), TAMANHO_LOTE_INSERCAO):
+                lote = registros_dia[inicio:inicio + TAMANHO_LOTE_INSERCAO]
+                indices_inseridos, falhas_lote = gravar_lote(lote)
+                inseridos.extend(lote[i] for i in indices_inseridos)
+                falhas += falhas_lote
+
+        self._atualizar_resumo(inseridos, 1)
+        self._invalidar_filtros_se_novos(registros)
+        return len(inseridos), falhas
+
+    def _upsert_lote(self, lote):
+        """Grava o lote com um bulk_write não ordenado de upserts.
+
+        Retorna as posições do lote que geraram documentos novos e a
+        quantidade de operações que falharam. Uma falha não interrompe o
+        restante do lote; chave duplicada (outro envio gravou o mesmo
+        colaborador/dia ao mesmo tempo) conta como registro já existente.
+        """
+        operacoes = [
+            UpdateOne(
+                {
+                    self._campo("colaborador_id"): registro["colaborador_id"],
+                    self._campo("data_refeicao"): registro["data_refeicao"],
+                },
+                {"$setOnInsert": self._para_armazenamento(registro)},
+                upsert=True,
+            )
+            for registro in lote
+        ]
+        try:
+            resultado = self.collection.bulk_write(operacoes, ordered=False)
+            return list(resultado.upserted_ids), 0
+        except BulkWriteError as e:
+            erros = [erro for erro in e.details.get("writeErrors", []) if erro.get("code") != ERRO_CHAVE_DUPLICADA]
+            for erro in erros:
+                logger.error("Falha ao registrar refeição: %s", erro.get("errmsg"))
+            return [u["index"] for u in e.details.get("upserted", [])], len(erros)
+
+    def _inserir_lote_timeseries(self, lote):
+        """Versão de _upsert_lote para a coleção time-series.
+
+        Coleções time-series não aceitam upsert nem índice único, então os
+        colaboradores que já têm refeição no dia são consultados antes e só
+        os demais são inseridos, depois de reservar o colaborador/dia
+        (_reservar_chaves_timeseries): de dois envios simultâneos, só um grava.
+        Todos os registros do lote são do mesmo dia.
+        """
+        data = lote[0]["data_refeicao"]
+        existentes = self._colaboradores_com_refeicao([registro["colaborador_id"] for registro in lote], data)
+        candidatos = [i for i, registro in enumerate(lote) if registro["colaborador_id"] not in existentes]
+        if not candidatos:
+            return [], 0
+        reservados = self._reservar_chaves_timeseries([lote[i]["colaborador_id"] for i in candidatos], data)
+        novos = [i for i in candidatos if lote[i]["colaborador_id"] in reservados]
+        if not novos:
+            return [], 0
+        try:
+            self.collection.insert_many([self._para_armazenamento(lote[i]) for i in novos], ordered=False)
+            return novos, 0
+        except BulkWriteError as e:
+            erros = e.details.get("writeErrors", [])
+            for erro in erros:
+                logger.error("Falha ao registrar refeição: %s", erro.get("errmsg"))
+            falhos = {erro["index"] for erro in erros}
+            # Libera a reserva de quem não foi gravado para que possa ser reenviado
+            self.chaves_timeseries_collection.delete_many({
+                "_id": {"$in": [{"c": lote[novos[posicao]]["colaborador_id"], "d": data} for posicao in falhos]}
+            })
+            return [i for posicao, i in enumerate(novos) if posicao not in falhos], len(erros)
+
+    def _reservar_chaves_timeseries(self, colaboradores_ids, data):
+        """Reserva colaborador/dia inserindo marcadores de _id único; retorna os ids reservados.
+
+        Marcador já existente é de outro envio gravando o mesmo colaborador
+        (fica com ele) ou, se tiver mais de SEGUNDOS_MARCADOR_TIMESERIES,
+        sobra de um registro excluído: nesse caso é assumido atomicamente,
+        já que o registro não existe mais (consultado antes da reserva).
+        """
+        agora = datetime.now(dt_timezone.utc)
+        try:
+            self.chaves_timeseries_collection.insert_many(
+                [{"_id": {"c": colaborador_id, "d": data}, "em": agora} for colaborador_id in colaboradores_ids],
+                ordered=False,
+            )
+            return set(colaboradores_ids)
+        except BulkWriteError as e:
+            erros = e.details.get("writeErrors", [])
+            if any(erro.get("code") != ERRO_CHAVE_DUPLICADA for erro in erros):
+                raise
+        em_uso = {colaboradores_ids[erro["index"]] for erro in erros}
+        reservados = set(colaboradores_ids) - em_uso
+        limite = agora - timedelta(seconds=SEGUNDOS_MARCADOR_TIMESERIES)
+        for colaborador_id in em_uso:
+            assumido = self.chaves_timeseries_collection.update_one(
+                {"_id": {"c": colaborador_id, "d": data}, "em": {"$lt": limite}}, {"$set": {"em": agora}}
+            )
+            if assumido.modified_count:
+                reservados.add(colaborador_id)
+        return reservados
+
+    def _colaboradores_com_refeicao(self, colaboradores_ids, data):
+        """Ids, entre os informados, de colaboradores que já têm refeição na data."""
+        campo = self._campo("colaborador_id")
+        ativos = self.collection.distinct(campo, {campo: {"$in": list(colaboradores_ids)}, self._campo("data_refeicao"): data})
+        return set(ativos) | self._colaboradores_no_arquivo(colaboradores_ids, data)
+
+    def _colaboradores_no_arquivo(self, colaboradores_ids, data):
+        arquivo = self._arquivo_do_mes(data)
+        if arquivo is None or not colaboradores_ids:
+            return set()
+        return set(arquivo.distinct("colaborador_id", {"colaborador_id": {"$in": list(colaboradores_ids)}, "data_refeicao": data}))
+
+    def _campo(self, campo):
+        """Nome do campo na coleção de registros ativa (obra_id e colaborador_id
+        ficam em meta na time-series; o esquema compacto usa nomes curtos)."""
+        if self.timeseries and campo in CAMPOS_META:
+            return f"{CAMPO_META}.{campo}"
+        if self.compacto:
+            return CAMPOS_COMPACTOS.get(campo, campo)
+        return campo
+
+    def _projecao(self, campos):
+        if self.compacto:
+            # Nomes saem dos ids e registrado_em sai do _id
+            projecao = {}
+            for campo, valor in campos.items():
+                if campo in CAMPOS_NOME:
+                    if valor:
+                        projecao[self._campo(CAMPOS_NOME[campo])] = 1
+                elif campo != "registrado_em":
+                    projecao[self._campo(campo)] = valor
+            if campos.get("registrado_em"):
+                projecao["_id"] = 1
+            return projecao
+        if not self.timeseries:
+            return campos
+        projecao = {campo: valor for campo, valor in campos.items() if campo not in CAMPOS_META}
+        if any(campos.get(campo) for campo in CAMPOS_META):
+            projecao[CAMPO_META] = 1
+        return projecao
+
+    def _para_armazenamento(self, registro):
+        if self.compacto:
+            documento = {curto: registro[campo] for campo, curto in CAMPOS_COMPACTOS.items() if campo in registro}
+            documento[CAMPOS_COMPACTOS["valor_refeicao"]] = round(registro.get("valor_refeicao", 0) * CENTAVOS)
+            if "_id" in registro:
+                documento["_id"] = registro["_id"]
+            return documento
+        if not self.timeseries:
+            return registro
+        documento = {campo: valor for campo, valor in registro.items() if campo not in CAMPOS_META}
+        documento[CAMPO_META] = {campo: registro[campo] for campo in CAMPOS_META}
+        return documento
+
+    def _mapear_query(self, query):
+        """Query com os nomes comuns de campo convertida para a coleção de registros ativa."""
+        return {self._campo(campo): valor for campo, valor in query.items()}
+
+    @property
+    def meses_ativos(self):
+        """Meses mantidos na coleção ativa; None desliga o arquivo mensal."""
+        return getattr(settings, "REFEICOES_MESES_ATIVOS", None)
+
+    def meses_arquivados(self):
+        """(ano, mês) de cada coleção de arquivo existente, do mais recente para o mais antigo.
+
+        Guardado no cache do Django por TTL_CACHE_ARQUIVOS segundos; arquivar_mes
+        apaga a chave, então com cache compartilhado (Redis) todos os workers
+        enxergam o mês recém-arquivado na hora, e com cache local em até um TTL.
+        """
+        if not self.meses_ativos:
+            return []
+        meses = cache.get(CHAVE_CACHE_ARQUIVOS)
+        if meses is None:
+            nomes = self.db.list_collection_names(filter={"name": {"$regex": rf"^{PREFIXO_ARQUIVO}\d{{4}}_\d{{2}}$"}})
+            meses = sorted(
+                (tuple(int(parte) for parte in nome[len(PREFIXO_ARQUIVO):].split("_")) for nome in nomes),
+                reverse=True,
+            )
+            cache.set(CHAVE_CACHE_ARQUIVOS, meses, TTL_CACHE_ARQUIVOS)
+        return meses
+
+    def _arquivos_do_periodo(self, inicio=None, fim=None):
+        """Coleções de arquivo cujo mês cruza o período [inicio, fim], da mais recente para a mais antiga."""
+        arquivos = []
+        for ano, mes in self.meses_arquivados():
+            primeiro_dia = datetime(ano, mes, 1)
+            if (fim is None or primeiro_dia <= fim) and (inicio is None or _mes_seguinte(primeiro_dia) > inicio):
+                arquivos.append(self.db[nome_arquivo(ano, mes)])
+        return arquivos
+
+    def _arquivos_da_query(self, query):
+        datas = query.get("data_refeicao", {})
+        return self._arquivos_do_periodo(datas.get("$gte"), datas.get("$lte"))
+
+    def _arquivo_do_mes(self, data):
+        if (data.year, data.month) in self.meses_arquivados():
+            return self.db[nome_arquivo(data.year, data.month)]
+        return None
+
+    def _arquivos_dos_meses(self, meses):
+        """Arquivos existentes dos (ano, mês) informados; None (id sem o mês) consulta todos."""
+        if None in meses:
+            return self._arquivos_do_periodo()
+        arquivados = self.meses_arquivados()
+        return [self.db[nome_arquivo(*mes)] for mes in sorted(meses, reverse=True) if mes in arquivados]
+
+    def _pipeline_com_arquivos(self, query, arquivos, etapas):
+        """Pipeline executado na coleção ativa que inclui, via $unionWith, os
+        mesmos registros dos arquivos informados. `query` usa os nomes comuns."""
+        pipeline = [{"$match": self._mapear_query(query)}] + self._etapas_campos_planos()
+        for arquivo in arquivos:
+            pipeline.append({"$unionWith": {"coll": arquivo.name, "pipeline": [{"$match": query}]}})
+        return pipeline + etapas
 
     def listar_registros(self):
-        registros = list(self.collection.find())
+        colecoes = [self.collection] + self._arquivos_do_periodo()
+        registros = preencher_nomes([_formato_comum(r) for colecao in colecoes for r in colecao.find()])
         for r in registros:
-            r["id"] = str(r["_id"])
+            r["id"] = _id_registro(r)
            # r["data_refeicao"] = r["data_refeicao"].strftime("%Y-%m-%d")
         return registros
 
+    def listar_registros_paginados(self, limite=100, apos=None, antes=None, filtros=None):
+        """Paginação por cursor (keyset), do registro mais recente para o mais antigo.
+
+        `apos` e `antes` são cursores devolvidos em uma página anterior
+        ("proximo" e "anterior"); o custo de cada página não depende do
+        tamanho da coleção, pois a busca parte do último registro visto.
+        """
+        query = self._construir_query(filtros or {})
+        posicao = None
+
+        if apos:
+            posicao = self._decodificar_cursor(apos)
+            ordem = DESCENDING
+        elif antes:
+            posicao = self._decodificar_cursor(antes)
+            ordem = ASCENDING
+        else:
+            ordem = DESCENDING
+
+        def condicao_cursor(campo_data):
+            if posicao is None:
+                return None
+            data, registro_id = posicao
+            operador = "$lt" if ordem == DESCENDING else "$gt"
+            return {"$or": [
+                {campo_data: {operador: data}},
+                {campo_data: data, "_id": {operador: registro_id}},
+            ]}
+
+        campo_data = self._campo("data_refeicao")
+        arquivos = self._arquivos_da_query(query)
+        query_ativa = _combinar(self._mapear_query(query), condicao_cursor(campo_data))
+        if arquivos:
+            # Cada coleção devolve no máximo uma página (usando o próprio
+            # índice) e a ordenação final junta as páginas parciais
+            ordenacao = {"data_refeicao": ordem, "_id": ordem}
+
+            def pagina(q, ordenacao_colecao=ordenacao, projecao=CAMPOS_LISTAGEM):
+                return [{"$match": q}, {"$sort": ordenacao_colecao}, {"$limit": limite + 1}, {"$project": projecao}]
+
+            pipeline = pagina(query_ativa, {campo_data: ordem, "_id": ordem}, self._projecao(CAMPOS_LISTAGEM))
+            pipeline += self._etapas_campos_planos() + [
+                {"$unionWith": {"coll": arquivo.name, "pipeline": pagina(_combinar(query, condicao_cursor("data_refeicao")))}}
+                for arquivo in arquivos
+            ] + [{"$sort": ordenacao}, {"$limit": limite + 1}]
+            registros = list(self.collection.aggregate(pipeline))
+        else:
+            cursor = self.collection.find(query_ativa, self._projecao(CAMPOS_LISTAGEM)).sort(
+                [(campo_data, ordem), ("_id", ordem)]
+            ).limit(limite + 1)
+            registros = [_formato_comum(r) for r in cursor]
+
+        tem_mais = len(registros) > limite
+        registros = preencher_nomes(registros[:limite])
+        if antes:
+            registros.reverse()
+
+        for r in registros:
+            r["id"] = _id_registro(r)
+
+        if antes:
+            tem_proxima, tem_anterior = True, tem_mais
+        else:
+            tem_proxima, tem_anterior = tem_mais, bool(apos)
+
+        return {
+            "registros": registros,
+            "proximo": self._codificar_cursor(registros[-1]) if registros and tem_proxima else None,
+            "anterior": self._codificar_cursor(registros[0]) if registros and tem_anterior else None,
+        }
+
+    def iterar_registros(self, filtros, tamanho_lote=TAMANHO_LOTE_EXPORTACAO):
+        """Percorre os registros filtrados direto do cursor, sem montar uma lista.
+
+        O Mongo devolve `tamanho_lote` documentos por ida ao servidor, então
+        a memória usada não depende da quantidade exportada. Com o arquivo
+        mensal ligado, a ordem por data vale dentro de cada coleção.
+        """
+        # A query é montada já na chamada para que filtros inválidos falhem
+        # antes de a resposta começar a ser enviada
+        query = self._construir_query(filtros)
+        ordenacao = [("data_refeicao", ASCENDING), ("_id", ASCENDING)]
+        # Arquivos do mais antigo para o mais recente e, por último, a coleção ativa
+        cursores = [
+            arquivo.find(query, CAMPOS_EXPORTACAO).sort(ordenacao).batch_size(tamanho_lote)
+            for arquivo in reversed(self._arquivos_da_query(query))
+        ]
+        cursores.append(self.collection.find(
+            self._mapear_query(query), self._projecao(CAMPOS_EXPORTACAO)
+        ).sort([(self._campo(campo), direcao) for campo, direcao in ordenacao]).batch_size(tamanho_lote))
+        registros = _consumir_cursor(*cursores)
+        if self.compacto:
+            return _com_nomes(registros, tamanho_lote)
+        return registros
+
     def buscar_registro(self, registro_id):
-        return self.collection.find_one({"_id": ObjectId(registro_id)})
+        return self._localizar_registro(registro_id)[1]
+
+    def _localizar_registro(self, registro_id):
+        """Procura o registro na coleção ativa e depois no arquivo do mês do id. Retorna (coleção, registro)."""
+        registro_id, mes = _ler_id_registro(registro_id)
+        registro = self.collection.find_one({"_id": registro_id})
+        if registro is not None:
+            return self.collection, preencher_nomes([_formato_comum(registro)])[0]
+        for arquivo in self._arquivos_dos_meses({mes}):
+            registro = arquivo.find_one({"_id": registro_id})
+            if registro is not None:
+                return arquivo, preencher_nomes([registro])[0]
+        return self.collection, None
 
     def atualizar_data_refeicao(self, registro_id, nova_data):
         data_formatada = datetime.strptime(nova_data, "%Y-%m-%d")
-        return self.collection.update_one(
-            {"_id": ObjectId(registro_id)},
-            {"$set": {"data_refeicao": data_formatada}}
-        )
+        colecao, registro = self._localizar_registro(registro_id)
+        if (self.timeseries or self.meses_ativos) and registro and registro["data_refeicao"] != data_formatada:
+            # Sem índice único na time-series ou entre coleção ativa e arquivos:
+            # a mesma regra é verificada aqui
+            if self._colaboradores_com_refeicao([registro["colaborador_id"]], data_formatada):
+                raise DuplicateKeyError("Colaborador já tem refeição registrada nesta data.", ERRO_CHAVE_DUPLICADA)
+        if colecao.name not in (self.collection.name, nome_arquivo(data_formatada.year, data_formatada.month)):
+            # Registro arquivado mudando de mês volta para a coleção ativa
+            movidos, _ = self._mover_para_ativa(colecao, [registro["_id"]], data_formatada)
+            resultado = UpdateResult({"n": movidos, "nModified": movidos}, acknowledged=True)
+        else:
+            resultado = colecao.update_one(
+                {"_id": _ler_id_registro(registro_id)[0]},
+                {"$set": {self._campo_data(colecao): data_formatada}}
+            )
+        if registro and resultado.modified_count:
+            self._atualizar_resumo([registro], -1)
+            self._atualizar_resumo([dict(registro, data_refeicao=data_formatada)], 1)
+        return resultado
 
     def excluir_registro(self, registro_id):
-        return self.collection.delete_one({"_id": ObjectId(registro_id)})
+        colecao, registro = self._localizar_registro(registro_id)
+        resultado = colecao.delete_one({"_id": _ler_id_registro(registro_id)[0]})
+        if registro and resultado.deleted_count:
+            self._atualizar_resumo([registro], -1)
+        return resultado
+
+    def _atualizar_resumo(self, registros, sinal):
+        """Soma (sinal=1) ou subtrai (sinal=-1) os registros da coleção de resumo.
+
+        Os registros são agrupados por dia/obra/colaborador antes, então cada
+        chave gera uma única operação no bulk_write.
+        """
+        grupos = {}
+        for registro in registros:
+            chave = tuple(registro[campo] for campo in CHAVE_RESUMO)
+            grupo = grupos.setdefault(chave, {
+                "obra_nome": registro.get("obra_nome"),
+                "colaborador_nome": registro.get("colaborador_nome"),
+                "total": 0,
+                "soma_valor_refeicao": 0,
+            })
+            grupo["total"] += 1
+            grupo["soma_valor_refeicao"] += registro.get("valor_refeicao", 0)
+
+        operacoes = []
+        for chave, grupo in grupos.items():
+            filtro = dict(zip(CHAVE_RESUMO, chave))
+            operacoes.append(UpdateOne(filtro, {
+                "$inc": {
+                    "total": sinal * grupo["total"],
+                    "soma_valor_refeicao": sinal * grupo["soma_valor_refeicao"],
+                },
+                "$set": {"obra_nome": grupo["obra_nome"], "colaborador_nome": grupo["colaborador_nome"]},
+            }, upsert=sinal > 0))
+            if sinal < 0:
+                # Remove a chave quando não sobra nenhuma refeição nela
+                operacoes.append(DeleteOne(dict(filtro, total={"$lte": 0})))
+
+        if operacoes:
+            self._garantir_resumo()
+            self.resumo_collection.bulk_write(operacoes)
+            self._invalidar_resultados()
+
+    def reconstruir_resumo(self):
+        """Recalcula toda a coleção de resumo a partir dos registros brutos.
+
+        O $out substitui a coleção de uma vez só, mantendo os índices já
+        existentes; leituras do dashboard nunca veem a coleção pela metade.
+        """
+        self.collection.aggregate(
+            self._pipeline_com_arquivos({}, self._arquivos_do_periodo(), self._pipeline_resumo() + [{"$out": COLECAO_RESUMO}]),
+            allowDiskUse=True,
+        )
+        self._invalidar_resultados()
+        return self.resumo_collection.estimated_document_count()
+
+    def _garantir_resumo(self):
+        """Cria os índices do resumo e o monta a partir dos registros se estiver vazio.
+
+        O dashboard lê só o resumo e o $merge de _recalcular_resumo exige o
+        índice único em CHAVE_RESUMO; assim um banco novo funciona sem rodar
+        reconstruir_resumo_refeicoes antes.
+        """
+        if self._resumo_pronto:
+            return
+        for indice in INDICES_RESUMO:
+            self._criar_indice(self.resumo_collection, indice)
+        self._montar_resumo_se_vazio()
+        self._resumo_pronto = True
+
+    def _montar_resumo_se_vazio(self):
+        if self.resumo_collection.find_one({}, {"_id": 1}) is None:
+            self.reconstruir_resumo()
+
+    def _recalcular_resumo(self, registros, datas_extras=()):
+        """Recalcula só as chaves do resumo tocadas pelos registros informados.
+
+        Usa o "retângulo" datas x obras x colaboradores dos registros: um
+        $merge regrava essas chaves a partir dos registros brutos, marcando-as
+        com o identificador do recálculo, e depois são apagadas as chaves do
+        retângulo que não foram regravadas (ficaram sem registros). O
+        resultado fica correto mesmo que parte da operação em lote tenha
+        falhado.
+        """
+        if not registros:
+            return
+        self._garantir_resumo()
+        match = {
+            "data_refeicao": {"$in": list({r["data_refeicao"] for r in registros} | set(datas_extras))},
+            "obra_id": {"$in": list({r["obra_id"] for r in registros})},
+            "colaborador_id": {"$in": list({r["colaborador_id"] for r in registros})},
+        }
+        datas = match["data_refeicao"]["$in"]
+        arquivos = self._arquivos_do_periodo(min(datas), max(datas))
+        recalculo = _nova_geracao()
+        self.collection.aggregate(self._pipeline_com_arquivos(match, arquivos, self._pipeline_resumo() + [
+            {"$set": {"recalculo": recalculo}},
+            {"$merge": {
+                "into": COLECAO_RESUMO,
+                "on": list(CHAVE_RESUMO),
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }},
+        ]))
+        self.resumo_collection.delete_many(dict(match, recalculo={"$ne": recalculo}))
+        self._invalidar_resultados()
+
+    def _pipeline_resumo(self):
+        # Etapas aplicadas depois de _pipeline_com_arquivos (campos já no formato comum)
+        return [
+            {"$group": {
+                "_id": {campo: f"${campo}" for campo in CHAVE_RESUMO},
+                "obra_nome": {"$last": "$obra_nome"},
+                "colaborador_nome": {"$last": "$colaborador_nome"},
+                "total": {"$sum": 1},
+                "soma_valor_refeicao": {"$sum": "$valor_refeicao"},
+            }},
+            {"$project": dict(
+                {campo: f"$_id.{campo}" for campo in CHAVE_RESUMO},
+                _id=0, obra_nome=1, colaborador_nome=1, total=1, soma_valor_refeicao=1,
+            )},
+        ]
+
+    def _etapas_campos_planos(self):
+        """Etapas que deixam os documentos da coleção ativa com os nomes comuns de campo.
+
+        Na time-series, traz obra_id e colaborador_id de meta para a raiz; no
+        esquema compacto, renomeia os campos curtos e converte os centavos.
+        """
+        if self.compacto:
+            renomear = {campo: f"${curto}" for campo, curto in CAMPOS_COMPACTOS.items() if campo != "valor_refeicao"}
+            renomear["valor_refeicao"] = {"$divide": [f"${CAMPOS_COMPACTOS['valor_refeicao']}", CENTAVOS]}
+            return [{"$set": renomear}, {"$unset": list(CAMPOS_COMPACTOS.values())}]
+        if not self.timeseries:
+            return []
+        return [{"$set": {campo: f"${CAMPO_META}.{campo}" for campo in CAMPOS_META}}]
+
+    def _campo_data(self, colecao):
+        # Arquivos usam sempre os nomes comuns
+        return self._campo("data_refeicao") if colecao.name == self.collection.name else "data_refeicao"
+
+    def atualizar_data_refeicoes_em_lote(self, nova_data, ids=None, filtros=None):
+        """Corrige a data de vários registros (lista de ids ou filtros) em um único bulk_write.
+
+        Registros cujo colaborador já tem refeição na nova data violam o
+        índice único e são contados como conflitos; os demais são alterados.
+        """
+        data_formatada = datetime.strptime(nova_data, "%Y-%m-%d")
+        grupos = self._buscar_registros_lote(ids, filtros)
+        registros = [registro for _, registros_colecao in grupos for registro in registros_colecao]
+        if not registros:
+            return {"atualizados": 0, "conflitos": 0}
+
+        conflitos = 0
+        a_alterar = registros
+        if self.timeseries or self.meses_ativos:
+            a_alterar, conflitos = self._separar_conflitos_de_data(registros, data_formatada)
+        ids_a_alterar = {registro["_id"] for registro in a_alterar}
+
+        atualizados = 0
+        for colecao, registros_colecao in grupos:
+            ids_colecao = [r["_id"] for r in registros_colecao if r["_id"] in ids_a_alterar]
+            if not ids_colecao:
+                continue
+            if colecao.name not in (self.collection.name, nome_arquivo(data_formatada.year, data_formatada.month)):
+                movidos, falhas = self._mover_para_ativa(colecao, ids_colecao, data_formatada)
+                atualizados += movidos
+                conflitos += falhas
+                continue
+            operacoes = [
+                UpdateOne({"_id": registro_id}, {"$set": {self._campo_data(colecao): data_formatada}})
+                for registro_id in ids_colecao
+            ]
+            try:
+                atualizados += colecao.bulk_write(operacoes, ordered=False).modified_count
+            except BulkWriteError as e:
+                atualizados += e.details.get("nModified", 0)
+                conflitos += len(e.details.get("writeErrors", []))
+
+        self._recalcular_resumo(registros, datas_extras=[data_formatada])
+        return {"atualizados": atualizados, "conflitos": conflitos}
+
+    def excluir_registros_em_lote(self, ids=None, filtros=None):
+        """Exclui vários registros (lista de ids ou filtros) com um bulk_write por coleção."""
+        grupos = self._buscar_registros_lote(ids, filtros)
+        if not grupos:
+            return {"excluidos": 0}
+
+        excluidos = 0
+        for colecao, registros_colecao in grupos:
+            excluidos += colecao.bulk_write(
+                [DeleteOne({"_id": registro["_id"]}) for registro in registros_colecao], ordered=False
+            ).deleted_count
+        self._recalcular_resumo([registro for _, registros_colecao in grupos for registro in registros_colecao])
+        # Obras/colaboradores podem ter ficado sem refeições
+        cache.delete_many([CHAVE_CACHE_OBRAS, CHAVE_CACHE_COLABORADORES])
+        return {"excluidos": excluidos}
+
+    def _buscar_registros_lote(self, ids, filtros):
+        """Registros selecionados, agrupados por coleção: lista de (coleção, registros).
+
+        Por ids, só os arquivos dos meses indicados nos ids (até achar todos);
+        por filtros, só os arquivos do período.
+        """
+        query = self._query_lote(ids, filtros)
+        registros = [_formato_comum(r) for r in self.collection.find(self._mapear_query(query), self._projecao(CAMPOS_LOTE))]
+        grupos = [(self.collection, registros)] if registros else []
+
+        if ids:
+            arquivos = self._arquivos_dos_meses({_ler_id_registro(registro_id)[1] for registro_id in ids})
+        else:
+            arquivos = self._arquivos_da_query(query)
+        faltando = len(query["_id"]["$in"]) - len(registros) if ids else None
+        for arquivo in arquivos:
+            if faltando == 0:
+                break
+            registros = list(arquivo.find(query, CAMPOS_LOTE))
+            if registros:
+                grupos.append((arquivo, registros))
+                if faltando is not None:
+                    faltando -= len(registros)
+        return grupos
+
+    def _mover_para_ativa(self, arquivo, ids, data):
+        """Leva registros de um arquivo mensal de volta à coleção ativa, já com a nova data.
+
+        Retorna (movidos, falhas); os que não puderam ser inseridos continuam no arquivo.
+        """
+        documentos = [
+            {**self._para_armazenamento(documento), self._campo("data_refeicao"): data}
+            for documento in arquivo.find({"_id": {"$in": ids}})
+        ]
+        falhos = set()
+        try:
+            self.collection.insert_many(documentos, ordered=False)
+        except BulkWriteError as e:
+            falhos = {documentos[erro["index"]]["_id"] for erro in e.details.get("writeErrors", [])}
+        movidos = [documento["_id"] for documento in documentos if documento["_id"] not in falhos]
+        if movidos:
+            arquivo.delete_many({"_id": {"$in": movidos}})
+        return len(movidos), len(falhos)
+
+    def _separar_conflitos_de_data(self, registros, data):
+        """Faz na time-series o papel do índice único ao mudar registros para `data`.
+
+        Retorna os registros que podem ser alterados e quantos ficariam
+        duplicados (colaborador que já tem, ou passaria a ter, duas refeições no dia).
+        """
+        ocupados = self._colaboradores_com_refeicao({r["colaborador_id"] for r in registros}, data)
+        a_alterar = []
+        conflitos = 0
+        for registro in registros:
+            if registro["data_refeicao"] == data:
+                continue
+            if registro["colaborador_id"] in ocupados:
+                conflitos += 1
+                continue
+            ocupados.add(registro["colaborador_id"])
+            a_alterar.append(registro)
+        return a_alterar, conflitos
+
+    def _query_lote(self, ids, filtros):
+        if ids:
+            try:
+                return {"_id": {"$in": [_ler_id_registro(registro_id)[0] for registro_id in ids]}}
+            except Exception as e:
+                raise ValueError("Id de registro inválido.") from e
+        query = self._construir_query(filtros or {})
+        if not query:
+            # Nunca aplica uma operação em lote à coleção inteira por engano
+            raise ValueError("Informe os registros ou ao menos um filtro.")
+        return query
 
     def _construir_query(self, filtros):
         query = {}
@@ -67,59 +947,538 @@ class ControleRefeicoes:
             query["colaborador_id"] = int(filtros["colaborador_id"])
         return query
 
+    def _resultado_em_cache(self, consulta, query, calcular):
+        """Resultado da agregação `consulta` para a query normalizada, guardado
+        por REFEICOES_CACHE_RESULTADOS_TTL segundos (0 desliga o cache).
+
+        Escritas que mudam o resumo trocam a geração (_invalidar_resultados),
+        então resultados anteriores deixam de ser encontrados e expiram pelo TTL.
+        A geração é aleatória e nunca se repete: se for expulsa do cache, a
+        próxima leitura cria outra em vez de voltar a um valor já usado.
+        """
+        ttl = _ttl_cache_resultados()
+        if not ttl:
+            return calcular()
+        geracao = cache.get_or_set(CHAVE_CACHE_GERACAO, _nova_geracao, None)
+        chave = f"{PREFIXO_CACHE_RESULTADOS}:{geracao}:{consulta}:{_chave_filtro(query)}"
+        resultado = cache.get(chave)
+        if resultado is None:
+            resultado = calcular()
+            cache.set(chave, resultado, ttl)
+        return resultado
+
+    def _invalidar_resultados(self):
+        cache.set(CHAVE_CACHE_GERACAO, _nova_geracao(), None)
+
     def total_refeicoes(self, filtros):
         query = self._construir_query(filtros)
-        return self.collection.count_documents(query)
+
+        def calcular():
+            total = self.collection.count_documents(self._mapear_query(query))
+            for arquivo in self._arquivos_da_query(query):
+                total += arquivo.count_documents(query)
+            return total
+        return self._resultado_em_cache("total_refeicoes", query, calcular)
 
     def total_colaboradores_unicos(self, filtros):
         query = self._construir_query(filtros)
-        return len(self.collection.distinct("colaborador_id", query))
+
+        def calcular():
+            colaboradores = set(self.collection.distinct(self._campo("colaborador_id"), self._mapear_query(query)))
+            for arquivo in self._arquivos_da_query(query):
+                colaboradores.update(arquivo.distinct("colaborador_id", query))
+            return len(colaboradores)
+        return self._resultado_em_cache("total_colaboradores", query, calcular)
 
     def refeicoes_por_dia(self, filtros):
         query = self._construir_query(filtros)
-        pipeline = [
-            {"$match": query},
-            {"$group": {"_id": "$data_refeicao", "total": {"$sum": 1}, "soma_valor_refeicao": {"$sum": "$valor_refeicao"}}},
-            {"$sort": {"_id": 1}}
-        ]
-        resultado = list(self.collection.aggregate(pipeline))
 
-        # Formatar data no backend
-        for r in resultado:
-            r["data_formatada"] = r["_id"].strftime("%d/%m/%y")
-        return resultado
-    
+        def calcular():
+            pipeline = self._pipeline_com_arquivos(query, self._arquivos_da_query(query), [
+                {"$group": {"_id": "$data_refeicao", "total": {"$sum": 1}, "soma_valor_refeicao": {"$sum": "$valor_refeicao"}}},
+                {"$sort": {"_id": 1}}
+            ])
+            resultado = list(self.collection.aggregate(pipeline))
+
+            # Formatar data no backend
+            for r in resultado:
+                r["data_formatada"] = r["_id"].strftime("%d/%m/%y")
+            return resultado
+        return self._resultado_em_cache("refeicoes_por_dia", query, calcular)
+
     def somar_valor_refeicoes(self, filtros):
         query = self._construir_query(filtros)
+
+        def calcular():
+            pipeline = self._pipeline_com_arquivos(query, self._arquivos_da_query(query), [
+                {"$group": {"_id": None, "soma_valor_refeicao": {"$sum": "$valor_refeicao"}}}
+            ])
+            resultado = list(self.collection.aggregate(pipeline))
+            return resultado[0]["soma_valor_refeicao"] if resultado else 0
+        return self._resultado_em_cache("soma_valor_refeicoes", query, calcular)
+
+    def resumo_dashboard(self, filtros):
+        """Todos os números do dashboard em uma única agregação ($facet).
+
+        Substitui as chamadas separadas a total_refeicoes,
+        total_colaboradores_unicos, refeicoes_por_dia e somar_valor_refeicoes:
+        um único $match sobre a coleção de resumo, que tem no máximo um
+        documento por dia/obra/colaborador.
+        """
+        query = self._construir_query(filtros)
+        return self._resultado_em_cache("resumo_dashboard", query, lambda: self._calcular_resumo_dashboard(query))
+
+    def _calcular_resumo_dashboard(self, query):
+        self._garantir_resumo()
         pipeline = [
             {"$match": query},
-            {"$group": {"_id": None, "soma_valor_refeicao": {"$sum": "$valor_refeicao"}}}
+            {"$facet": {
+                "totais": [
+                    {"$group": {"_id": None, "total": {"$sum": "$total"}, "soma_valor_refeicao": {"$sum": "$soma_valor_refeicao"}}},
+                ],
+                "colaboradores": [
+                    {"$group": {"_id": "$colaborador_id"}},
+                    {"$count": "total"},
+                ],
+                "por_dia": [
+                    {"$group": {"_id": "$data_refeicao", "total": {"$sum": "$total"}, "soma_valor_refeicao": {"$sum": "$soma_valor_refeicao"}}},
+                    {"$sort": {"_id": 1}},
+                ],
+            }},
         ]
-        resultado = list(self.collection.aggregate(pipeline))
-        return resultado[0]["soma_valor_refeicao"] if resultado else 0
+        resultado = next(iter(self.resumo_collection.aggregate(pipeline)), None) or {}
+
+        totais = resultado.get("totais") or [{"total": 0, "soma_valor_refeicao": 0}]
+        colaboradores = resultado.get("colaboradores") or [{"total": 0}]
+        por_dia = resultado.get("por_dia") or []
+        for r in por_dia:
+            r["data_formatada"] = r["_id"].strftime("%d/%m/%y")
+
+        return {
+            "total_refeicoes": totais[0]["total"],
+            "total_colaboradores": colaboradores[0]["total"],
+            "refeicoes_por_dia": por_dia,
+            "soma_valor_refeicoes": totais[0]["soma_valor_refeicao"],
+        }
+
+    def totais_por_obra_mes(self, filtros):
+        """Refeições e valor por obra e mês, agregados a partir da coleção de resumo."""
+        query = self._construir_query(filtros)
+
+        def calcular():
+            self._garantir_resumo()
+            return [
+                dict(r["_id"], total=r["total"], soma_valor_refeicao=r["soma_valor_refeicao"])
+                for r in self.resumo_collection.aggregate([
+                    {"$match": query},
+                    {"$group": {
+                        "_id": {"obra_id": "$obra_id", "ano": {"$year": "$data_refeicao"}, "mes": {"$month": "$data_refeicao"}},
+                        "total": {"$sum": "$total"},
+                        "soma_valor_refeicao": {"$sum": "$soma_valor_refeicao"},
+                    }},
+                    {"$sort": {"_id.ano": 1, "_id.mes": 1, "_id.obra_id": 1}},
+                ])
+            ]
+        return self._resultado_em_cache("totais_por_obra_mes", query, calcular)
 
     def listar_obras_unicas(self):
-        return self.collection.aggregate([
-            {"$group": {
-                "_id": {"obra_id": "$obra_id", "obra_nome": "$obra_nome"}
-            }},
-            {"$project": {
-                "obra_id": "$_id.obra_id",
-                "obra_nome": "$_id.obra_nome",
-                "_id": 0
-            }},
-            {"$sort": {"obra_nome": 1}}
-        ])
+        obras = cache.get(CHAVE_CACHE_OBRAS)
+        if obras is None:
+            self._garantir_resumo()
+            obras = list(self.resumo_collection.aggregate([
+                {"$group": {
+                    "_id": "$obra_id",
+                    "obra_nome": {"$max": "$obra_nome"}
+                }},
+                {"$project": {
+                    "obra_id": "$_id",
+                    "obra_nome": 1,
+                    "_id": 0
+                }},
+                {"$sort": {"obra_nome": 1}}
+            ]))
+            obras = _ordenar_por_nome(preencher_nomes(obras), "obra_nome")
+            cache.set(CHAVE_CACHE_OBRAS, obras, _ttl_cache_filtros())
+        return obras
 
     def listar_colaboradores_unicos(self):
-        return self.collection.aggregate([
-            {"$group": {
-                "_id": {"colaborador_id": "$colaborador_id", "colaborador_nome": "$colaborador_nome"}
-            }},
-            {"$project": {
-                "colaborador_id": "$_id.colaborador_id",
-                "colaborador_nome": "$_id.colaborador_nome",
-                "_id": 0
-            }},
-            {"$sort": {"colaborador_nome": 1}}
-        ])
\ No newline at end of file
+        colaboradores = cache.get(CHAVE_CACHE_COLABORADORES)
+        if colaboradores is None:
+            self._garantir_resumo()
+            colaboradores = list(self.resumo_collection.aggregate([
+                {"$group": {
+                    "_id": "$colaborador_id",
+                    "colaborador_nome": {"$max": "$colaborador_nome"}
+                }},
+                {"$project": {
+                    "colaborador_id": "$_id",
+                    "colaborador_nome": 1,
+                    "_id": 0
+                }},
+                {"$sort": {"colaborador_nome": 1}}
+            ]))
+            colaboradores = _ordenar_por_nome(preencher_nomes(colaboradores), "colaborador_nome")
+            cache.set(CHAVE_CACHE_COLABORADORES, colaboradores, _ttl_cache_filtros())
+        return colaboradores
+
+    def corrigir_nomes(self, campo_nome, nomes):
+        """Grava os nomes atuais ({id: nome}) de colaboradores ou obras nos registros já gravados.
+
+        Cada id vira um UpdateMany que só altera os documentos com nome
+        diferente, enviados em bulk_write de até TAMANHO_LOTE_NOMES operações
+        na coleção ativa (exceto no esquema compacto, que não guarda nomes),
+        no resumo e nos arquivos mensais.
+        """
+        campo_id = CAMPOS_NOME[campo_nome]
+        colecoes = [self.resumo_collection] + [self.db[nome_arquivo(ano, mes)] for ano, mes in self.meses_arquivados()]
+        if not self.compacto:
+            colecoes.insert(0, self.collection)
+
+        itens = list(nomes.items())
+        modificados = 0
+        for colecao in colecoes:
+            campo = self._campo(campo_id) if colecao.name == self.collection.name else campo_id
+            for inicio in range(0, len(itens), TAMANHO_LOTE_NOMES):
+                operacoes = [
+                    UpdateMany({campo: item_id, campo_nome: {"$ne": nome}}, {"$set": {campo_nome: nome}})
+                    for item_id, nome in itens[inicio:inicio + TAMANHO_LOTE_NOMES]
+                ]
+                modificados += colecao.bulk_write(operacoes, ordered=False).modified_count
+
+        for item_id in nomes:
+            esquecer_nome(PREFIXOS_NOME[campo_nome], item_id)
+        cache.delete(CHAVES_CACHE_POR_NOME[campo_nome])
+        return modificados
+
+    def _invalidar_filtros_se_novos(self, registros):
+        """Descarta as listas em cache se apareceu obra ou colaborador que não estava nelas."""
+        obras = cache.get(CHAVE_CACHE_OBRAS)
+        if obras is not None:
+            conhecidas = {o["obra_id"] for o in obras}
+            if any(r["obra_id"] not in conhecidas for r in registros):
+                cache.delete(CHAVE_CACHE_OBRAS)
+
+        colaboradores_cache = cache.get(CHAVE_CACHE_COLABORADORES)
+        if colaboradores_cache is not None:
+            conhecidos = {c["colaborador_id"] for c in colaboradores_cache}
+            if any(r["colaborador_id"] not in conhecidos for r in registros):
+                cache.delete(CHAVE_CACHE_COLABORADORES)
+
+    def criar_indices(self):
+        """Cria os índices declarados em INDICES_CONTROLE_DIARIO (ou
+        INDICES_TIMESERIES e INDICES_CHAVES_TIMESERIES) e INDICES_RESUMO, e
+        monta o resumo se ele ainda estiver vazio.
+
+        create_index não faz nada se o índice já existir com a mesma
+        definição, então pode ser executado a cada deploy.
+        """
+        criados = []
+        if self.timeseries:
+            indices_registros = INDICES_TIMESERIES
+        elif self.compacto:
+            indices_registros = INDICES_COMPACTOS
+        else:
+            indices_registros = INDICES_CONTROLE_DIARIO
+        colecoes = [(self.collection, indices_registros), (self.resumo_collection, INDICES_RESUMO)]
+        if self.timeseries:
+            colecoes.append((self.chaves_timeseries_collection, INDICES_CHAVES_TIMESERIES))
+        for colecao, indices in colecoes:
+            for indice in indices:
+                criados.append(self._criar_indice(colecao, indice))
+        self._montar_resumo_se_vazio()
+        self._resumo_pronto = True
+        return criados
+
+    def _criar_indice(self, colecao, indice):
+        opcoes = {k: v for k, v in indice.items() if k not in ("nome", "chaves")}
+        return colecao.create_index(indice["chaves"], name=indice["nome"], **opcoes)
+
+    def estatisticas_indices(self, colecao=None):
+        """Tamanho (bytes) e uso (operações desde o último restart) de cada índice."""
+        colecao = colecao if colecao is not None else self.collection
+        tamanhos = self.db.command("collStats", colecao.name).get("indexSizes", {})
+        usos = {
+            estatistica["name"]: estatistica["accesses"]
+            for estatistica in colecao.aggregate([{"$indexStats": {}}])
+        }
+        estatisticas = []
+        for nome, info in colecao.index_information().items():
+            estatisticas.append({
+                "nome": nome,
+                "chaves": info["key"],
+                "tamanho": tamanhos.get(nome, 0),
+                "operacoes": usos.get(nome, {}).get("ops", 0),
+                "desde": usos.get(nome, {}).get("since"),
+            })
+        return estatisticas
+
+    def criar_colecao_timeseries(self):
+        """Cria a coleção time-series se ainda não existir. Retorna True se criou.
+
+        Lança RuntimeError se o servidor for anterior a VERSAO_MINIMA_TIMESERIES.
+        """
+        versao = tuple(self.db.client.server_info()["versionArray"][:2])
+        if versao < VERSAO_MINIMA_TIMESERIES:
+            raise RuntimeError(
+                "O modo time-series exige MongoDB %d.%d ou mais novo (servidor: %d.%d)."
+                % (VERSAO_MINIMA_TIMESERIES + versao)
+            )
+        if self.db.list_collection_names(filter={"name": COLECAO_TIMESERIES}):
+            return False
+        self.db.create_collection(COLECAO_TIMESERIES, timeseries=OPCOES_TIMESERIES)
+        return True
+
+    def copiar_registros(self, destino, tamanho_lote=TAMANHO_LOTE_MIGRACAO):
+        """Copia os registros desta coleção para a de `destino`, em lotes por ordem de _id.
+
+        Gera (copiados, ignorados) após cada lote. Os _id são mantidos e a
+        cópia recomeça após o maior _id já presente no destino, então uma
+        migração interrompida pode ser executada de novo. Registros que
+        violam o índice único do destino (colaborador repetido no mesmo dia,
+        de antes de a origem ter o índice) são ignorados e contados.
+        """
+        ultimo = next(iter(destino.collection.find({}, {"_id": 1}).sort("_id", DESCENDING).limit(1)), None)
+        query = {"_id": {"$gt": ultimo["_id"]}} if ultimo else {}
+        cursor = self.collection.find(query).sort("_id", ASCENDING).batch_size(tamanho_lote)
+
+        registros = _consumir_cursor(cursor)
+        if self.compacto:
+            # O destino pode precisar dos nomes que o esquema compacto não guarda
+            registros = _com_nomes(registros, tamanho_lote)
+
+        copiados = 0
+        ignorados = 0
+        lote = []
+        for registro in registros:
+            lote.append(destino._para_armazenamento(registro))
+            if len(lote) >= tamanho_lote:
+                inseridos, duplicados = _inserir_ignorando_duplicados(destino.collection, lote)
+                copiados += inseridos
+                ignorados += duplicados
+                lote = []
+                yield copiados, ignorados
+        if lote:
+            inseridos, duplicados = _inserir_ignorando_duplicados(destino.collection, lote)
+            copiados += inseridos
+            ignorados += duplicados
+            yield copiados, ignorados
+
+    def meses_para_arquivar(self, hoje=None):
+        """Meses (ano, mês) da coleção ativa anteriores aos REFEICOES_MESES_ATIVOS mais recentes."""
+        if not self.meses_ativos:
+            return []
+        hoje = hoje or datetime.now()
+        ano, mes = divmod(hoje.year * 12 + hoje.month - 1 - (self.meses_ativos - 1), 12)
+        limite = datetime(ano, mes + 1, 1)
+        campo_data = self._campo("data_refeicao")
+        meses = self.collection.aggregate([
+            {"$match": {campo_data: {"$lt": limite}}},
+            {"$group": {"_id": {"ano": {"$year": f"${campo_data}"}, "mes": {"$month": f"${campo_data}"}}}},
+            {"$sort": {"_id.ano": 1, "_id.mes": 1}},
+        ])
+        return [(m["_id"]["ano"], m["_id"]["mes"]) for m in meses]
+
+    def arquivar_mes(self, ano, mes, tamanho_lote=TAMANHO_LOTE_ARQUIVAMENTO):
+        """Move os registros do mês para controle_diario_arquivo_AAAA_MM, em lotes.
+
+        Cada lote é inserido no arquivo e só então apagado da coleção ativa;
+        se a execução for interrompida entre os dois passos, o lote repetido
+        esbarra no _id já arquivado e é apenas apagado. Gera o total movido
+        após cada lote. O resumo não muda: os registros continuam existindo.
+        """
+        inicio = datetime(ano, mes, 1)
+        arquivo = self.db[nome_arquivo(ano, mes)]
+        for indice in INDICES_ARQUIVO:
+            self._criar_indice(arquivo, indice)
+        # A coleção já existe (create_index a cria): as leituras passam a incluí-la
+        cache.delete(CHAVE_CACHE_ARQUIVOS)
+
+        campo_data = self._campo("data_refeicao")
+        query = {campo_data: {"$gte": inicio, "$lt": _mes_seguinte(inicio)}}
+        movidos = 0
+        while True:
+            # Arquivos ficam no formato comum, com os nomes, seja qual for o da coleção ativa
+            lote = preencher_nomes([
+                _formato_comum(registro)
+                for registro in self.collection.find(query).sort(
+                    [(campo_data, ASCENDING), ("_id", ASCENDING)]
+                ).limit(tamanho_lote)
+            ])
+            if not lote:
+                break
+            try:
+                arquivo.insert_many(lote, ordered=False)
+            except BulkWriteError as e:
+                # O único índice único do arquivo é o _id: duplicata = já arquivado
+                if any(erro.get("code") != ERRO_CHAVE_DUPLICADA for erro in e.details.get("writeErrors", [])):
+                    raise
+            self.collection.delete_many({"_id": {"$in": [registro["_id"] for registro in lote]}})
+            movidos += len(lote)
+            yield movidos
+
+    def _colecoes_de_registros(self):
+        """Coleção ativa seguida dos arquivos mensais."""
+        return [self.collection] + [self.db[nome_arquivo(ano, mes)] for ano, mes in self.meses_arquivados()]
+
+    def iterar_ids_referenciados(self, campo_id, tamanho_lote=TAMANHO_LOTE_ORFAOS):
+        """Gera listas de até tamanho_lote ids distintos de campo_id (colaborador_id ou obra_id).
+
+        O $group roda no servidor e o cursor devolve os ids aos poucos, então
+        a memória usada não depende do tamanho das coleções. Um id presente
+        na coleção ativa e em arquivos pode aparecer mais de uma vez.
+        """
+        for colecao in self._colecoes_de_registros():
+            campo = self._campo(campo_id) if colecao.name == self.collection.name else campo_id
+            cursor = colecao.aggregate(
+                [{"$group": {"_id": f"${campo}"}}, {"$sort": {"_id": 1}}],
+                allowDiskUse=True, batchSize=tamanho_lote,
+            )
+            lote = []
+            for documento in cursor:
+                if documento["_id"] is None:
+                    continue
+                lote.append(documento["_id"])
+                if len(lote) >= tamanho_lote:
+                    yield lote
+                    lote = []
+            if lote:
+                yield lote
+
+    def contar_registros_dos_ids(self, campo_id, ids):
+        """Registros (coleção ativa e arquivos) que referenciam os ids informados."""
+        return sum(
+            colecao.count_documents({self._campo(campo_id) if colecao.name == self.collection.name else campo_id: {"$in": list(ids)}})
+            for colecao in self._colecoes_de_registros()
+        )
+
+    def excluir_registros_dos_ids(self, campo_id, ids, arquivar=False):
+        """Apaga os registros e as chaves de resumo dos ids informados; retorna quantos registros saíram.
+
+        Com arquivar=True os registros são antes copiados ($merge, no
+        servidor) para COLECAO_ORFAOS no formato comum.
+        """
+        ids = list(ids)
+        excluidos = 0
+        for colecao in self._colecoes_de_registros():
+            ativa = colecao.name == self.collection.name
+            query = {self._campo(campo_id) if ativa else campo_id: {"$in": ids}}
+            if arquivar:
+                etapas = self._etapas_campos_planos() if ativa else []
+                colecao.aggregate([{"$match": query}] + etapas + [
+                    {"$merge": {"into": COLECAO_ORFAOS, "on": "_id", "whenMatched": "keepExisting"}},
+                ])
+            excluidos += colecao.delete_many(query).deleted_count
+
+        self.resumo_collection.delete_many({campo_id: {"$in": ids}})
+        cache.delete_many([CHAVE_CACHE_OBRAS, CHAVE_CACHE_COLABORADORES])
+        self._invalidar_resultados()
+        return excluidos
+
+    def tamanho_colecao(self, colecao=None):
+        """Bytes ocupados em disco pelos dados e pelos índices da coleção."""
+        colecao = colecao if colecao is not None else self.collection
+        estatisticas = self.db.command("collStats", colecao.name)
+        return {
+            "documentos": estatisticas.get("count", 0),
+            "armazenamento": estatisticas.get("storageSize", 0),
+            "indices": estatisticas.get("totalIndexSize", 0),
+        }
+
+
+def _id_registro(registro):
+    """Id exposto nas listagens: o _id seguido do mês da refeição (AAAAMM), que
+    indica o único arquivo mensal onde o registro pode estar."""
+    if not registro.get("data_refeicao"):
+        return str(registro["_id"])
+    return f'{registro["_id"]}_{registro["data_refeicao"]:%Y%m}'
+
+
+def _ler_id_registro(registro_id):
+    """(ObjectId, (ano, mês)) a partir de _id_registro; o mês é None quando o id é só o ObjectId."""
+    texto, _, mes = str(registro_id).partition("_")
+    if not mes:
+        return ObjectId(texto), None
+    if len(mes) != 6 or not mes.isdigit():
+        raise ValueError(f"Id de registro inválido: {registro_id}")
+    return ObjectId(texto), (int(mes[:4]), int(mes[4:]))
+
+
+def _consumir_cursor(*cursores):
+    try:
+        for cursor in cursores:
+            yield from map(_formato_comum, cursor)
+    finally:
+        for cursor in cursores:
+            cursor.close()
+
+
+def _combinar(*condicoes):
+    condicoes = [condicao for condicao in condicoes if condicao]
+    if len(condicoes) > 1:
+        return {"$and": condicoes}
+    return condicoes[0] if condicoes else {}
+
+
+def _achatar_meta(registro):
+    """Devolve o documento da time-series no formato da coleção comum (campos de meta na raiz)."""
+    if registro and CAMPO_META in registro:
+        registro.update(registro.pop(CAMPO_META))
+    return registro
+
+
+def _formato_comum(registro):
+    """Documento de qualquer formato da coleção ativa (comum, time-series ou
+    compacto) com os nomes comuns de campo. Os nomes de cadastro do esquema
+    compacto são completados à parte, em lote (preencher_nomes)."""
+    _achatar_meta(registro)
+    if registro and CAMPOS_COMPACTOS["data_refeicao"] in registro:
+        for campo, curto in CAMPOS_COMPACTOS.items():
+            if curto in registro:
+                registro[campo] = registro.pop(curto)
+        if "valor_refeicao" in registro:
+            registro["valor_refeicao"] = registro["valor_refeicao"] / CENTAVOS
+        if "_id" in registro and "registrado_em" not in registro:
+            # Mesmo horário local usado por datetime.now() nos documentos comuns
+            registro["registrado_em"] = registro["_id"].generation_time.astimezone().replace(tzinfo=None)
+    return registro
+
+
+def _com_nomes(registros, tamanho_lote):
+    """Completa os nomes de cadastro de um iterador de registros, um lote por vez."""
+    lote = []
+    for registro in registros:
+        lote.append(registro)
+        if len(lote) >= tamanho_lote:
+            yield from preencher_nomes(lote)
+            lote = []
+    yield from preencher_nomes(lote)
+
+
+def _ordenar_por_nome(itens, campo_nome):
+    return sorted(itens, key=lambda item: item[campo_nome] or "")
+
+
+def indices_redundantes(indices):
+    """Recebe o dict de collection.index_information() e devolve pares
+    (indice_redundante, indice_que_o_cobre).
+
+    Um índice é redundante quando suas chaves são prefixo (mesmos campos e
+    direções) de outro índice. Índices únicos e o _id_ nunca são marcados.
+    """
+    redundantes = []
+    for nome, info in indices.items():
+        if nome == "_id_" or info.get("unique"):
+            continue
+        chaves = list(info["key"])
+        for outro_nome, outro_info in indices.items():
+            if outro_nome == nome:
+                continue
+            outras_chaves = list(outro_info["key"])
+            if len(chaves) > len(outras_chaves) or outras_chaves[:len(chaves)] != chaves:
+                continue
+            # Índices idênticos: marca apenas um dos dois, preservando o único
+            if len(chaves) == len(outras_chaves) and not outro_info.get("unique") and nome < outro_nome:
+                continue
+            redundantes.append((nome, outro_nome))
+            break
+    return redundantes
@@ -0,0 +1,25 @@
+from asgiref.sync import sync_to_async
+from Sistema.utils.backend_refeicoes import get_controle_refeicoes
+
+
+class AsyncControleRefeicoes:
+    """Mesma API do backend de refeições (ControleRefeicoes ou outro
+    configurado em REFEICOES_BACKEND), com métodos aguardáveis (await).
+
+    Cada chamada roda no pool de threads do asgiref usando o cliente
+    Mongo compartilhado do processo, então a view assíncrona não bloqueia o
+    event loop e consultas independentes podem rodar ao mesmo tempo com
+    asyncio.gather. O AsyncMongoClient nativo não foi usado porque fica
+    preso ao event loop em que foi criado, e sob WSGI cada requisição
+    assíncrona roda em um loop novo. Métodos que podem usar o ORM (todos,
+    exceto os de metodos_sem_orm do backend) rodam na thread da requisição.
+    """
+
+    def __init__(self, controle=None):
+        self._controle = controle if controle is not None else get_controle_refeicoes()
+
+    def __getattr__(self, nome):
+        atributo = getattr(self._controle, nome)
+        if nome.startswith("_") or not callable(atributo):
+            return atributo
+        return sync_to_async(atributo, thread_sensitive=self._controle.usa_orm(nome))
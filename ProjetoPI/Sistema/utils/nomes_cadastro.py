@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from Sistema.models import Colaborador, Obra
+
+TTL_CACHE_NOMES = 600
+
+# Campo com o nome -> campo com o id, nos registros de refeições
+CAMPOS_NOME = {
+    "colaborador_nome": "colaborador_id",
+    "obra_nome": "obra_id",
+    "registrado_por_nome": "registrado_por_id",
+}
+
+# Campo com o nome -> prefixo da chave de cache
+PREFIXOS_NOME = {
+    "colaborador_nome": "colaborador",
+    "obra_nome": "obra",
+    "registrado_por_nome": "usuario",
+}
+
+
+def _fontes():
+    # (campo do nome, prefixo da chave de cache, modelo, atributo com o nome)
+    return [
+        ("colaborador_nome", PREFIXOS_NOME["colaborador_nome"], Colaborador, "nome"),
+        ("obra_nome", PREFIXOS_NOME["obra_nome"], Obra, "nome"),
+        ("registrado_por_nome", PREFIXOS_NOME["registrado_por_nome"], get_user_model(), "username"),
+    ]
+
+
+def _chave(prefixo, item_id):
+    return f"refeicoes:nome:{prefixo}:{item_id}"
+
+
+def buscar_nomes(prefixo, modelo, atributo, ids):
+    """Nome de cada id informado: primeiro no cache, os que faltam em uma única consulta ao banco."""
+    ids = {item_id for item_id in ids if item_id is not None}
+    if not ids:
+        return {}
+    chaves = {_chave(prefixo, item_id): item_id for item_id in ids}
+    nomes = {chaves[chave]: nome for chave, nome in cache.get_many(list(chaves)).items()}
+
+    faltando = ids - set(nomes)
+    if faltando:
+        encontrados = dict(modelo.objects.filter(id__in=faltando).values_list("id", atributo))
+        cache.set_many({_chave(prefixo, item_id): nome for item_id, nome in encontrados.items()}, TTL_CACHE_NOMES)
+        nomes.update(encontrados)
+    return nomes
+
+
+def preencher_nomes(registros):
+    """Completa colaborador_nome, obra_nome e registrado_por_nome dos registros que só têm os ids.
+
+    Usado pelo esquema compacto, que não grava os nomes em cada documento.
+    Faz no máximo uma consulta por tipo de cadastro para a lista inteira.
+    """
+    for campo_nome, prefixo, modelo, atributo in _fontes():
+        campo_id = CAMPOS_NOME[campo_nome]
+        sem_nome = [r for r in registros if campo_id in r and not r.get(campo_nome)]
+        if not sem_nome:
+            continue
+        nomes = buscar_nomes(prefixo, modelo, atributo, {r[campo_id] for r in sem_nome})
+        for registro in sem_nome:
+            registro[campo_nome] = nomes.get(registro[campo_id])
+    return registros
+
+
+def esquecer_nome(prefixo, item_id):
+    """Descarta o nome em cache (após renomear um cadastro)."""
+    cache.delete(_chave(prefixo, item_id))
@@ -0,0 +1,65 @@
+from Sistema.models import Obra
+
+# Obras resolvidas por consulta ao banco (limite de parâmetros do SQLite e do Oracle)
+TAMANHO_LOTE_OBRAS = 900
+
+
+def vinculos_das_obras(obras_ids):
+    """Restaurante e hotel vinculados a cada obra: {obra_id: ((id, nome), (id, nome))}.
+
+    Uma consulta com JOIN para cada TAMANHO_LOTE_OBRAS obras, em vez de uma
+    por obra. Vínculo ausente aparece como (None, None).
+    """
+    ids = sorted({obra_id for obra_id in obras_ids if obra_id is not None})
+    vinculos = {}
+    for inicio in range(0, len(ids), TAMANHO_LOTE_OBRAS):
+        linhas = Obra.objects.filter(id__in=ids[inicio:inicio + TAMANHO_LOTE_OBRAS]).values_list(
+            "id",
+            "restaurante_vinculado_id", "restaurante_vinculado__nome",
+            "hotel_vinculado_id", "hotel_vinculado__nome",
+        )
+        for obra_id, restaurante_id, restaurante_nome, hotel_id, hotel_nome in linhas:
+            vinculos[obra_id] = ((restaurante_id, restaurante_nome), (hotel_id, hotel_nome))
+    return vinculos
+
+
+def faturamento_parceiros(controle, filtros):
+    """Totais mensais de refeições das obras de cada restaurante e de cada hotel parceiro.
+
+    Os registros são agregados por obra e mês no backend de refeições e os
+    vínculos das obras vêm de vinculos_das_obras. Retorna {"restaurantes":
+    [...], "hoteis": [...]}, com uma linha por parceiro e mês; obras sem
+    vínculo (ou já excluídas) ficam na linha de parceiro_id None.
+    """
+    linhas = controle.totais_por_obra_mes(filtros)
+    vinculos = vinculos_das_obras(linha["obra_id"] for linha in linhas)
+
+    restaurantes = {}
+    hoteis = {}
+    sem_vinculo = ((None, None), (None, None))
+    for linha in linhas:
+        restaurante, hotel = vinculos.get(linha["obra_id"], sem_vinculo)
+        for grupos, (parceiro_id, parceiro_nome) in ((restaurantes, restaurante), (hoteis, hotel)):
+            grupo = grupos.setdefault((parceiro_id, linha["ano"], linha["mes"]), {
+                "parceiro_id": parceiro_id,
+                "parceiro_nome": parceiro_nome,
+                "ano": linha["ano"],
+                "mes": linha["mes"],
+                "obras": set(),
+                "total_refeicoes": 0,
+                "valor_total": 0,
+            })
+            grupo["obras"].add(linha["obra_id"])
+            grupo["total_refeicoes"] += linha["total"]
+            grupo["valor_total"] += linha["soma_valor_refeicao"]
+
+    return {"restaurantes": _linhas_ordenadas(restaurantes), "hoteis": _linhas_ordenadas(hoteis)}
+
+
+def _linhas_ordenadas(grupos):
+    linhas = [
+        dict(grupo, obras=len(grupo["obras"]), valor_total=round(grupo["valor_total"], 2))
+        for grupo in grupos.values()
+    ]
+    # Parceiros em ordem alfabética, sem vínculo por último; meses em ordem dentro de cada um
+    return sorted(linhas, key=lambda l: (l["parceiro_id"] is None, l["parceiro_nome"] or "", l["parceiro_id"] or 0, l["ano"], l["mes"]))
@@ -0,0 +1,266 @@
+from datetime import datetime, time
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from pymongo.errors import DuplicateKeyError
+from pymongo.results import DeleteResult, UpdateResult
+from Sistema.models import Colaborador, Obra, RegistroRefeicao
+from Sistema.utils.backend_refeicoes import BackendRefeicoes, VALOR_REFEICAO
+
+# Mesmo código de erro que o Mongo usa para violação de índice único
+ERRO_CHAVE_DUPLICADA = 11000
+TAMANHO_LOTE_INSERCAO = 500
+
+
+class ControleRefeicoesSQL(BackendRefeicoes):
+    """Registros de refeições no banco do Django (modelo RegistroRefeicao).
+
+    Nomes de colaborador e obra vêm das chaves estrangeiras (select_related)
+    em vez de ficarem copiados em cada registro. Os ids de registro são
+    inteiros; datas continuam sendo devolvidas como datetime, como no Mongo.
+    """
+
+    def registrar_refeicoes(self, data, colaboradores_ids, usuario):
+        data_formatada = datetime.strptime(data, "%Y-%m-%d").date()
+        colaboradores, nao_encontrados = self._resolver_colaboradores(colaboradores_ids)
+
+        existentes = set(RegistroRefeicao.objects.filter(
+            colaborador__in=[c.id for c in colaboradores], data_refeicao=data_formatada,
+        ).values_list("colaborador_id", flat=True))
+        novos = [
+            RegistroRefeicao(
+                colaborador_id=colaborador.id,
+                obra_id=colaborador.obra.id,
+                data_refeicao=data_formatada,
+                valor_refeicao=Decimal(str(VALOR_REFEICAO)),
+                registrado_por_id=usuario.id,
+            )
+            for colaborador in colaboradores if colaborador.id not in existentes
+        ]
+        inseridos = self._inserir(novos)
+
+        return {
+            "inseridos": inseridos,
+            "existentes": len(existentes) + len(novos) - inseridos,
+            "falhas": 0,
+            "nao_encontrados": nao_encontrados,
+        }
+
+    def _inserir(self, novos):
+        """Grava os registros e retorna quantos o banco aceitou.
+
+        Um envio simultâneo do mesmo colaborador/dia faz o lote violar a
+        restrição única; nesse caso os registros são gravados um a um e os
+        recusados contam como existentes.
+        """
+        try:
+            with transaction.atomic():
+                RegistroRefeicao.objects.bulk_create(novos, batch_size=TAMANHO_LOTE_INSERCAO)
+            return len(novos)
+        except IntegrityError:
+            inseridos = 0
+            for registro in novos:
+                registro.pk = None
+                try:
+                    with transaction.atomic():
+                        registro.save(force_insert=True)
+                    inseridos += 1
+                except IntegrityError:
+                    pass
+            return inseridos
+
+    def listar_registros(self):
+        return [self._como_dicionario(r) for r in self._base()]
+
+    def listar_registros_paginados(self, limite=100, apos=None, antes=None, filtros=None):
+        """Paginação por cursor (keyset) sobre o índice (data_refeicao, id)."""
+        registros = self._filtrar(self._base(), filtros or {})
+
+        if apos:
+            data, registro_id = self._decodificar_cursor(apos)
+            registros = registros.filter(Q(data_refeicao__lt=data) | Q(data_refeicao=data, id__lt=registro_id))
+            ordem = ("-data_refeicao", "-id")
+        elif antes:
+            data, registro_id = self._decodificar_cursor(antes)
+            registros = registros.filter(Q(data_refeicao__gt=data) | Q(data_refeicao=data, id__gt=registro_id))
+            ordem = ("data_refeicao", "id")
+        else:
+            ordem = ("-data_refeicao", "-id")
+
+        registros = list(registros.order_by(*ordem)[:limite + 1])
+        tem_mais = len(registros) > limite
+        registros = [self._como_dicionario(r) for r in registros[:limite]]
+        if antes:
+            registros.reverse()
+
+        if antes:
+            tem_proxima, tem_anterior = True, tem_mais
+        else:
+            tem_proxima, tem_anterior = tem_mais, bool(apos)
+
+        return {
+            "registros": registros,
+            "proximo": self._codificar_cursor(registros[-1]) if registros and tem_proxima else None,
+            "anterior": self._codificar_cursor(registros[0]) if registros and tem_anterior else None,
+        }
+
+    def _codificar_cursor(self, registro):
+        return f'{registro["data_refeicao"]:%Y%m%d}_{registro["_id"]}'
+
+    def _decodificar_cursor(self, cursor):
+        """Converte o cursor de volta em (data_refeicao, id). Lança ValueError se inválido."""
+        try:
+            data, registro_id = cursor.split("_", 1)
+            return datetime.strptime(data, "%Y%m%d").date(), int(registro_id)
+        except Exception as e:
+            raise ValueError(f"Cursor inválido: {cursor}") from e
+
+    def iterar_registros(self, filtros, tamanho_lote=1000):
+        # Filtros inválidos falham já na chamada, antes de a resposta começar
+        registros = self._filtrar(self._base(), filtros).order_by("data_refeicao", "id")
+        return (self._como_dicionario(r) for r in registros.iterator(chunk_size=tamanho_lote))
+
+    def buscar_registro(self, registro_id):
+        registro = self._base().filter(id=int(registro_id)).first()
+        return self._como_dicionario(registro) if registro else None
+
+    def atualizar_data_refeicao(self, registro_id, nova_data):
+        data_formatada = datetime.strptime(nova_data, "%Y-%m-%d").date()
+        try:
+            with transaction.atomic():
+                alterados = RegistroRefeicao.objects.filter(id=int(registro_id)).exclude(
+                    data_refeicao=data_formatada
+                ).update(data_refeicao=data_formatada)
+        except IntegrityError as e:
+            raise DuplicateKeyError("Colaborador já tem refeição registrada nesta data.", ERRO_CHAVE_DUPLICADA) from e
+        return UpdateResult({"n": alterados, "nModified": alterados}, acknowledged=True)
+
+    def excluir_registro(self, registro_id):
+        excluidos, _ = RegistroRefeicao.objects.filter(id=int(registro_id)).delete()
+        return DeleteResult({"n": excluidos}, acknowledged=True)
+
+    def atualizar_data_refeicoes_em_lote(self, nova_data, ids=None, filtros=None):
+        """Muda a data dos registros selecionados com um único UPDATE.
+
+        Os que ficariam duplicados (colaborador que já tem, ou passaria a
+        ter, duas refeições no dia) são deixados como estão e contados como
+        conflitos.
+        """
+        data_formatada = datetime.strptime(nova_data, "%Y-%m-%d").date()
+        with transaction.atomic():
+            selecionados = list(self._selecao_lote(ids, filtros).exclude(
+                data_refeicao=data_formatada
+            ).values_list("id", "colaborador_id"))
+            ocupados = set(RegistroRefeicao.objects.filter(
+                colaborador__in={colaborador_id for _, colaborador_id in selecionados},
+                data_refeicao=data_formatada,
+            ).values_list("colaborador_id", flat=True))
+
+            a_alterar = []
+            for registro_id, colaborador_id in selecionados:
+                if colaborador_id not in ocupados:
+                    ocupados.add(colaborador_id)
+                    a_alterar.append(registro_id)
+            atualizados = RegistroRefeicao.objects.filter(id__in=a_alterar).update(data_refeicao=data_formatada)
+
+        return {"atualizados": atualizados, "conflitos": len(selecionados) - len(a_alterar)}
+
+    def excluir_registros_em_lote(self, ids=None, filtros=None):
+        excluidos, _ = self._selecao_lote(ids, filtros).delete()
+        return {"excluidos": excluidos}
+
+    def resumo_dashboard(self, filtros):
+        registros = self._filtrar(RegistroRefeicao.objects.all(), filtros)
+        totais = registros.aggregate(
+            total=Count("id"),
+            soma=Sum("valor_refeicao"),
+            colaboradores=Count("colaborador", distinct=True),
+        )
+        por_dia = registros.values("data_refeicao").annotate(
+            total=Count("id"), soma_valor_refeicao=Sum("valor_refeicao"),
+        ).order_by("data_refeicao")
+
+        return {
+            "total_refeicoes": totais["total"],
+            "total_colaboradores": totais["colaboradores"],
+            "refeicoes_por_dia": [
+                {
+                    "_id": _como_datetime(dia["data_refeicao"]),
+                    "data_formatada": dia["data_refeicao"].strftime("%d/%m/%y"),
+                    "total": dia["total"],
+                    "soma_valor_refeicao": float(dia["soma_valor_refeicao"]),
+                }
+                for dia in por_dia
+            ],
+            "soma_valor_refeicoes": float(totais["soma"] or 0),
+        }
+
+    def totais_por_obra_mes(self, filtros):
+        linhas = self._filtrar(RegistroRefeicao.objects.all(), filtros).values(
+            "obra_id", ano=ExtractYear("data_refeicao"), mes=ExtractMonth("data_refeicao"),
+        ).annotate(total=Count("id"), soma_valor_refeicao=Sum("valor_refeicao")).order_by("ano", "mes", "obra_id")
+        return [dict(linha, soma_valor_refeicao=float(linha["soma_valor_refeicao"])) for linha in linhas]
+
+    def corrigir_nomes(self, campo_nome, nomes):
+        # Os nomes vêm do JOIN com o cadastro na leitura: nada a corrigir
+        return 0
+
+    def listar_obras_unicas(self):
+        return list(
+            Obra.objects.filter(refeicoes__isnull=False).distinct().order_by("nome")
+            .values(obra_id=F("id"), obra_nome=F("nome"))
+        )
+
+    def listar_colaboradores_unicos(self):
+        return list(
+            Colaborador.objects.filter(refeicoes__isnull=False).distinct().order_by("nome")
+            .values(colaborador_id=F("id"), colaborador_nome=F("nome"))
+        )
+
+    def _base(self):
+        return RegistroRefeicao.objects.select_related("colaborador", "obra", "registrado_por")
+
+    def _filtrar(self, registros, filtros):
+        """Mesmos filtros de _construir_query do Mongo (datas AAAA-MM-DD, obra e colaborador)."""
+        if filtros.get("data_inicio"):
+            registros = registros.filter(data_refeicao__gte=datetime.strptime(filtros["data_inicio"], "%Y-%m-%d").date())
+        if filtros.get("data_fim"):
+            registros = registros.filter(data_refeicao__lte=datetime.strptime(filtros["data_fim"], "%Y-%m-%d").date())
+        if filtros.get("obra_id"):
+            registros = registros.filter(obra_id=int(filtros["obra_id"]))
+        if filtros.get("colaborador_id"):
+            registros = registros.filter(colaborador_id=int(filtros["colaborador_id"]))
+        return registros
+
+    def _selecao_lote(self, ids, filtros):
+        if ids:
+            try:
+                return RegistroRefeicao.objects.filter(id__in=[int(registro_id) for registro_id in ids])
+            except (TypeError, ValueError) as e:
+                raise ValueError("Id de registro inválido.") from e
+        filtros = {campo: valor for campo, valor in (filtros or {}).items() if valor}
+        if not filtros:
+            # Nunca aplica uma operação em lote à tabela inteira por engano
+            raise ValueError("Informe os registros ou ao menos um filtro.")
+        return self._filtrar(RegistroRefeicao.objects.all(), filtros)
+
+    def _como_dicionario(self, registro):
+        """Registro no mesmo formato dos documentos do Mongo."""
+        return {
+            "_id": registro.id,
+            "id": str(registro.id),
+            "colaborador_id": registro.colaborador_id,
+            "colaborador_nome": registro.colaborador.nome,
+            "obra_id": registro.obra_id,
+            "obra_nome": registro.obra.nome,
+            "data_refeicao": _como_datetime(registro.data_refeicao),
+            "valor_refeicao": float(registro.valor_refeicao),
+            "registrado_em": registro.registrado_em,
+            "registrado_por_id": registro.registrado_por_id,
+            "registrado_por_nome": registro.registrado_por.username if registro.registrado_por else None,
+        }
+
+
+def _como_datetime(data):
+    return datetime.combine(data, time())
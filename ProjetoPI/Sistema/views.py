@@ -6,6 +6,7 @@ from django.contrib import messages
 from django.contrib.auth import login as auth_login, logout as auth_logout
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
+from django.utils.http import urlencode
 from .models import Profile, Restaurante,Colaborador, Obra
 from django.contrib.auth.models import Group,User
 from rest_framework.decorators import permission_classes, api_view
@@ -15,16 +16,35 @@ from django.contrib.auth.decorators import user_passes_test
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.authtoken.models import Token
 import logging
+import asyncio
+import csv
+from itertools import islice
+from asgiref.sync import sync_to_async
 from django.apps import apps
-from django.http import HttpResponseForbidden, HttpResponseBadRequest
-from Sistema.utils.mongo.mongo_model import ControleRefeicoes
+from django.http import HttpResponseForbidden, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from Sistema.utils.backend_refeicoes import get_controle_refeicoes, resumo_vazio
+from Sistema.utils.mongo.mongo_model_async import AsyncControleRefeicoes
+from Sistema.utils.mongo.mongo_connection import estatisticas_pool, estatisticas_comandos
+from Sistema.utils.relatorio_parceiros import faturamento_parceiros
+from Sistema.utils.colaboradores import colaboradores_visiveis, filtrar_colaboradores, obras_visiveis, paginar_colaboradores
+from Sistema.utils.exclusao_lotes import LIMITE_EXCLUSAO_IMEDIATA, consultar_exclusao, contar_afetados, iniciar_exclusao
+from django.db.models import ProtectedError
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 from django.contrib import messages
-from django.core.paginator import Paginator
 from django.contrib.auth.decorators import permission_required
 
-pedido_model = ControleRefeicoes()
+# Backend de REFEICOES_BACKEND. Não conecta no import: o cliente Mongo é
+# criado no primeiro uso de cada processo
+pedido_model = get_controle_refeicoes()
+
+
+def _pedido_model_async():
+    # Usado pelas views assíncronas; resolvido a cada chamada para sempre
+    # envolver o pedido_model atual do módulo
+    return AsyncControleRefeicoes(pedido_model)
 
 
 @api_view(['GET'])
@@ -70,8 +90,26 @@ def home(request):
 
 @login_required
 def lista_colaboradores(request):
-    colaboradores = Colaborador.objects.all()  # Ou sua queryset personalizada
-    return render(request, 'listar-colaboradores.html', {'colaboradores': colaboradores}) 
+    obra_id = request.GET.get('obra_id', '')
+    busca = request.GET.get('busca', '')
+    colaboradores = colaboradores_visiveis(request.user)
+    try:
+        colaboradores = filtrar_colaboradores(colaboradores, obra_id, busca)
+        pagina = paginar_colaboradores(colaboradores, apos=request.GET.get('apos'), antes=request.GET.get('antes'))
+    except ValueError:
+        # Obra ou cursor inválido: primeira página sem filtro de obra
+        obra_id = ''
+        pagina = paginar_colaboradores(filtrar_colaboradores(colaboradores_visiveis(request.user), busca=busca))
+
+    return render(request, 'listar-colaboradores.html', {
+        'colaboradores': pagina['colaboradores'],
+        'proximo': pagina['proximo'],
+        'anterior': pagina['anterior'],
+        'obras': obras_visiveis(request.user).only('id', 'nome').order_by('nome'),
+        'obra_id': obra_id,
+        'busca': busca,
+        'filtros_url': urlencode({'obra_id': obra_id, 'busca': busca}),
+    })
 
 @login_required
 def editar_colaborador(request, id):
@@ -237,15 +275,33 @@ def deletar_generico(request):
             return HttpResponseForbidden("Modelo não permitido.")
 
         try:
-            Model = apps.get_model('Sistema', model_name)  
-            Model.objects.filter(id__in=ids).delete()
-        except Exception as e:
-            print(f"Erro ao deletar: {e}")  
+            Model = apps.get_model('Sistema', model_name)
+            queryset = Model.objects.filter(id__in=ids)
+            # Exclusões grandes (com os dependentes em CASCADE) vão para segundo plano, em lotes
+            if contar_afetados(queryset, limite=LIMITE_EXCLUSAO_IMEDIATA) > LIMITE_EXCLUSAO_IMEDIATA:
+                job_id = iniciar_exclusao(Model, ids, request.user)
+                messages.info(request, "A exclusão está em andamento.")
+                return redirect(f"{reverse(redirect_to)}?exclusao={job_id}")
+            queryset.delete()
+        except ProtectedError:
+            messages.error(request, "Não é possível excluir: há registros protegidos vinculados.")
+        except Exception:
+            logger.exception("Erro ao deletar %s %s", model_name, ids)
+            messages.error(request, "Erro ao excluir os itens selecionados.")
 
         return redirect(reverse(redirect_to))
     return redirect('home')
 
 
+@login_required
+def status_exclusao(request, job_id):
+    # Cada usuário acompanha só as próprias exclusões; administradores, todas
+    situacao = consultar_exclusao(job_id, solicitado_por=None if is_administrador(request.user) else request.user)
+    if situacao is None:
+        return JsonResponse({"erro": "Exclusão não encontrada."}, status=404)
+    return JsonResponse(situacao)
+
+
 
 @login_required
 def cadastrar_usuario(request):
@@ -359,41 +415,110 @@ def detalhes_obra(request, id):
     return render(request, 'detalhes-obra.html', {'obra': obra})
 
 
+COLABORADORES_POR_PAGINA_PEDIDO = 100
+
+
 @login_required
 @permission_required('Sistema.view_refeicao', raise_exception=True)
 def listar_pedidos(request):
-    colaboradores = Colaborador.objects.all()
-    return render(request, 'listar-pedidos.html', {'colaboradores': colaboradores})
+    pagina, obra_id = _pagina_colaboradores_pedido(request)
+    return render(request, 'listar-pedidos.html', {
+        'colaboradores': pagina['colaboradores'],
+        'proximo': pagina['proximo'],
+        'obras': obras_visiveis(request.user).only('id', 'nome').order_by('nome'),
+        'obra_id': obra_id,
+        'tem_obras_proprias': obra_id == 'minhas' or Obra.objects.filter(encarregado_responsavel=request.user).exists(),
+    })
+
+
+@login_required
+@permission_required('Sistema.view_refeicao', raise_exception=True)
+def listar_pedidos_colaboradores(request):
+    """Próximas páginas e buscas da tabela de listar_pedidos, carregadas sob demanda."""
+    pagina, _ = _pagina_colaboradores_pedido(request)
+    return JsonResponse({
+        'colaboradores': [
+            {'id': c.id, 'nome': c.nome, 'obra_nome': c.obra.nome} for c in pagina['colaboradores']
+        ],
+        'proximo': pagina['proximo'],
+    })
+
+
+def _pagina_colaboradores_pedido(request):
+    # Sem obra escolhida, a tela abre nas obras em que o usuário é o encarregado
+    # (quando ele tem alguma); "todas" mostra todas as obras visíveis a ele
+    obra_id = request.GET.get('obra_id', '')
+    if not obra_id and Obra.objects.filter(encarregado_responsavel=request.user).exists():
+        obra_id = 'minhas'
+
+    colaboradores = colaboradores_visiveis(request.user)
+    if obra_id == 'minhas':
+        colaboradores = colaboradores.filter(obra__encarregado_responsavel=request.user)
+    busca = request.GET.get('busca')
+    try:
+        colaboradores = filtrar_colaboradores(colaboradores, '' if obra_id in ('minhas', 'todas') else obra_id, busca)
+        pagina = paginar_colaboradores(colaboradores, COLABORADORES_POR_PAGINA_PEDIDO, apos=request.GET.get('apos'))
+    except ValueError:
+        obra_id = 'todas'
+        pagina = paginar_colaboradores(colaboradores_visiveis(request.user), COLABORADORES_POR_PAGINA_PEDIDO)
+    return pagina, obra_id
 
 
 # Manda Mongo
 @login_required
 @permission_required('Sistema.add_refeicao', raise_exception=True)
-def cadastrar_pedido(request):
+async def cadastrar_pedido(request):
     if request.method == "POST":
         data = request.POST.get("data")
         refeicoes_ids = request.POST.getlist("refeicoes")
-        pedido_model.registrar_refeicoes(data, refeicoes_ids, request.user)
+        usuario = await request.auser()
+        resultado = await _pedido_model_async().registrar_refeicoes(data, refeicoes_ids, usuario)
+        if resultado["inseridos"]:
+            messages.success(request, f'{resultado["inseridos"]} refeição(ões) registrada(s) com sucesso!')
+        if resultado.get("enfileirados"):
+            messages.success(request, f'{resultado["enfileirados"]} refeição(ões) recebida(s). O registro é concluído em instantes.')
+        if resultado["existentes"]:
+            messages.info(request, f'{resultado["existentes"]} refeição(ões) já estavam registradas nesta data.')
+        if resultado["falhas"]:
+            messages.error(request, f'{resultado["falhas"]} refeição(ões) não puderam ser registradas. Tente novamente.')
+        if resultado["nao_encontrados"]:
+            ids = ", ".join(str(i) for i in resultado["nao_encontrados"])
+            messages.warning(request, f'Colaboradores não encontrados: {ids}')
         return redirect("listar_pedidos")
     return redirect("listar_pedidos")
 
 
+REGISTROS_POR_PAGINA = 100
+
+
 # Lista todas as refeicoes cadastradas Mongo 
 @login_required
-def listar_registros(request):
-    user = request.user
-    is_encarregado = user.groups.filter(name='Encarregados').exists()
-    is_administrador = user.groups.filter(name='Administradores').exists()
-    is_superuser = user.is_superuser
+async def listar_registros(request):
+    user = await request.auser()
+    modelo = _pedido_model_async()
 
-    registros = pedido_model.listar_registros()
-    paginator = Paginator(registros, 100)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    async def carregar_pagina():
+        try:
+            return await modelo.listar_registros_paginados(
+                limite=REGISTROS_POR_PAGINA,
+                apos=request.GET.get('apos'),
+                antes=request.GET.get('antes'),
+            )
+        except ValueError:
+            # Cursor adulterado ou expirado: volta para a primeira página
+            return await modelo.listar_registros_paginados(limite=REGISTROS_POR_PAGINA)
+
+    is_encarregado, is_administrador, pagina = await asyncio.gather(
+        user.groups.filter(name='Encarregados').aexists(),
+        user.groups.filter(name='Administradores').aexists(),
+        carregar_pagina(),
+    )
+    is_superuser = user.is_superuser
 
     context = {
-        'registros': page_obj,
-        'page_obj': page_obj,
+        'registros': pagina['registros'],
+        'proximo': pagina['proximo'],
+        'anterior': pagina['anterior'],
         'is_encarregado': is_encarregado,
         'is_administrador': is_administrador,
         'is_superuser': is_superuser,
@@ -407,7 +532,11 @@ def editar_registro(request, registro_id):
     registro = pedido_model.buscar_registro(registro_id)
     if request.method == "POST":
         nova_data = request.POST.get("data_refeicao")
-        pedido_model.atualizar_data_refeicao(registro_id, nova_data)
+        try:
+            pedido_model.atualizar_data_refeicao(registro_id, nova_data)
+        except DuplicateKeyError:
+            messages.error(request, 'Este colaborador já tem refeição registrada nesta data.')
+            return render(request, 'editar-registro.html', {'registro': registro})
         return redirect('listar_registros')
     return render(request, 'editar-registro.html', {'registro': registro})
 
@@ -416,8 +545,63 @@ def excluir_registro(request, registro_id):
     pedido_model.excluir_registro(registro_id)
     return redirect('listar_registros')
 
+def is_administrador(user):
+    return user.is_superuser or user.groups.filter(name='Administradores').exists()
+
+
+def _ids_lote(request):
+    # Só os registros marcados na listagem; nunca um filtro aplicado à coleção inteira
+    ids = request.POST.getlist("ids")
+    if not ids:
+        messages.error(request, 'Selecione pelo menos um registro.')
+    return ids
+
+
+@login_required
+@user_passes_test(is_administrador)
+def editar_registros_em_lote(request):
+    if request.method != "POST":
+        return redirect('listar_registros')
+    ids = _ids_lote(request)
+    if not ids:
+        return redirect('listar_registros')
+    try:
+        resultado = pedido_model.atualizar_data_refeicoes_em_lote(request.POST.get("data_refeicao"), ids=ids)
+    except (ValueError, TypeError) as e:
+        messages.error(request, f'Não foi possível alterar as refeições: {e}')
+        return redirect('listar_registros')
+
+    messages.success(request, f'{resultado["atualizados"]} refeição(ões) com a data corrigida.')
+    if resultado["conflitos"]:
+        messages.warning(
+            request,
+            f'{resultado["conflitos"]} refeição(ões) não foram alteradas: o colaborador já tem refeição na nova data.'
+        )
+    return redirect('listar_registros')
+
+
 @login_required
-def relatorio(request):
+@user_passes_test(is_administrador)
+def excluir_registros_em_lote(request):
+    if request.method != "POST":
+        return redirect('listar_registros')
+    ids = _ids_lote(request)
+    if not ids:
+        return redirect('listar_registros')
+    try:
+        resultado = pedido_model.excluir_registros_em_lote(ids=ids)
+    except (ValueError, TypeError) as e:
+        messages.error(request, f'Não foi possível excluir as refeições: {e}')
+        return redirect('listar_registros')
+
+    messages.success(request, f'{resultado["excluidos"]} refeição(ões) excluída(s).')
+    return redirect('listar_registros')
+
+LIMITE_SELECT_COLABORADORES = 300
+
+@login_required
+async def relatorio(request):
+    modelo = _pedido_model_async()
     filtros = {
         "data_inicio": request.GET.get("data_inicio"),
         "data_fim": request.GET.get("data_fim"),
@@ -427,53 +611,131 @@ def relatorio(request):
 
     filtros_aplicados = any([filtros["data_inicio"], filtros["data_fim"], filtros["obra_id"], filtros["colaborador_id"]])
 
+    consultar_resumo = False
     if filtros_aplicados:
-        # Validação de intervalo
+        # Validação das datas; o resumo pré-agregado atende qualquer intervalo
         try:
             data_inicio = datetime.strptime(filtros["data_inicio"], "%Y-%m-%d")
             data_fim = datetime.strptime(filtros["data_fim"], "%Y-%m-%d")
 
-            if (data_fim - data_inicio).days > 31:
-                messages.error(request, "O intervalo de datas não pode ultrapassar 31 dias.")
-                return render(request, "dashboard.html", {
-                    "obras": pedido_model.listar_obras_unicas(),
-                    "colaboradores": pedido_model.listar_colaboradores_unicos(),
-                    "total_refeicoes": 0,
-                    "total_colaboradores": 0,
-                    "refeicoes_por_dia": [],
-                    "soma_valor_refeicoes": 0,
-                })
+            if data_fim < data_inicio:
+                messages.error(request, "A data final não pode ser anterior à data inicial.")
+            else:
+                consultar_resumo = True
         except (ValueError, TypeError):
             messages.error(request, "Datas inválidas.")
-            # mesmo retorno acima em caso de erro
-            return render(request, "dashboard.html", {
-                "obras": pedido_model.listar_obras_unicas(),
-                "colaboradores": pedido_model.listar_colaboradores_unicos(),
-                "total_refeicoes": 0,
-                "total_colaboradores": 0,
-                "refeicoes_por_dia": [],
-                "soma_valor_refeicoes": 0,
-            })
-
-        # Se intervalo válido:
-        dados = {
-            "total_refeicoes": pedido_model.total_refeicoes(filtros),
-            "total_colaboradores": pedido_model.total_colaboradores_unicos(filtros),
-            "refeicoes_por_dia": pedido_model.refeicoes_por_dia(filtros),
-            "soma_valor_refeicoes": pedido_model.somar_valor_refeicoes(filtros),
-        }
-    else:
-        dados = {
-            "total_refeicoes": 0,
-            "total_colaboradores": 0,
-            "refeicoes_por_dia": [],
-            "soma_valor_refeicoes": 0,
-        }
 
-    dados["obras"] = pedido_model.listar_obras_unicas()
-    dados["colaboradores"] = pedido_model.listar_colaboradores_unicos()
+    async def carregar_resumo():
+        # Todos os números em uma única agregação
+        return await modelo.resumo_dashboard(filtros) if consultar_resumo else resumo_vazio()
+
+    # Consultas independentes rodam ao mesmo tempo
+    resumo, obras, colaboradores = await asyncio.gather(
+        carregar_resumo(),
+        modelo.listar_obras_unicas(),
+        modelo.listar_colaboradores_unicos(),
+    )
+    # Com muitos colaboradores o <select> vira uma busca (buscar_colaboradores_refeicoes)
+    usar_busca_colaborador = len(colaboradores) > LIMITE_SELECT_COLABORADORES
+    colaborador_selecionado = None
+    if usar_busca_colaborador and filtros["colaborador_id"]:
+        colaborador_selecionado = next(
+            (c for c in colaboradores if str(c["colaborador_id"]) == filtros["colaborador_id"]), None
+        )
+
+    return render(request, "dashboard.html", {
+        "resumo": resumo,
+        "obras": obras,
+        "colaboradores": [] if usar_busca_colaborador else colaboradores,
+        "usar_busca_colaborador": usar_busca_colaborador,
+        "colaborador_selecionado": colaborador_selecionado,
+    })
+
+
+# Colunas da exportação, na ordem do arquivo: campo da linha -> título
+CABECALHO_EXPORTACAO = {
+    "colaborador_id": "Colaborador ID",
+    "colaborador_nome": "Colaborador",
+    "obra_id": "Obra ID",
+    "obra_nome": "Obra",
+    "data_refeicao": "Data da Refeição",
+    "valor_refeicao": "Valor",
+    "registrado_em": "Registrado em",
+    "registrado_por_nome": "Registrado por",
+}
+# Linhas lidas por ida à thread de sincronização quando servido por ASGI
+LINHAS_POR_BLOCO_ASGI = 500
+
+
+class _Eco:
+    """Pseudo-arquivo para o csv.writer: devolve a linha em vez de guardá-la."""
+    def write(self, valor):
+        return valor
+
+
+def _linha_exportacao(registro):
+    """Valores já formatados de cada coluna de CABECALHO_EXPORTACAO."""
+    valor = registro.get("valor_refeicao")
+    return {
+        "colaborador_id": registro.get("colaborador_id"),
+        "colaborador_nome": registro.get("colaborador_nome"),
+        "obra_id": registro.get("obra_id"),
+        "obra_nome": registro.get("obra_nome"),
+        "data_refeicao": registro["data_refeicao"].strftime("%d/%m/%Y"),
+        "valor_refeicao": f"{valor:.2f}".replace(".", ",") if valor is not None else "",
+        "registrado_em": registro["registrado_em"].strftime("%d/%m/%Y %H:%M") if registro.get("registrado_em") else "",
+        "registrado_por_nome": registro.get("registrado_por_nome"),
+    }
+
+
+def _linhas_csv(registros):
+    writer = csv.DictWriter(_Eco(), fieldnames=list(CABECALHO_EXPORTACAO), delimiter=";")
+    # BOM para o Excel abrir o arquivo como UTF-8
+    yield "\ufeff" + writer.writerow(CABECALHO_EXPORTACAO)
+    for registro in registros:
+        yield writer.writerow(_linha_exportacao(registro))
+
+
+async def _linhas_csv_async(linhas):
+    """As mesmas linhas para o servidor ASGI, que só envia aos poucos um iterador
+    assíncrono (um síncrono seria lido inteiro para a memória antes do envio).
+    Cada bloco é lido na thread da requisição, onde o cursor e o ORM ficam."""
+    iterador = iter(linhas)
+    proximo_bloco = sync_to_async(lambda: list(islice(iterador, LINHAS_POR_BLOCO_ASGI)), thread_sensitive=True)
+    while True:
+        bloco = await proximo_bloco()
+        if not bloco:
+            return
+        yield "".join(bloco)
 
-    return render(request, "dashboard.html", dados)
+
+@login_required
+def exportar_registros(request):
+    filtros = {
+        "data_inicio": request.GET.get("data_inicio"),
+        "data_fim": request.GET.get("data_fim"),
+        "obra_id": request.GET.get("obra_id"),
+        "colaborador_id": request.GET.get("colaborador_id")
+    }
+    if request.GET.get("formato", "csv") != "csv":
+        return HttpResponseBadRequest("Formato inválido. Use csv.")
+    try:
+        registros = pedido_model.iterar_registros(filtros)
+    except (ValueError, TypeError):
+        return HttpResponseBadRequest("Filtros inválidos.")
+
+    linhas = _linhas_csv(registros)
+    if isinstance(request, ASGIRequest):
+        linhas = _linhas_csv_async(linhas)
+    response = StreamingHttpResponse(linhas, content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="refeicoes_{datetime.now():%Y%m%d_%H%M}.csv"'
+    return response
+
+
+@login_required
+def buscar_colaboradores_refeicoes(request):
+    colaboradores = pedido_model.buscar_colaboradores_unicos(request.GET.get("q"))
+    return JsonResponse({"colaboradores": colaboradores})
 
 @login_required
 def home(request):
@@ -492,3 +754,31 @@ def home(request):
     }
 
     return render(request, 'home.html', context)
+
+
+@login_required
+@user_passes_test(is_administrador)
+def estatisticas_mongo(request):
+    fila = pedido_model.fila_escrita.estatisticas() if getattr(pedido_model, "escrita_adiada", False) else None
+    return JsonResponse({"pool": estatisticas_pool(), "comandos": estatisticas_comandos(), "fila_escrita": fila})
+
+
+@login_required
+@user_passes_test(is_administrador)
+def relatorio_parceiros(request):
+    filtros = {
+        "data_inicio": request.GET.get("data_inicio"),
+        "data_fim": request.GET.get("data_fim"),
+    }
+    faturamento = {"restaurantes": [], "hoteis": []}
+    try:
+        datas = [datetime.strptime(filtros[campo], "%Y-%m-%d") for campo in ("data_inicio", "data_fim") if filtros[campo]]
+        if len(datas) == 2 and datas[1] < datas[0]:
+            messages.error(request, "A data final não pode ser anterior à data inicial.")
+        else:
+            faturamento = faturamento_parceiros(pedido_model, filtros)
+    except ValueError:
+        messages.error(request, "Datas inválidas.")
+    return render(request, "relatorio-parceiros.html", {
+        "secoes": [("Restaurantes", faturamento["restaurantes"]), ("Hotéis", faturamento["hoteis"])],
+    })